@@ -5,19 +5,25 @@ import sys
 import os
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, List, Dict, Any
-import uuid
+from typing import Optional, List, Dict, Any, AsyncIterator, Tuple
 
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import HTMLResponse, FileResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 import uvicorn
 
 from src.pipeline.main_pipeline import CodexAIPipeline
+from src.llm.providers import build_prompt, close_provider_pools, get_provider_pool
+from src.llm.streaming import SSE_HEADERS, sse_event
+from src.monitoring.monitor import add_metrics_route, get_monitor
+from src.monitoring.tracing import add_tracing
+from src.serving.model_registry import get_registry
+from src.pipeline.stages import ClientDisconnected, run_until_disconnected
+from src.sessions.session_store import SessionStore, create_session_store
 
 
 class Message(BaseModel):
@@ -26,24 +32,46 @@ class Message(BaseModel):
     role: str  # 'user' or 'assistant'
     timestamp: datetime
     context: Optional[str] = None
+    evaluation: Optional[Dict[str, Any]] = None
 
 
 class ChatSession:
-    def __init__(self):
-        self.id = str(uuid.uuid4())
-        self.messages: List[Message] = []
-        self.created_at = datetime.now()
-
-    def add_message(self, content: str, role: str, context: Optional[str] = None) -> Message:
-        message = Message(
-            id=str(uuid.uuid4()),
-            content=content,
-            role=role,
-            timestamp=datetime.now(),
-            context=context
+    """Handle on one conversation kept in the configured session store.
+
+    Store calls can block (SQLite writes and lock waits), so the async
+    handlers go through ``open`` and ``add_message``, which run them on a thread.
+    """
+
+    def __init__(self, store: SessionStore, session_id: Optional[str] = None):
+        self.store = store
+        self.id = store.get_or_create(session_id)
+
+    @classmethod
+    async def open(cls, store: SessionStore, session_id: Optional[str] = None) -> "ChatSession":
+        return await asyncio.to_thread(cls, store, session_id)
+
+    async def add_message(self, content: str, role: str, context: Optional[str] = None) -> Message:
+        stored = await asyncio.to_thread(self.store.append, self.id, role, content, context)
+        return Message(**stored.to_dict())
+
+    def evaluate_reply(self, reply: Message, question: str, context: Optional[str]) -> None:
+        """Queue a sampled background evaluation that is attached to ``reply`` when done."""
+        _get_pipeline().submit_evaluation(
+            question,
+            reply.content,
+            context,
+            on_result=lambda evaluation: self._attach_evaluation(reply.id, evaluation),
         )
-        self.messages.append(message)
-        return message
+
+    def _attach_evaluation(self, message_id: str, evaluation: Dict[str, Any]) -> None:
+        # Called on the event loop by the evaluation worker; the write goes to a thread
+        write = asyncio.ensure_future(asyncio.to_thread(self.store.set_evaluation, self.id, message_id, evaluation))
+        write.add_done_callback(_report_store_error)
+
+
+def _report_store_error(future: asyncio.Future) -> None:
+    if not future.cancelled() and future.exception() is not None:
+        print(f"Session store write failed: {future.exception()}")
 
 
 def _build_pipeline_config() -> dict:
@@ -70,6 +98,9 @@ def _build_pipeline_config() -> dict:
         "openai_api_key": os.getenv("OPENAI_API_KEY"),
         "anthropic_api_key": os.getenv("ANTHROPIC_API_KEY"),
         "xai_api_key": os.getenv("XAI_API_KEY"),
+        "anthropic_model": os.getenv("ANTHROPIC_MODEL"),
+        "anthropic_base_url": os.getenv("ANTHROPIC_BASE_URL"),
+        "openai_base_url": os.getenv("OPENAI_BASE_URL"),
         "temperature": 0.7,
         "max_tokens": 2000,
         "top_p": 0.9,
@@ -81,37 +112,33 @@ app = FastAPI(
     description="An Anthropic-style chat interface for the Codex AI Pipeline",
     version="2.0.0"
 )
+monitor = get_monitor()
+add_metrics_route(app, monitor)
+add_tracing(app, monitor.tracer)
 
-# Store active chat sessions
-chat_sessions: Dict[str, ChatSession] = {}
+# Active chat sessions (bounded in memory, or SQLite shared across workers)
+session_store: SessionStore = create_session_store()
 pipeline = None
+warm_up = None
 
 
 @app.on_event("startup")
 async def startup_event():
-    global pipeline
-
-    # Force reload the pipeline module to pick up newly installed dependencies
-    import importlib
-    import sys
+    global pipeline, warm_up
 
-    # Reload the main pipeline module if it's already imported
-    if 'src.pipeline.main_pipeline' in sys.modules:
-        importlib.reload(sys.modules['src.pipeline.main_pipeline'])
-
-    # Also reload any related modules that might have been cached with mocks
-    for module_name in list(sys.modules.keys()):
-        if module_name.startswith('src.') and 'pipeline' in module_name:
-            try:
-                importlib.reload(sys.modules[module_name])
-            except Exception:
-                pass  # Some modules might not be reloadable, that's ok
-
-    # Now import fresh
-    from src.pipeline.main_pipeline import CodexAIPipeline
+    # Components are imported and built on first use, so construction is cheap;
+    # the heavy ones are warmed in the background while requests are served
     pipeline = CodexAIPipeline(_build_pipeline_config())
+    warm_up = pipeline.warm_up_in_background()
+    print(f"🚀 Pipeline initialized in {pipeline.startup_profile.init_seconds:.3f}s; warming up in the background")
+
 
-    print("🚀 Pipeline initialized with fresh module imports")
+@app.on_event("shutdown")
+async def shutdown_event():
+    if pipeline is not None:
+        await pipeline.aclose()
+    await close_provider_pools()
+    session_store.close()
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -385,6 +412,7 @@ async def get_chat_interface():
         const sendButton = document.getElementById('sendButton');
         const statusIndicator = document.getElementById('statusIndicator');
         let isProcessing = false;
+        let sessionId = null;
 
         // Check system status on load
         async function checkStatus() {
@@ -461,49 +489,73 @@ async def get_chat_interface():
             const thinkingDiv = addMessage('', 'assistant', true);
 
             try {
-                const response = await fetch('/chat', {
+                const response = await fetch('/chat/stream', {
                     method: 'POST',
                     headers: {
                         'Content-Type': 'application/json',
                     },
                     body: JSON.stringify({
                         message: message,
-                        context: context
+                        context: context,
+                        session_id: sessionId
                     })
                 });
 
-                const result = await response.json();
-
-                // Remove thinking indicator
-                thinkingDiv.remove();
+                if (!response.ok || !response.body) {
+                    throw new Error('Request failed');
+                }
 
-                if (response.ok) {
-                    // Extract friendly response
-                    let friendlyResponse = result.response;
-                    if (typeof result === 'object' && result.answer) {
-                        friendlyResponse = result.answer;
-                    } else if (typeof result === 'object' && result.output) {
-                        friendlyResponse = result.output;
-                    } else if (typeof result === 'string') {
-                        friendlyResponse = result;
+                // Render tokens as they arrive instead of waiting for the full reply
+                const reader = response.body.getReader();
+                const decoder = new TextDecoder();
+                let buffer = '';
+                let bubble = null;
+                let finalResponse = '';
+
+                while (true) {
+                    const { value, done } = await reader.read();
+                    if (done) break;
+                    buffer += decoder.decode(value, { stream: true });
+
+                    const frames = buffer.split('\\n\\n');
+                    buffer = frames.pop();
+                    for (const frame of frames) {
+                        if (!frame.startsWith('data: ')) continue;
+                        const event = JSON.parse(frame.slice(6));
+
+                        if (event.type === 'start') {
+                            sessionId = event.session_id;
+                        } else if (event.type === 'delta') {
+                            if (!bubble) {
+                                thinkingDiv.remove();
+                                bubble = addMessage('', 'assistant').querySelector('.message-bubble');
+                            }
+                            bubble.textContent += event.text;
+                            chatMessages.scrollTop = chatMessages.scrollHeight;
+                        } else if (event.type === 'done') {
+                            finalResponse = event.response;
+                        } else if (event.type === 'error') {
+                            throw new Error(event.detail);
+                        }
                     }
+                }
 
-                    // Update status indicator based on response type
-                    if (friendlyResponse && friendlyResponse.includes('demo mode')) {
-                        statusIndicator.className = 'status-indicator status-demo';
-                        statusIndicator.textContent = '🔧 Demo Mode';
-                    } else if (friendlyResponse && !friendlyResponse.includes('Mock AI response')) {
-                        statusIndicator.className = 'status-indicator status-live';
-                        statusIndicator.textContent = '🚀 Live AI';
-                    }
+                if (!bubble) {
+                    thinkingDiv.remove();
+                    addMessage("I received your message but couldn't generate a response.", 'assistant');
+                }
 
-                    addMessage(friendlyResponse || 'I received your message but couldn\'t generate a response.', 'assistant');
-                } else {
-                    addMessage('Sorry, I encountered an error processing your request. Please try again.', 'assistant');
+                // Update status indicator based on response type
+                if (finalResponse && finalResponse.includes('demo mode')) {
+                    statusIndicator.className = 'status-indicator status-demo';
+                    statusIndicator.textContent = '🔧 Demo Mode';
+                } else if (finalResponse && !finalResponse.includes('Mock AI response')) {
+                    statusIndicator.className = 'status-indicator status-live';
+                    statusIndicator.textContent = '🚀 Live AI';
                 }
             } catch (error) {
                 thinkingDiv.remove();
-                addMessage('Sorry, I\'m having trouble connecting. Please check your connection and try again.', 'assistant');
+                addMessage("Sorry, I'm having trouble connecting. Please check your connection and try again.", 'assistant');
             } finally {
                 isProcessing = false;
                 sendButton.disabled = false;
@@ -529,75 +581,19 @@ class ChatRequest(BaseModel):
     session_id: Optional[str] = None
 
 
+@monitor.tracer.traced("direct_response")
 async def get_direct_ai_response(message: str, context: Optional[str] = None) -> str:
     """Get a direct response from AI APIs, bypassing complex pipeline."""
     config = _build_pipeline_config()
     errors = []
 
-    # Try Anthropic first (since it's usually more reliable)
-    anthropic_key = config.get("anthropic_api_key")
-    if anthropic_key:
-        try:
-            import anthropic
-            client = anthropic.Anthropic(api_key=anthropic_key)
-
-            prompt = message
-            if context:
-                prompt = f"Context: {context}\n\nUser: {message}"
-
-            # Anthropic requires structured content blocks even for plain text prompts
-            response = client.messages.create(
-                model="claude-3-5-sonnet-20241022",
-                max_tokens=config.get("max_tokens", 2000),
-                messages=[{
-                    "role": "user",
-                    "content": [{"type": "text", "text": prompt}]
-                }]
-            )
-
-            # Combine any returned text blocks to form the final reply
-            text_blocks = []
-            for block in response.content:
-                if isinstance(block, dict):
-                    if block.get("type") == "text" and block.get("text"):
-                        text_blocks.append(block["text"])
-                else:
-                    if getattr(block, "type", None) == "text" and getattr(block, "text", None):
-                        text_blocks.append(block.text)
-
-            if text_blocks:
-                return "".join(text_blocks)
-
-            # Fall back to stringifying the response when no text blocks are present
-            return str(response)
-        except ImportError:
-            errors.append("Anthropic package not installed")
-        except Exception as e:
-            errors.append(f"Anthropic API error: {str(e)}")
-
-    # Try OpenAI as fallback
-    openai_key = config.get("openai_api_key")
-    if openai_key:
-        try:
-            import openai
-            client = openai.OpenAI(api_key=openai_key)
-
-            prompt = message
-            if context:
-                prompt = f"Context: {context}\n\nUser: {message}"
-
-            response = client.chat.completions.create(
-                model=config.get("model_name", "gpt-4o"),
-                messages=[{"role": "user", "content": prompt}],
-                temperature=config.get("temperature", 0.7),
-                max_tokens=config.get("max_tokens", 2000)
-            )
-
-            return response.choices[0].message.content
-        except ImportError:
-            errors.append("OpenAI package not installed")
-        except Exception as e:
-            errors.append(f"OpenAI API error: {str(e)}")
+    # Anthropic first (since it's usually more reliable), then OpenAI, using the
+    # process-wide async clients; providers with an open circuit are skipped
+    response = await get_provider_pool(config).complete(
+        build_prompt(message, context), errors=errors
+    )
+    if response:
+        return response
 
     # Log all errors for debugging
     if errors:
@@ -607,54 +603,40 @@ async def get_direct_ai_response(message: str, context: Optional[str] = None) ->
     return None
 
 
-@app.post("/chat")
-async def chat_endpoint(request: ChatRequest):
-    """Process a chat message through the pipeline."""
-    try:
-        global pipeline
-        if pipeline is None:
-            pipeline = CodexAIPipeline(_build_pipeline_config())
+def _get_pipeline() -> CodexAIPipeline:
+    global pipeline
+    if pipeline is None:
+        pipeline = CodexAIPipeline(_build_pipeline_config())
+    return pipeline
 
-        # Get or create session
-        session_id = request.session_id or str(uuid.uuid4())
-        if session_id not in chat_sessions:
-            chat_sessions[session_id] = ChatSession()
 
-        session = chat_sessions[session_id]
+async def _get_session(session_id: Optional[str]) -> Tuple[str, ChatSession]:
+    """Get or create the session for a request."""
+    session = await ChatSession.open(session_store, session_id)
+    return session.id, session
 
-        # Add user message to session
-        session.add_message(request.message, "user", request.context)
-
-        # Try direct AI response first
-        direct_response = await get_direct_ai_response(request.message, request.context)
-
-        if direct_response:
-            # We got a real AI response!
-            response_text = direct_response
-            result = {
-                "response": response_text,
-                "query": request.message,
-                "context": request.context
-            }
-        else:
-            # Fall back to pipeline (which might give mock responses)
-            result = await pipeline.process_query(request.message, request.context)
-
-            # Extract friendly response with better handling
-            if not direct_response:
-                # We're using pipeline result, check if it's mock
-                if isinstance(result, dict):
-                    response_text = result.get("response")
-
-                    # If it's a mock response, provide a more helpful message
-                    if response_text and "Mock AI response for:" in response_text:
-                        # Check if API keys are available
-                        config = _build_pipeline_config()
-                        api_available = config.get("openai_api_key") or config.get("anthropic_api_key")
-
-                        if api_available:
-                            # API key is available but might be having issues
-                            response_text = f"""I understand you're asking: "{request.message}"
+
+@monitor.tracer.traced("pipeline_fallback")
+async def _pipeline_fallback_response(message: str, context: Optional[str] = None) -> str:
+    """Build the reply shown when no AI provider produced a response."""
+    # Fall back to pipeline (which might give mock responses)
+    # The chat endpoints queue their own evaluation so it can be attached to the session
+    result = await _get_pipeline().process_query(message, context, evaluate=False)
+
+    # Extract friendly response with better handling
+    # We're using pipeline result, check if it's mock
+    if isinstance(result, dict):
+        response_text = result.get("response")
+
+        # If it's a mock response, provide a more helpful message
+        if response_text and "Mock AI response for:" in response_text:
+            # Check if API keys are available
+            config = _build_pipeline_config()
+            api_available = config.get("openai_api_key") or config.get("anthropic_api_key")
+
+            if api_available:
+                # API key is available but might be having issues
+                response_text = f"""I understand you're asking: "{message}"
 
 I have access to AI API keys, but both services are currently experiencing quota issues:
 
@@ -678,9 +660,9 @@ I have access to AI API keys, but both services are currently experiencing quota
 **Good News:** The interface and API integration are working perfectly! Once you add credits to either service, you'll get real AI responses immediately. The system is ready to go! 🚀
 
 Would you like me to help you with anything else while you're setting up the billing?"""
-                        else:
-                            # No API key configured
-                            response_text = f"""I understand you're asking: "{request.message}"
+            else:
+                # No API key configured
+                response_text = f"""I understand you're asking: "{message}"
 
 I'm currently running in demo mode because no AI API keys are configured. To get real AI responses:
 
@@ -698,17 +680,49 @@ I'm currently running in demo mode because no AI API keys are configured. To get
 
 For now, I can help you test the interface and demonstrate the pipeline structure!"""
 
-                    elif not response_text:
-                        response_text = (
-                            result.get("answer") or
-                            result.get("output") or
-                            "I received your message but couldn't generate a proper response."
-                        )
-                else:
-                    response_text = str(result)
+        elif not response_text:
+            response_text = (
+                result.get("answer") or
+                result.get("output") or
+                "I received your message but couldn't generate a proper response."
+            )
+    else:
+        response_text = str(result)
+
+    return response_text
+
+
+async def _chat_reply(message: str, context: Optional[str]) -> Tuple[str, bool]:
+    """Return the reply text and whether it came from the pipeline fallback."""
+    # Try direct AI response first
+    direct_response = await get_direct_ai_response(message, context)
+
+    if direct_response:
+        # We got a real AI response!
+        return direct_response, False
+    return await _pipeline_fallback_response(message, context), True
+
+
+@app.post("/chat")
+@monitor.track_request(endpoint="POST /chat")
+async def chat_endpoint(request: ChatRequest, raw_request: Request):
+    """Process a chat message through the pipeline."""
+    try:
+        session_id, session = await _get_session(request.session_id)
+
+        # Add user message to session
+        await session.add_message(request.message, "user", request.context)
+
+        # Stop generating if the client hangs up before the reply is ready
+        response_text, from_pipeline = await run_until_disconnected(
+            _chat_reply(request.message, request.context), raw_request.is_disconnected
+        )
 
         # Add assistant response to session
-        session.add_message(response_text, "assistant")
+        reply = await session.add_message(response_text, "assistant")
+        # Only pipeline answers are evaluated; direct provider replies never were
+        if from_pipeline:
+            session.evaluate_reply(reply, request.message, request.context)
 
         return {
             "response": response_text,
@@ -716,21 +730,103 @@ For now, I can help you test the interface and demonstrate the pipeline structur
             "timestamp": datetime.now().isoformat()
         }
 
+    except ClientDisconnected:
+        return Response(status_code=499)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Pipeline error: {str(e)}")
 
 
+async def _stream_chat_events(request: ChatRequest) -> AsyncIterator[Dict[str, Any]]:
+    """Yield ``start``, token ``delta`` and final ``done`` events for one chat turn."""
+    session_id, session = await _get_session(request.session_id)
+    await session.add_message(request.message, "user", request.context)
+    yield {"type": "start", "session_id": session_id}
+
+    errors = []
+    chunks = []
+    async for delta in get_provider_pool(_build_pipeline_config()).stream(
+        build_prompt(request.message, request.context), errors=errors
+    ):
+        chunks.append(delta)
+        yield {"type": "delta", "text": delta}
+
+    from_pipeline = not chunks
+    if chunks:
+        response_text = "".join(chunks)
+    else:
+        if errors:
+            print(f"AI API errors: {'; '.join(errors)}")
+        response_text = await _pipeline_fallback_response(request.message, request.context)
+        yield {"type": "delta", "text": response_text}
+
+    # Only completed replies are recorded in the session
+    reply = await session.add_message(response_text, "assistant")
+    if from_pipeline:
+        session.evaluate_reply(reply, request.message, request.context)
+    yield {
+        "type": "done",
+        "response": response_text,
+        "session_id": session_id,
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    """Stream a chat reply as Server-Sent Events."""
+
+    async def event_source():
+        try:
+            async for event in _stream_chat_events(request):
+                yield sse_event(event)
+        except Exception as e:
+            yield sse_event({"type": "error", "detail": f"Pipeline error: {str(e)}"})
+
+    return StreamingResponse(event_source(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@app.websocket("/ws/chat")
+async def chat_websocket(websocket: WebSocket):
+    """Stream chat replies over a WebSocket; each client frame is a ChatRequest JSON object."""
+    await websocket.accept()
+    session_id: Optional[str] = None
+    try:
+        while True:
+            payload = await websocket.receive_json()
+            try:
+                request = ChatRequest(**payload)
+                # Keep the conversation on one session for the lifetime of the socket
+                request.session_id = request.session_id or session_id
+                async for event in _stream_chat_events(request):
+                    if event["type"] == "start":
+                        session_id = event["session_id"]
+                    await websocket.send_json(event)
+            except WebSocketDisconnect:
+                raise
+            except Exception as e:
+                await websocket.send_json({"type": "error", "detail": f"Pipeline error: {str(e)}"})
+    except WebSocketDisconnect:
+        pass
+
+
 @app.get("/sessions/{session_id}/history")
-async def get_chat_history(session_id: str):
-    """Get chat history for a session."""
-    if session_id not in chat_sessions:
+async def get_chat_history(session_id: str, offset: int = 0, limit: int = 50):
+    """Get one page of chat history for a session (oldest first)."""
+    limit = max(1, min(limit, 500))
+    offset = max(0, offset)
+    created_at = await asyncio.to_thread(session_store.created_at, session_id)
+    if created_at is None:
         raise HTTPException(status_code=404, detail="Session not found")
 
-    session = chat_sessions[session_id]
+    messages, total = await asyncio.to_thread(session_store.history, session_id, offset, limit)
+    next_offset = offset + len(messages)
     return {
         "session_id": session_id,
-        "messages": [msg.dict() for msg in session.messages],
-        "created_at": session.created_at.isoformat()
+        "messages": [msg.to_dict() for msg in messages],
+        "total": total,
+        "offset": offset,
+        "next_offset": next_offset if next_offset < total else None,
+        "created_at": datetime.fromtimestamp(created_at).isoformat()
     }
 
 
@@ -740,16 +836,17 @@ async def health_check():
     return {
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
-        "active_sessions": len(chat_sessions)
+        "active_sessions": await asyncio.to_thread(session_store.count),
+        "warm": warm_up is not None and warm_up.done(),
+        "startup": pipeline.startup_profile.report() if pipeline is not None else None,
+        "models": get_registry().stats(),
+        "providers": get_provider_pool(_build_pipeline_config()).router.snapshot()
     }
 
 
 async def _run_pipeline(query: str, context: Optional[str]) -> dict:
     """Legacy function for backward compatibility."""
-    global pipeline
-    if pipeline is None:
-        pipeline = CodexAIPipeline(_build_pipeline_config())
-    return await pipeline.process_query(query, context)
+    return await _get_pipeline().process_query(query, context)
 
 
 def run_pipeline(query: str, context: Optional[str] = None) -> dict:
@@ -1,16 +1,26 @@
+import json
 import sys
 import os
-from typing import Optional
+from typing import List, Optional
 
 # Ensure project root is importable for `src` and `config`
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
 from pydantic import BaseModel
 import uvicorn
 
+from src.pipeline.components import aget
 from src.pipeline.main_pipeline import CodexAIPipeline
+from src.serving.model_registry import get_registry
+from src.pipeline.stages import ClientDisconnected, run_until_disconnected
+from src.llm.providers import close_provider_pools
+from src.llm.streaming import SSE_HEADERS, sse_event
+from src.messaging.slack_events import add_slack_routes, slack_handler_from_env
+from src.monitoring.monitor import add_metrics_route, get_monitor
+from src.monitoring.tracing import add_tracing
+from src.voice.conversation import VoiceConversation
 
 
 def _build_pipeline_config() -> dict:
@@ -19,10 +29,15 @@ def _build_pipeline_config() -> dict:
         "temperature": 0.7,
         "max_tokens": 1000,
         "top_p": 0.9,
+        "openai_api_key": os.getenv("OPENAI_API_KEY"),
+        "anthropic_api_key": os.getenv("ANTHROPIC_API_KEY"),
     }
 
 
 app = FastAPI(title="Codex AI Pipeline API")
+monitor = get_monitor()
+add_metrics_route(app, monitor)
+add_tracing(app, monitor.tracer)
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -209,20 +224,49 @@ async def read_root():
                 };
 
                 try {
-                    const response = await fetch("/query", {
+                    const response = await fetch("/query/stream", {
                         method: "POST",
                         headers: { "Content-Type": "application/json" },
                         body: JSON.stringify(payload)
                     });
 
-                    if (!response.ok) {
+                    if (!response.ok || !response.body) {
                         const message = await response.text();
                         throw new Error(message || "Unexpected server error.");
                     }
 
-                    const data = await response.json();
-                    outputJson.textContent = JSON.stringify(data, null, 2);
-                    outputText.textContent = extractFriendlyText(data);
+                    // Render tokens as they arrive; the final event carries the full result
+                    const reader = response.body.getReader();
+                    const decoder = new TextDecoder();
+                    let buffer = "";
+                    let started = false;
+
+                    while (true) {
+                        const { value, done } = await reader.read();
+                        if (done) break;
+                        buffer += decoder.decode(value, { stream: true });
+
+                        const frames = buffer.split("\\n\\n");
+                        buffer = frames.pop();
+                        for (const frame of frames) {
+                            if (!frame.startsWith("data: ")) continue;
+                            const event = JSON.parse(frame.slice(6));
+
+                            if (event.type === "delta") {
+                                if (!started) {
+                                    outputText.textContent = "";
+                                    started = true;
+                                }
+                                outputText.textContent += event.text;
+                            } else if (event.type === "done") {
+                                const { type, ...data } = event;
+                                outputJson.textContent = JSON.stringify(data, null, 2);
+                                outputText.textContent = extractFriendlyText(data);
+                            } else if (event.type === "error") {
+                                throw new Error(event.error);
+                            }
+                        }
+                    }
                 } catch (error) {
                     outputText.textContent = "Error: " + error.message;
                     outputJson.textContent = "No JSON available.";
@@ -237,29 +281,168 @@ async def read_root():
 
 
 @app.on_event("startup")
-def _init_pipeline():
-    # Initialize once per process to avoid heavy per-request setup
+async def _init_pipeline():
+    # Initialize once per process; heavy components load in the background
     app.state.pipeline = CodexAIPipeline(_build_pipeline_config())
+    app.state.warm_up = app.state.pipeline.warm_up_in_background()
+    app.state.warm_up.add_done_callback(_report_warm_up)
+
+
+def _report_warm_up(future) -> None:
+    if future.cancelled() or future.exception() is not None:
+        return
+    report = future.result()
+    print(f"Pipeline warm: init {report['init_seconds']}s, components {report['total_build_seconds']}s")
+
+
+@app.on_event("shutdown")
+async def _close_providers():
+    pipeline = getattr(app.state, "pipeline", None)
+    if pipeline is not None:
+        await pipeline.aclose()
+    await close_provider_pools()
+
+
+@app.get("/health")
+async def health():
+    pipeline = getattr(app.state, "pipeline", None)
+    warm_up = getattr(app.state, "warm_up", None)
+    return {
+        "status": "ok" if pipeline is not None else "starting",
+        "warm": warm_up is not None and warm_up.done(),
+        "startup": pipeline.startup_profile.report() if pipeline is not None else None,
+        "models": get_registry().stats(),
+    }
+
+
+# Clinicians' questions from Slack, when SLACK_BOT_TOKEN and SLACK_SIGNING_SECRET are set
+slack_questions = slack_handler_from_env(lambda question: _get_pipeline().stream_query(question))
+if slack_questions is not None:
+    add_slack_routes(app, slack_questions)
 
 
 class QueryRequest(BaseModel):
     query: str
     context: Optional[str] = None
+    use_cache: bool = True
+    # Parts of a multi-part question, researched in parallel by POST /query
+    sub_queries: Optional[List[str]] = None
+
+
+def _get_pipeline() -> CodexAIPipeline:
+    pipeline: CodexAIPipeline = getattr(app.state, "pipeline", None)
+    if pipeline is None:
+        pipeline = CodexAIPipeline(_build_pipeline_config())
+        app.state.pipeline = pipeline
+    return pipeline
 
 
 @app.post("/query")
-async def process_query(request: QueryRequest):
+@monitor.track_request(endpoint="POST /query")
+async def process_query(request: QueryRequest, raw_request: Request):
     try:
-        pipeline: CodexAIPipeline = getattr(app.state, "pipeline", None)
-        if pipeline is None:
-            pipeline = CodexAIPipeline(_build_pipeline_config())
-            app.state.pipeline = pipeline
-
-        result = await pipeline.process_query(request.query, request.context)
+        # Abandon the pipeline run if the client hangs up before it finishes
+        result = await run_until_disconnected(
+            _get_pipeline().process_query(
+                request.query, request.context, use_cache=request.use_cache, sub_queries=request.sub_queries
+            ),
+            raw_request.is_disconnected,
+        )
         return result
+    except ClientDisconnected:
+        return Response(status_code=499)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/cache/stats")
+async def cache_stats():
+    """Hit/miss counters for the pipeline response cache."""
+    cache = _get_pipeline().response_cache
+    return cache.stats() if cache is not None else {"enabled": False}
+
+
+@app.get("/evaluations/{evaluation_id}")
+async def get_evaluation(evaluation_id: str):
+    """Result of a background evaluation returned as ``evaluation.id`` by /query."""
+    result = _get_pipeline().evaluations.result(evaluation_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Evaluation not found")
+    return result
+
+
+@app.post("/query/stream")
+async def stream_query(request: QueryRequest):
+    """Stream the pipeline answer as Server-Sent Events."""
+    pipeline = _get_pipeline()
+
+    async def event_source():
+        async for event in pipeline.stream_query(request.query, request.context, use_cache=request.use_cache):
+            yield sse_event(event)
+
+    return StreamingResponse(event_source(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+async def _websocket_audio(websocket: WebSocket):
+    """Binary frames of 16 kHz mono PCM16 audio until ``{"type": "end"}`` or a disconnect."""
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            return
+        if message.get("bytes"):
+            yield message["bytes"]
+        elif message.get("text") and json.loads(message["text"]).get("type") == "end":
+            return
+
+
+@app.websocket("/ws/transcribe")
+async def transcribe_websocket(websocket: WebSocket):
+    """Live transcription: stream PCM16 audio in, receive ``partial`` events per
+    utterance as it is transcribed, then a ``final`` event."""
+    await websocket.accept()
+    pipeline = _get_pipeline()
+    voice = await aget(pipeline, "voice_processor", pipeline.stages.executor)
+    if not hasattr(voice, "stream_speech_to_text"):
+        await websocket.send_json({"type": "error", "detail": "Speech-to-text is not available"})
+        await websocket.close()
+        return
+    try:
+        async for event in voice.stream_speech_to_text(_websocket_audio(websocket)):
+            await websocket.send_json(event)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+
+
+@app.websocket("/voice")
+async def voice_websocket(websocket: WebSocket):
+    """Voice round trip: stream PCM16 audio in; each utterance is answered by the
+    pipeline and spoken back sentence by sentence.
+
+    Per turn the server sends a ``transcript`` event, then for every sentence an
+    ``audio`` event followed by a binary frame with its audio, then ``turn_end``
+    with the per-stage latency. ``end`` follows once the audio has ended.
+    """
+    await websocket.accept()
+    pipeline = _get_pipeline()
+    voice = await aget(pipeline, "voice_processor", pipeline.stages.executor)
+    if not (hasattr(voice, "stream_speech_to_text") and hasattr(voice, "stream_text_to_speech")):
+        await websocket.send_json({"type": "error", "detail": "Voice processing is not available"})
+        await websocket.close()
+        return
+    conversation = VoiceConversation(voice, pipeline.stream_query)
+    try:
+        async for event in conversation.run(_websocket_audio(websocket)):
+            if event["type"] == "audio":
+                audio = event["audio"]
+                await websocket.send_json({**{k: v for k, v in event.items() if k != "audio"}, "bytes": len(audio)})
+                await websocket.send_bytes(audio)
+            else:
+                await websocket.send_json(event)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8003)
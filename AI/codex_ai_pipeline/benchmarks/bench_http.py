@@ -0,0 +1,83 @@
+"""/chat and /query throughput under concurrent load.
+
+Both FastAPI apps are driven in-process through httpx's ASGI transport. /chat
+talks to the real provider clients, pointed at a local fake LLM server.
+"""
+import asyncio
+import importlib.util
+import os
+import time
+from typing import Any, Dict, List
+
+from src.llm.providers import close_provider_pools
+
+from .common import PROJECT_ROOT, latency_summary, patched_env, skipped, stopwatch
+from .fake_llm import FakeLLMServer
+
+
+def _load_app(filename: str, module_name: str):
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(PROJECT_ROOT, "api", filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.app
+
+
+async def _load(app, path: str, payloads: List[Dict[str, Any]], concurrency: int) -> Dict[str, Any]:
+    import httpx
+
+    semaphore = asyncio.Semaphore(concurrency)
+    samples: List[float] = []
+    errors = 0
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60) as client:
+        async def one(payload):
+            nonlocal errors
+            async with semaphore:
+                with stopwatch(samples):
+                    response = await client.post(path, json=payload)
+                if response.status_code != 200:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(p) for p in payloads))
+        elapsed = time.perf_counter() - started
+    # Provider clients are bound to this event loop; close them before it goes away
+    await close_provider_pools()
+
+    return {
+        "requests": len(payloads),
+        "concurrency": concurrency,
+        "errors": errors,
+        "rps": round(len(payloads) / elapsed, 1),
+        **latency_summary(samples),
+    }
+
+
+def run(quick: bool = False) -> Dict[str, Any]:
+    try:
+        import httpx  # noqa: F401
+    except ImportError:
+        return skipped("httpx is not installed")
+
+    requests = 100 if quick else 1000
+    results: Dict[str, Any] = {}
+    with FakeLLMServer(latency=0.02) as server, patched_env(
+        ANTHROPIC_API_KEY="bench-anthropic",
+        ANTHROPIC_BASE_URL=server.url,
+        OPENAI_API_KEY="bench-openai",
+        OPENAI_BASE_URL=f"{server.url}/v1",
+        EVAL_SAMPLE_RATE="0",
+    ):
+        chat_app = _load_app("AI Pipeline.py", "bench_chat_app")
+        query_app = _load_app("main.py", "bench_query_app")
+
+        for concurrency in (1, 16, 64):
+            results[f"chat_c{concurrency}"] = asyncio.run(_load(
+                chat_app, "/chat", [{"message": f"What is condition {i}?"} for i in range(requests)], concurrency
+            ))
+            results[f"query_c{concurrency}"] = asyncio.run(_load(
+                query_app, "/query",
+                [{"query": f"What is condition {i}?", "use_cache": False} for i in range(requests)],
+                concurrency,
+            ))
+    return results
@@ -0,0 +1,76 @@
+"""DocumentProcessor ingestion throughput on generated PDFs.
+
+Needs the ingestion dependencies (langchain, pypdf, chromadb). The collection
+embeds with the hashing embedder from ``bench_vector_search`` so no model is
+downloaded.
+"""
+import os
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from .bench_vector_search import HashEmbedder
+from .common import skipped
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: str, pages: List[str]) -> None:
+    """Write a minimal text-only PDF, one line of text per page."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        stream = f"BT /F1 10 Tf 40 750 Td ({_escape(text)}) Tj ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def run(quick: bool = False) -> Dict[str, Any]:
+    try:
+        import chromadb
+        from src.rag.document_processor import DocumentProcessor
+    except ImportError as e:
+        return skipped(f"ingestion dependencies missing: {e}")
+
+    files, pages_per_file = (10, 5) if quick else (100, 20)
+    results: Dict[str, Any] = {"files": files, "pages_per_file": pages_per_file}
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(files):
+            path = os.path.join(tmp, f"guideline_{i}.pdf")
+            write_pdf(path, [f"Guideline {i} page {p}: " + "monitor blood pressure and adjust dosing " * 8
+                             for p in range(pages_per_file)])
+            paths.append(path)
+
+        for workers in (0, os.cpu_count() or 1):
+            processor = DocumentProcessor(persist_dir=os.path.join(tmp, f"index_{workers}"))
+            processor.collection = chromadb.EphemeralClient().create_collection(
+                f"bench_ingest_{workers}_{time.time_ns()}", embedding_function=HashEmbedder()
+            )
+            stats = processor.ingest(paths, batch_size=256, max_workers=workers)
+            results[f"workers_{workers}"] = {
+                "seconds": round(stats.seconds, 3),
+                "pages_per_second": round(stats.pages_per_second, 1),
+                "chunks_per_second": round(stats.chunks_per_second, 1),
+                "failed": stats.failed,
+            }
+    return results
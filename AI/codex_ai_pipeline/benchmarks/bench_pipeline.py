@@ -0,0 +1,75 @@
+"""CodexAIPipeline start-up (construction, then warm-up of the lazy components) and
+per-stage process_query latency (mock LLM)."""
+import asyncio
+import time
+from typing import Any, Dict, List
+
+from .common import latency_summary, stopwatch
+
+from src.pipeline.main_pipeline import CodexAIPipeline
+
+CONFIG = {
+    "model_name": "gpt-3.5-turbo",
+    "temperature": 0.0,
+    "max_tokens": 256,
+    "use_mock_llm": True,
+    "evaluation_sample_rate": 0.0,
+}
+
+
+def bench_construction(repeats: int = 5) -> Dict[str, Any]:
+    construct: List[float] = []
+    warm_up: List[float] = []
+    for _ in range(repeats):
+        with stopwatch(construct):
+            pipeline = CodexAIPipeline(dict(CONFIG))
+        with stopwatch(warm_up):
+            pipeline.warm_up()
+        pipeline.close()
+    return {"construct": latency_summary(construct), "warm_up": latency_summary(warm_up)}
+
+
+async def _bench_stages(pipeline: CodexAIPipeline, queries: List[str]) -> Dict[str, Any]:
+    stages: Dict[str, List[float]] = {"retrieval": [], "agents": [], "end_to_end": [], "cached": []}
+    for query in queries:
+        with stopwatch(stages["retrieval"]):
+            context = await pipeline._retrieve_context(query)
+        with stopwatch(stages["agents"]):
+            await pipeline._run_agents(query, context)
+        with stopwatch(stages["end_to_end"]):
+            await pipeline.process_query(query)
+        with stopwatch(stages["cached"]):
+            await pipeline.process_query(query)
+    return {name: latency_summary(samples) for name, samples in stages.items()}
+
+
+async def _bench_concurrent(pipeline: CodexAIPipeline, queries: List[str], concurrency: int) -> Dict[str, Any]:
+    semaphore = asyncio.Semaphore(concurrency)
+    samples: List[float] = []
+
+    async def one(query: str):
+        async with semaphore:
+            with stopwatch(samples):
+                await pipeline.process_query(query, use_cache=False)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(q) for q in queries))
+    elapsed = time.perf_counter() - started
+    return {"concurrency": concurrency, "qps": round(len(queries) / elapsed, 1), **latency_summary(samples)}
+
+
+def run(quick: bool = False) -> Dict[str, Any]:
+    n = 50 if quick else 500
+    queries = [f"What are the treatment options for condition {i}?" for i in range(n)]
+    pipeline = CodexAIPipeline(dict(CONFIG))
+
+    async def main():
+        try:
+            return {
+                "stages": await _bench_stages(pipeline, queries[: n // 5]),
+                "concurrent": await _bench_concurrent(pipeline, queries, concurrency=16),
+            }
+        finally:
+            await pipeline.aclose()
+
+    return {"construction": bench_construction(3 if quick else 10), **asyncio.run(main())}
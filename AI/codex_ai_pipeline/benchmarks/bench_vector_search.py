@@ -0,0 +1,137 @@
+"""VectorSearch throughput at several corpus sizes.
+
+Uses an in-memory Chroma collection when chromadb is installed and a brute
+force numpy collection otherwise. Embeddings come from a deterministic
+feature-hashing embedder, so no model download is needed; the numbers
+measure the search path (caching, batching, index lookup), not the encoder.
+"""
+import asyncio
+import hashlib
+import time
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+from .common import latency_summary, stopwatch
+
+from src.rag.vector_search import VectorSearch
+
+DIMENSIONS = 384
+
+
+class HashEmbedder:
+    """Feature-hashing bag of words, L2-normalized."""
+
+    def __init__(self, dimensions: int = DIMENSIONS, cost_seconds: float = 0.0):
+        self.dimensions = dimensions
+        # Optional per-call delay to mimic a real encoder's fixed overhead
+        self.cost_seconds = cost_seconds
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        if self.cost_seconds:
+            time.sleep(self.cost_seconds)
+        vectors = np.zeros((len(texts), self.dimensions), dtype="float32")
+        for row, text in enumerate(texts):
+            for token in text.lower().split():
+                bucket = int.from_bytes(hashlib.blake2b(token.encode(), digest_size=4).digest(), "little")
+                vectors[row, bucket % self.dimensions] += 1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        return self.encode(list(input)).tolist()
+
+
+class NumpyCollection:
+    """Brute-force cosine search with Chroma's ``query`` result shape."""
+
+    def __init__(self):
+        self._ids: List[str] = []
+        self._documents: List[str] = []
+        self._matrix = np.zeros((0, DIMENSIONS), dtype="float32")
+
+    def add(self, ids, embeddings, documents):
+        self._ids.extend(ids)
+        self._documents.extend(documents)
+        self._matrix = np.vstack([self._matrix, np.asarray(embeddings, dtype="float32")])
+
+    def query(self, query_embeddings, n_results=5):
+        scores = np.asarray(query_embeddings, dtype="float32") @ self._matrix.T
+        top = np.argsort(-scores, axis=1)[:, :n_results]
+        return {
+            "ids": [[self._ids[i] for i in row] for row in top],
+            "documents": [[self._documents[i] for i in row] for row in top],
+            "distances": [[float(1 - scores[q, i]) for i in row] for q, row in enumerate(top)],
+        }
+
+
+def _corpus(size: int) -> List[str]:
+    topics = ["hypertension", "diabetes", "asthma", "migraine", "anemia", "arthritis", "sepsis", "stroke"]
+    return [
+        f"Guideline {i} on {topics[i % len(topics)]} dosing, monitoring and follow-up care section {i // 7}"
+        for i in range(size)
+    ]
+
+
+def _collection(size: int, embedder: HashEmbedder):
+    try:
+        import chromadb
+
+        client = chromadb.EphemeralClient()
+        collection = client.create_collection(f"bench_{size}_{time.time_ns()}", embedding_function=embedder)
+        backend = "chroma"
+    except ImportError:
+        collection = NumpyCollection()
+        backend = "numpy"
+    documents = _corpus(size)
+    for start in range(0, size, 5000):
+        batch = documents[start:start + 5000]
+        collection.add(
+            ids=[str(i) for i in range(start, start + len(batch))],
+            embeddings=embedder.encode(batch).tolist(),
+            documents=batch,
+        )
+    return collection, backend
+
+
+def _bench_size(size: int, queries: List[str]) -> Dict[str, Any]:
+    # 2ms per encode call approximates MiniLM's fixed per-batch overhead on CPU
+    embedder = HashEmbedder(cost_seconds=0.002)
+    collection, backend = _collection(size, embedder)
+    result: Dict[str, Any] = {"backend": backend}
+
+    search = VectorSearch(embedder=embedder, collection=collection)
+    samples: List[float] = []
+    started = time.perf_counter()
+    for query in queries:
+        with stopwatch(samples):
+            search.search(query)
+    result["sequential"] = {"qps": round(len(queries) / (time.perf_counter() - started), 1), **latency_summary(samples)}
+
+    # Second pass over the same queries is served from the embedding cache
+    started = time.perf_counter()
+    for query in queries:
+        search.search(query)
+    result["sequential_cached"] = {"qps": round(len(queries) / (time.perf_counter() - started), 1)}
+
+    search = VectorSearch(embedder=embedder, collection=collection)
+    started = time.perf_counter()
+    for start in range(0, len(queries), 32):
+        search.search_many(queries[start:start + 32])
+    result["search_many_32"] = {"qps": round(len(queries) / (time.perf_counter() - started), 1)}
+
+    search = VectorSearch(embedder=embedder, collection=collection)
+
+    async def concurrent():
+        started = time.perf_counter()
+        await asyncio.gather(*(search.asearch(q) for q in queries))
+        return time.perf_counter() - started
+
+    result["asearch_concurrent"] = {"qps": round(len(queries) / asyncio.run(concurrent()), 1)}
+    return result
+
+
+def run(quick: bool = False) -> Dict[str, Any]:
+    sizes = [1000, 5000] if quick else [1000, 10000, 50000]
+    queries = [f"recommended dosing for hypertension patient {i}" for i in range(100 if quick else 500)]
+    return {str(size): _bench_size(size, queries) for size in sizes}
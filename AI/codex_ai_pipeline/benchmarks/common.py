@@ -0,0 +1,72 @@
+import os
+import platform
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Sequence
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.evaluation.batch_eval import percentile
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def latency_summary(samples: Sequence[float]) -> Dict[str, Any]:
+    """Milliseconds: count, mean and tail percentiles."""
+    ms = [s * 1000 for s in samples]
+    return {
+        "count": len(ms),
+        "mean_ms": round(sum(ms) / len(ms), 3) if ms else None,
+        "p50_ms": _round(percentile(ms, 50)),
+        "p95_ms": _round(percentile(ms, 95)),
+        "p99_ms": _round(percentile(ms, 99)),
+    }
+
+
+def _round(value):
+    return round(value, 3) if value is not None else None
+
+
+@contextmanager
+def stopwatch(samples: List[float]) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        samples.append(time.perf_counter() - started)
+
+
+@contextmanager
+def patched_env(**values: str) -> Iterator[None]:
+    previous = {key: os.environ.get(key) for key in values}
+    os.environ.update(values)
+    try:
+        yield
+    finally:
+        for key, value in previous.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+def environment_info() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def skipped(reason: str) -> Dict[str, Any]:
+    return {"skipped": reason}
@@ -0,0 +1,75 @@
+"""Local stand-in for the Anthropic and OpenAI HTTP APIs, with fixed latency.
+
+Lets the HTTP benchmarks exercise the real provider clients without network
+access or API keys.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _FakeLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Buffer headers and body into one write so Nagle's algorithm does not add latency
+    wbufsize = 1 << 16
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        time.sleep(self.server.latency)
+
+        if self.path.endswith("/messages"):
+            payload = {
+                "id": "msg_fake", "type": "message", "role": "assistant",
+                "model": body["model"], "stop_reason": "end_turn", "stop_sequence": None,
+                "content": [{"type": "text", "text": "This is a benchmark reply."}],
+                "usage": {"input_tokens": 10, "output_tokens": 6},
+            }
+        elif self.path.endswith("/chat/completions"):
+            payload = {
+                "id": "chatcmpl-fake", "object": "chat.completion", "created": 0,
+                "model": body["model"],
+                "choices": [{
+                    "index": 0, "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": "This is a benchmark reply."},
+                }],
+                "usage": {"prompt_tokens": 10, "completion_tokens": 6, "total_tokens": 16},
+            }
+        else:
+            self.send_error(404)
+            return
+
+        data = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 drops connections under load and adds 1s SYN retries
+    request_queue_size = 256
+
+
+class FakeLLMServer:
+    def __init__(self, latency: float = 0.02):
+        self._server = _Server(("127.0.0.1", 0), _FakeLLMHandler)
+        self._server.latency = latency
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def __enter__(self) -> "FakeLLMServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
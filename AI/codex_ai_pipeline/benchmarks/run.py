@@ -0,0 +1,81 @@
+"""Run the benchmark suite and emit JSON.
+
+    python -m benchmarks.run --out reports/bench.json
+    python -m benchmarks.run --quick --only pipeline vector_search
+    python -m benchmarks.run --out new.json --baseline reports/bench.json
+
+Everything runs offline: the pipeline uses the mock LLM and the HTTP
+benchmarks use a local fake LLM server.
+"""
+import argparse
+import json
+import os
+import time
+import traceback
+from typing import Any, Dict, Iterable, Tuple
+
+from . import bench_http, bench_ingestion, bench_pipeline, bench_vector_search
+from .common import environment_info
+
+SUITES = {
+    "pipeline": bench_pipeline.run,
+    "ingestion": bench_ingestion.run,
+    "vector_search": bench_vector_search.run,
+    "http": bench_http.run,
+}
+
+
+def run_suites(names: Iterable[str], quick: bool = False) -> Dict[str, Any]:
+    report: Dict[str, Any] = {"environment": environment_info(), "quick": quick, "results": {}}
+    for name in names:
+        started = time.perf_counter()
+        try:
+            result = SUITES[name](quick=quick)
+        except Exception as e:
+            traceback.print_exc()
+            result = {"error": str(e)}
+        if isinstance(result, dict):
+            result["suite_seconds"] = round(time.perf_counter() - started, 2)
+        report["results"][name] = result
+        print(f"{name}: done in {time.perf_counter() - started:.1f}s")
+    return report
+
+
+def _flatten(data: Any, prefix: str = "") -> Iterable[Tuple[str, float]]:
+    if isinstance(data, dict):
+        for key, value in data.items():
+            yield from _flatten(value, f"{prefix}.{key}" if prefix else key)
+    elif isinstance(data, (int, float)) and not isinstance(data, bool):
+        yield prefix, data
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any]) -> str:
+    """Side-by-side table of every numeric metric present in both reports."""
+    old = dict(_flatten(baseline.get("results", {})))
+    lines = [f"{'metric':60} {'baseline':>12} {'current':>12} {'change':>8}"]
+    for key, value in _flatten(current.get("results", {})):
+        if key not in old or key.endswith("suite_seconds"):
+            continue
+        change = f"{(value - old[key]) / old[key] * 100:+.1f}%" if old[key] else "n/a"
+        lines.append(f"{key:60} {old[key]:>12} {value:>12} {change:>8}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the Codex AI Pipeline benchmark suite")
+    parser.add_argument("--only", nargs="+", choices=sorted(SUITES), default=list(SUITES))
+    parser.add_argument("--quick", action="store_true", help="smaller workloads for a fast sanity run")
+    parser.add_argument("--out", default=None, help="write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", default=None, help="earlier JSON report to compare against")
+    args = parser.parse_args()
+
+    report = run_suites(args.only, quick=args.quick)
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            print(compare(json.load(f), report))
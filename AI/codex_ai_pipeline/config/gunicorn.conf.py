@@ -0,0 +1,43 @@
+"""Pre-fork gunicorn setup: models load once in the master and are shared by the workers.
+
+    PRELOAD_MODELS=embedder:all-MiniLM-L6-v2,whisper:base \\
+        gunicorn -c config/gunicorn.conf.py api.main:app
+
+Run from the project root. Workers are forked after ``on_starting`` has
+loaded the weights, so they share them copy-on-write; each worker then runs
+its own warm-up inference in ``post_fork``.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+worker_class = "uvicorn.workers.UvicornWorker"
+# Import the app in the master too, so module-level setup is shared as well
+preload_app = True
+
+
+def on_starting(server):
+    from src.serving.model_registry import preload_from_env
+
+    for name, stats in preload_from_env().items():
+        server.log.info("Preloaded %s in %ss", name, stats["load_seconds"])
+
+
+def post_fork(server, worker):
+    # Every worker has its own torch thread pool; cap it so the workers do not oversubscribe the cores
+    threads = os.getenv("MODEL_THREADS_PER_WORKER")
+    if threads:
+        try:
+            import torch
+
+            torch.set_num_threads(int(threads))
+        except ImportError:
+            pass
+
+    from src.serving.model_registry import get_registry
+
+    for name, stats in get_registry().warm_up().items():
+        server.log.info("Worker %s warmed up %s in %ss", worker.pid, name, stats.get("warm_up_seconds"))
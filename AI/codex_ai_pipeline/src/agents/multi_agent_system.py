@@ -1,42 +1,183 @@
+import asyncio
+import inspect
+from contextlib import nullcontext
+from functools import lru_cache
+from typing import Any, AsyncIterator, Awaitable, Dict, List, Optional, Union
+
 from langchain.agents import AgentExecutor, create_openai_functions_agent
 from langchain.tools import Tool
 from langchain.prompts import ChatPromptTemplate
 
+from .workflow import WorkflowStep, run_workflow
+
+_SYSTEM_PROMPTS = {
+    "research": "You are a research agent. Use tools to gather information.",
+    "grounded_research": (
+        "You are a research agent. Answer from the retrieved context you are given; "
+        "use tools only for information the context does not cover."
+    ),
+    "analysis": "You are an analysis agent. Analyze information and provide insights.",
+}
+
+
+@lru_cache(maxsize=None)
+def _agent_prompt(role: str) -> ChatPromptTemplate:
+    # Prompt templates are immutable, so every MultiAgentSystem shares one per role
+    return ChatPromptTemplate.from_messages([
+        ("system", _SYSTEM_PROMPTS[role]),
+        ("user", "{input}"),
+        ("placeholder", "{agent_scratchpad}")
+    ])
+
+
+def _analysis_input(research: Dict[str, Any]) -> str:
+    if len(research) == 1:
+        return f"Analyze this research: {next(iter(research.values()))}"
+    sections = [f"[{name}]\n{_output(result)}" for name, result in research.items()]
+    return "Analyze this research:\n\n" + "\n\n".join(sections)
+
+
+def _research_input(query: str, context: Optional[str]) -> str:
+    if not context:
+        return query
+    return f"Retrieved context:\n{context}\n\nQuestion: {query}"
+
+
+def _output(result: Any) -> str:
+    if isinstance(result, dict):
+        return str(result.get("output", result))
+    return str(result)
+
+
 class MultiAgentSystem:
-    def __init__(self, llm, tools):
+    def __init__(self, llm, tools, max_concurrency: int = 4, monitor=None):
         self.llm = llm
         self.tools = tools
+        self.max_concurrency = max_concurrency
+        self.monitor = monitor
         self.setup_agents()
-    
+
+    def _timed(self, stage: str):
+        return self.monitor.stage(stage) if self.monitor is not None else nullcontext()
+
     def setup_agents(self):
         # Research Agent
-        research_prompt = ChatPromptTemplate.from_messages([
-            ("system", "You are a research agent. Use tools to gather information."),
-            ("user", "{input}"),
-            ("placeholder", "{agent_scratchpad}")
-        ])
-        
-        self.research_agent = create_openai_functions_agent(
-            self.llm, self.tools, research_prompt
+        self.research_agent = AgentExecutor(
+            agent=create_openai_functions_agent(self.llm, self.tools, _agent_prompt("research")),
+            tools=self.tools,
+        )
+
+        # Research and analysis agents for pre-retrieved context; without the
+        # vector_search tool they cannot repeat the retrieval the pipeline already did
+        grounded_tools = [tool for tool in self.tools if getattr(tool, "name", None) != "vector_search"]
+        self.grounded_research_agent = AgentExecutor(
+            agent=create_openai_functions_agent(self.llm, grounded_tools, _agent_prompt("grounded_research")),
+            tools=grounded_tools,
         )
-        
+
         # Analysis Agent
-        analysis_prompt = ChatPromptTemplate.from_messages([
-            ("system", "You are an analysis agent. Analyze information and provide insights."),
-            ("user", "{input}"),
-            ("placeholder", "{agent_scratchpad}")
-        ])
-        
-        self.analysis_agent = create_openai_functions_agent(
-            self.llm, self.tools, analysis_prompt
+        self.analysis_agent = AgentExecutor(
+            agent=create_openai_functions_agent(self.llm, self.tools, _agent_prompt("analysis")),
+            tools=self.tools,
         )
-    
+        self.grounded_analysis_agent = AgentExecutor(
+            agent=create_openai_functions_agent(self.llm, grounded_tools, _agent_prompt("analysis")),
+            tools=grounded_tools,
+        )
+
     def execute_workflow(self, query: str):
         # Step 1: Research
-        research_result = self.research_agent.invoke({"input": query})
-        
+        with self._timed("agent_research"):
+            research_result = self.research_agent.invoke({"input": query})
+
         # Step 2: Analysis
         analysis_input = f"Analyze this research: {research_result}"
-        analysis_result = self.analysis_agent.invoke({"input": analysis_input})
-        
+        with self._timed("agent_analysis"):
+            analysis_result = self.analysis_agent.invoke({"input": analysis_input})
+
+        return analysis_result
+
+    def _workflow_steps(
+        self,
+        query: str,
+        sub_queries: Optional[List[str]],
+        context: Optional[str] = None,
+    ) -> List[WorkflowStep]:
+        research_queries = sub_queries or [query]
+        agent = self.grounded_research_agent if context else self.research_agent
+        analysis_agent = self.grounded_analysis_agent if context else self.analysis_agent
+
+        def research(sub_query: str):
+            async def run(_: Dict[str, Any]):
+                with self._timed("agent_research"):
+                    return await agent.ainvoke({"input": _research_input(sub_query, context)})
+            return run
+
+        research_steps = [
+            WorkflowStep(name=f"research_{i}", run=research(q)) for i, q in enumerate(research_queries)
+        ]
+
+        async def analysis(results: Dict[str, Any]):
+            with self._timed("agent_analysis"):
+                return await analysis_agent.ainvoke({"input": _analysis_input(results)})
+
+        return research_steps + [WorkflowStep(
+            name="analysis",
+            run=analysis,
+            depends_on=tuple(step.name for step in research_steps),
+        )]
+
+    async def aexecute_workflow(
+        self,
+        query: str,
+        sub_queries: Optional[List[str]] = None,
+        context: Union[str, Awaitable[Optional[str]], None] = None,
+    ):
+        """Async workflow: research sub-queries run concurrently, then analysis.
+
+        ``context`` is retrieved text, or an awaitable for retrieval still in
+        flight; research is grounded in it instead of searching again.
+        Returns the analysis result, with the research outputs under ``research``.
+        """
+        # Every research step needs the context, so wait for retrieval here rather
+        # than in a step that would hold a concurrency slot while it waits
+        if inspect.isawaitable(context):
+            context = await context
+        results = await run_workflow(
+            self._workflow_steps(query, sub_queries, context), max_concurrency=self.max_concurrency
+        )
+        analysis_result = results.pop("analysis")
+        if isinstance(analysis_result, dict):
+            return {**analysis_result, "research": {k: _output(v) for k, v in results.items()}}
         return analysis_result
+
+    async def astream_workflow(
+        self, query: str, sub_queries: Optional[List[str]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Yield a ``step`` event as each research step finishes, then the
+        analysis agent's chunks as soon as research is complete."""
+        events: asyncio.Queue = asyncio.Queue()
+        research_steps = self._workflow_steps(query, sub_queries)[:-1]
+
+        research_task = asyncio.ensure_future(run_workflow(
+            research_steps,
+            max_concurrency=self.max_concurrency,
+            on_step_complete=lambda name, result: events.put_nowait(
+                {"type": "step", "step": name, "output": _output(result)}
+            ),
+        ))
+        try:
+            for _ in research_steps:
+                getter = asyncio.ensure_future(events.get())
+                done, _ = await asyncio.wait({getter, research_task}, return_when=asyncio.FIRST_COMPLETED)
+                if getter not in done:
+                    getter.cancel()
+                    research_task.result()  # re-raises the research failure
+                yield getter.result()
+            research = await research_task
+        finally:
+            research_task.cancel()
+
+        with self._timed("agent_analysis"):
+            async for chunk in self.analysis_agent.astream({"input": _analysis_input(research)}):
+                yield {"type": "analysis", "chunk": chunk}
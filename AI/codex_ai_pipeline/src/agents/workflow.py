@@ -0,0 +1,77 @@
+"""Minimal async DAG runner for agent workflows.
+
+Each step starts as soon as every step it depends on has finished, so
+independent steps (e.g. several research sub-queries) run concurrently.
+A semaphore caps how many steps execute at once.
+"""
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+
+@dataclass(frozen=True)
+class WorkflowStep:
+    name: str
+    # Receives the results of the steps listed in ``depends_on``
+    run: Callable[[Dict[str, Any]], Awaitable[Any]]
+    depends_on: Tuple[str, ...] = ()
+
+
+def _topological_order(steps: Sequence[WorkflowStep]) -> List[WorkflowStep]:
+    by_name = {step.name: step for step in steps}
+    if len(by_name) != len(steps):
+        raise ValueError("Workflow step names must be unique")
+    for step in steps:
+        missing = [d for d in step.depends_on if d not in by_name]
+        if missing:
+            raise ValueError(f"Step '{step.name}' depends on unknown steps: {missing}")
+
+    ordered: List[WorkflowStep] = []
+    remaining = {step.name: set(step.depends_on) for step in steps}
+    while remaining:
+        ready = [name for name, deps in remaining.items() if not deps]
+        if not ready:
+            raise ValueError(f"Workflow has a dependency cycle among: {sorted(remaining)}")
+        for name in ready:
+            ordered.append(by_name[name])
+            del remaining[name]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+    return ordered
+
+
+async def run_workflow(
+    steps: Sequence[WorkflowStep],
+    max_concurrency: int = 4,
+    on_step_complete: Optional[Callable[[str, Any], None]] = None,
+) -> Dict[str, Any]:
+    """Run ``steps`` respecting dependencies; return results keyed by step name.
+
+    If any step fails, the steps that have not finished are cancelled and the
+    error is raised.
+    """
+    ordered = _topological_order(steps)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    tasks: Dict[str, asyncio.Task] = {}
+
+    async def run_step(step: WorkflowStep) -> Any:
+        inputs = {}
+        for dep in step.depends_on:
+            inputs[dep] = await tasks[dep]
+        # Only hold a concurrency slot while actually running, not while waiting on deps
+        async with semaphore:
+            result = await step.run(inputs)
+        if on_step_complete is not None:
+            on_step_complete(step.name, result)
+        return result
+
+    for step in ordered:
+        tasks[step.name] = asyncio.ensure_future(run_step(step))
+
+    try:
+        await asyncio.gather(*tasks.values())
+    except BaseException:
+        for task in tasks.values():
+            task.cancel()
+        raise
+    return {name: task.result() for name, task in tasks.items()}
@@ -0,0 +1,172 @@
+"""Sampled, batched response evaluation off the request path.
+
+``EvaluationQueue.submit`` decides whether to grade a response (``sample_rate``)
+and enqueues it without waiting. A worker task on the event loop groups
+queued jobs into batches of up to ``batch_size`` (or whatever arrived within
+``flush_interval`` seconds) and grades each batch with a single
+``evaluate_batch`` call on a worker thread. Results are kept in a bounded
+map for polling and passed to an optional per-job callback, e.g. to attach
+them to a chat session.
+"""
+import asyncio
+import random
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from ..monitoring.tracing import detach_trace
+
+Item = Tuple[str, str, str]
+
+
+@dataclass
+class EvaluationJob:
+    id: str
+    question: str
+    answer: str
+    reference: str
+    on_result: Optional[Callable[[Dict[str, Any]], None]] = None
+
+
+async def _to_thread(func: Callable[..., Any], *args: Any) -> Any:
+    return await asyncio.to_thread(func, *args)
+
+
+class EvaluationQueue:
+    def __init__(
+        self,
+        evaluator=None,
+        sample_rate: float = 0.1,
+        batch_size: int = 8,
+        flush_interval: float = 2.0,
+        max_pending: int = 1000,
+        max_results: int = 1000,
+        run_blocking: Callable[..., Awaitable[Any]] = _to_thread,
+        rng: Callable[[], float] = random.random,
+        evaluator_factory: Optional[Callable[[], Any]] = None,
+    ):
+        # evaluator_factory defers building the evaluator to the first batch (on the worker thread)
+        self.evaluator = evaluator
+        self._evaluator_factory = evaluator_factory
+        self.sample_rate = sample_rate
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_results = max_results
+        self._run_blocking = run_blocking
+        self._rng = rng
+        self._results: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop = None
+        self._stats = {"submitted": 0, "skipped": 0, "dropped": 0, "completed": 0, "failed": 0}
+
+    def _bind_loop(self) -> asyncio.Queue:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Queues and tasks belong to one loop; start over on a new one
+            self._loop = loop
+            self._queue = asyncio.Queue(self.max_pending)
+            self._worker = None
+        if self._worker is None or self._worker.done():
+            self._worker = loop.create_task(self._run())
+        return self._queue
+
+    def submit(
+        self,
+        question: str,
+        answer: str,
+        reference: str,
+        on_result: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> Optional[str]:
+        """Queue a sampled response for grading; returns the job id, or None if
+        it was not sampled or the queue is full. Never waits."""
+        if self.sample_rate <= 0 or self._rng() >= self.sample_rate:
+            self._stats["skipped"] += 1
+            return None
+        job = EvaluationJob(str(uuid.uuid4()), question, answer, reference, on_result)
+        try:
+            self._bind_loop().put_nowait(job)
+        except asyncio.QueueFull:
+            self._stats["dropped"] += 1
+            return None
+        self._stats["submitted"] += 1
+        self._record(job.id, {"status": "pending"})
+        return job.id
+
+    def result(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self._results.get(job_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self._stats, pending=self._queue.qsize() if self._queue is not None else 0)
+
+    def _record(self, job_id: str, result: Dict[str, Any]) -> None:
+        self._results[job_id] = result
+        self._results.move_to_end(job_id)
+        while len(self._results) > self.max_results:
+            self._results.popitem(last=False)
+
+    async def _next_batch(self) -> List[EvaluationJob]:
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        # The worker outlives the request that started it; its spans get their own traces
+        detach_trace()
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self._evaluate(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _evaluate(self, batch: List[EvaluationJob]) -> None:
+        items = [(job.question, job.answer, job.reference) for job in batch]
+        try:
+            results = await self._run_blocking(self._evaluate_batch, items)
+            self._stats["completed"] += len(batch)
+        except Exception as e:
+            results = [{"score": None, "error": f"Evaluation failed: {e}"}] * len(batch)
+            self._stats["failed"] += len(batch)
+
+        for job, result in zip(batch, results):
+            self._record(job.id, {"status": "done", **result})
+            if job.on_result is not None:
+                try:
+                    job.on_result(result)
+                except Exception as e:
+                    print(f"Evaluation callback failed: {e}")
+
+    def _evaluate_batch(self, items: List[Item]) -> List[Dict[str, Any]]:
+        evaluator = self.evaluator if self.evaluator is not None else self._evaluator_factory()
+        evaluate_batch = getattr(evaluator, "evaluate_batch", None)
+        if evaluate_batch is not None:
+            return evaluate_batch(items)
+        return [evaluator.evaluate_response(*item) for item in items]
+
+    async def drain(self, timeout: Optional[float] = None) -> bool:
+        """Wait for queued jobs to be graded; returns False on timeout."""
+        if self._queue is None or self._loop is not asyncio.get_running_loop():
+            return True
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def aclose(self, timeout: Optional[float] = 5.0) -> None:
+        await self.drain(timeout)
+        if self._worker is not None and self._loop is asyncio.get_running_loop():
+            self._worker.cancel()
+            self._worker = None
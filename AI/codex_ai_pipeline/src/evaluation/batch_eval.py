@@ -0,0 +1,265 @@
+"""Offline batch evaluation of ``CodexAIPipeline`` against a JSONL QA dataset.
+
+Each dataset line is a JSON object with ``question`` (or ``query``) and
+``reference`` (or ``answer``), plus optional ``id`` and ``context``. Items run
+through ``process_query`` and the grader with bounded concurrency. Grades are
+cached in SQLite keyed by (grader, prediction, reference), so a rerun only
+grades answers that changed.
+
+    python -m src.evaluation.batch_eval data/clinical_qa.jsonl --report reports/eval.json
+
+The default ``lexical`` grader (token F1) and the offline pipeline (mock LLM,
+agents and vector search) need no network; ``--grader qa`` uses the LangChain
+QA grader and ``--online`` the configured API keys and the real components.
+Items the pipeline fails on are reported with an ``error`` and not graded.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+_TOKEN = re.compile(r"\w+")
+
+
+def percentile(values: Sequence[float], p: float) -> Optional[float]:
+    """Nearest-rank percentile; None for no values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(p / 100.0 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _distribution(values: Sequence[float]) -> Dict[str, Optional[float]]:
+    return {
+        "mean": sum(values) / len(values) if values else None,
+        "p50": percentile(values, 50),
+        "p90": percentile(values, 90),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values) if values else None,
+    }
+
+
+class LexicalGrader:
+    """Token-overlap F1 between prediction and reference; deterministic and offline."""
+
+    name = "lexical"
+
+    def evaluate_response(self, question: str, answer: str, reference: str) -> Dict[str, Any]:
+        predicted = Counter(_TOKEN.findall(answer.lower()))
+        expected = Counter(_TOKEN.findall(reference.lower()))
+        overlap = sum((predicted & expected).values())
+        if not overlap:
+            f1 = 0.0
+        else:
+            precision = overlap / sum(predicted.values())
+            recall = overlap / sum(expected.values())
+            f1 = 2 * precision * recall / (precision + recall)
+        return {"score": round(f1, 4), "exact_match": answer.strip().lower() == reference.strip().lower()}
+
+
+class GraderCache:
+    """SQLite cache of grader outputs keyed by (grader, prediction, reference)."""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS grades (key TEXT PRIMARY KEY, result TEXT NOT NULL)")
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(grader: str, prediction: str, reference: str) -> str:
+        payload = json.dumps([grader, prediction, reference])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT result FROM grades WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return json.loads(row[0])
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO grades (key, result) VALUES (?, ?)",
+                (key, json.dumps(result, default=str)),
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def load_dataset(path: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    items = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            question = row.get("question", row.get("query"))
+            reference = row.get("reference", row.get("answer"))
+            if question is None or reference is None:
+                raise ValueError(f"{path}:{line_number}: needs 'question' and 'reference'")
+            items.append({
+                "id": str(row.get("id", line_number)),
+                "question": question,
+                "reference": reference,
+                "context": row.get("context"),
+            })
+            if limit is not None and len(items) >= limit:
+                break
+    return items
+
+
+class BatchEvaluator:
+    def __init__(self, pipeline, grader, cache: Optional[GraderCache] = None, concurrency: int = 8):
+        self.pipeline = pipeline
+        self.grader = grader
+        self.grader_name = getattr(grader, "name", type(grader).__name__)
+        self.cache = cache
+        self.concurrency = concurrency
+
+    async def _grade(self, question: str, prediction: str, reference: str) -> Dict[str, Any]:
+        key = GraderCache.key(self.grader_name, prediction, reference)
+        cached = self.cache.get(key) if self.cache is not None else None
+        if cached is not None:
+            return {**cached, "cached": True}
+        result = await asyncio.to_thread(self.grader.evaluate_response, question, prediction, reference)
+        if self.cache is not None:
+            self.cache.put(key, result)
+        return {**result, "cached": False}
+
+    async def _evaluate_item(self, item: Dict[str, Any], semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+        async with semaphore:
+            record = {"id": item["id"], "question": item["question"]}
+            started = time.perf_counter()
+            try:
+                result = await self.pipeline.process_query(
+                    item["question"], item["context"], use_cache=False, evaluate=False
+                )
+                record["pipeline_seconds"] = time.perf_counter() - started
+                # process_query returns failures as an answer ("Error processing query: ...")
+                error = (result.get("evaluation") or {}).get("error")
+                if error is not None:
+                    record["error"] = error
+                    return record
+                record["prediction"] = result["response"]
+
+                started = time.perf_counter()
+                record["grade"] = await self._grade(item["question"], record["prediction"], item["reference"])
+                record["grade_seconds"] = time.perf_counter() - started
+            except Exception as e:
+                record["error"] = str(e)
+            return record
+
+    async def run(self, items: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        semaphore = asyncio.Semaphore(self.concurrency)
+        return await asyncio.gather(*(self._evaluate_item(item, semaphore) for item in items))
+
+    def summarize(self, records: List[Dict[str, Any]], seconds: float) -> Dict[str, Any]:
+        graded = [r for r in records if "grade" in r]
+        scores = [r["grade"]["score"] for r in graded if r["grade"].get("score") is not None]
+        return {
+            "items": len(records),
+            "failed": len(records) - len(graded),
+            "grader": self.grader_name,
+            "concurrency": self.concurrency,
+            "seconds": round(seconds, 3),
+            "items_per_second": round(len(records) / seconds, 2) if seconds else None,
+            "score": _distribution(scores),
+            "pipeline_latency": _distribution([r["pipeline_seconds"] for r in graded]),
+            "grade_latency": _distribution([r["grade_seconds"] for r in graded]),
+            "grader_cache": {
+                "hits": self.cache.hits, "misses": self.cache.misses
+            } if self.cache is not None else None,
+        }
+
+
+def _load_grader(name: str):
+    if name == "lexical":
+        return LexicalGrader()
+    if name == "qa":
+        from .evaluator import PipelineEvaluator
+
+        grader = PipelineEvaluator(log_to_wandb=False)
+        grader.name = "qa"
+        return grader
+    raise ValueError(f"Unknown grader: {name}")
+
+
+def _pipeline_config(online: bool) -> Dict[str, Any]:
+    config = {
+        "model_name": os.getenv("OPENAI_MODEL", "gpt-3.5-turbo"),
+        "temperature": 0.0,
+        "max_tokens": 1000,
+        "response_cache_enabled": False,
+        "evaluation_sample_rate": 0.0,
+    }
+    if online:
+        config["openai_api_key"] = os.getenv("OPENAI_API_KEY")
+        config["anthropic_api_key"] = os.getenv("ANTHROPIC_API_KEY")
+    else:
+        config["use_mock_llm"] = True
+        config["offline"] = True
+    return config
+
+
+async def _main(args) -> Dict[str, Any]:
+    from ..pipeline.main_pipeline import CodexAIPipeline
+
+    items = load_dataset(args.dataset, args.limit)
+    pipeline = CodexAIPipeline(_pipeline_config(args.online))
+    cache = None if args.no_cache else GraderCache(args.cache)
+    evaluator = BatchEvaluator(pipeline, _load_grader(args.grader), cache, args.concurrency)
+
+    started = time.perf_counter()
+    try:
+        records = await evaluator.run(items)
+    finally:
+        await pipeline.aclose()
+    report = evaluator.summarize(records, time.perf_counter() - started)
+    if cache is not None:
+        cache.close()
+
+    if args.results:
+        os.makedirs(os.path.dirname(os.path.abspath(args.results)), exist_ok=True)
+        with open(args.results, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, default=str) + "\n")
+    os.makedirs(os.path.dirname(os.path.abspath(args.report)), exist_ok=True)
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch-evaluate the pipeline on a JSONL QA dataset")
+    parser.add_argument("dataset")
+    parser.add_argument("--report", default="reports/eval_report.json")
+    parser.add_argument("--results", default=None, help="optional per-item JSONL output")
+    parser.add_argument("--grader", choices=["lexical", "qa"], default="lexical")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--cache", default="data/eval_grader_cache.db")
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--online", action="store_true", help="use configured API keys instead of the mock LLM")
+    args = parser.parse_args()
+
+    report = asyncio.run(_main(args))
+    print(json.dumps(report, indent=2))
@@ -1,25 +1,58 @@
+from typing import Any, Dict, List, Tuple
+
 from langsmith import Client
 from langchain.evaluation import load_evaluator
-import wandb
+
+
+def _parse_grade(text: str) -> Dict[str, Any]:
+    # Same shape as StringEvaluator.evaluate_strings output
+    value = text.strip().split()[-1].strip(".").upper() if text.strip() else ""
+    score = {"CORRECT": 1, "INCORRECT": 0}.get(value)
+    return {"reasoning": text.strip(), "value": value, "score": score}
+
 
 class PipelineEvaluator:
-    def __init__(self):
+    def __init__(self, log_to_wandb: bool = True):
         self.client = Client()
         self.evaluator = load_evaluator("qa")
-        wandb.init(project="codex-ai-pipeline")
+        self.log_to_wandb = log_to_wandb
+        self._wandb_run = None
+
+    def _ensure_wandb(self):
+        # Started on first log so constructing an evaluator has no side effects
+        if self._wandb_run is None:
+            import wandb
+
+            self._wandb_run = wandb.init(project="codex-ai-pipeline")
+        return self._wandb_run
     
     def evaluate_response(self, question: str, answer: str, reference: str):
-        result = self.evaluator.evaluate_strings(
-            prediction=answer,
-            reference=reference,
-            input=question
+        return self.evaluate_batch([(question, answer, reference)])[0]
+
+    def evaluate_batch(self, items: List[Tuple[str, str, str]]) -> List[Dict[str, Any]]:
+        """Grade (question, answer, reference) items with one batched chain call
+        and log them to wandb as a single step."""
+        graded = self.evaluator.evaluate(
+            [{"query": question, "answer": reference} for question, _, reference in items],
+            [{"result": answer} for _, answer, _ in items],
         )
-        
+        results = [_parse_grade(g.get("results", "")) for g in graded]
+
+        if self.log_to_wandb:
+            self._log(items, results)
+
+        return results
+
+    def _log(self, items: List[Tuple[str, str, str]], results: List[Dict[str, Any]]) -> None:
         # Log to wandb
+        import wandb
+
+        self._ensure_wandb()
+        scores = [r["score"] for r in results if r["score"] is not None]
         wandb.log({
-            "question": question,
-            "answer": answer,
-            "score": result["score"]
+            "evaluations": wandb.Table(
+                columns=["question", "answer", "score"],
+                data=[[q, a, r["score"]] for (q, a, _), r in zip(items, results)],
+            ),
+            "score": sum(scores) / len(scores) if scores else None,
         })
-        
-        return result
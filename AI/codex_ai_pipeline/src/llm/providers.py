@@ -0,0 +1,397 @@
+"""Process-wide async LLM provider clients.
+
+Each provider owns one long-lived ``AsyncAnthropic``/``AsyncOpenAI`` client
+(and therefore one keep-alive HTTP connection pool) plus a semaphore that caps
+the number of in-flight requests sent to that provider.
+"""
+import asyncio
+import os
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from ..monitoring.monitor import get_monitor
+from ..monitoring.tracing import current_span
+from .router import ProviderRouter, RouterSettings
+
+DEFAULT_ANTHROPIC_MODEL = "claude-3-5-sonnet-20241022"
+DEFAULT_OPENAI_MODEL = "gpt-4o"
+
+
+def build_prompt(message: str, context: Optional[str] = None) -> str:
+    """Combine an optional context block with the user's message."""
+    if context:
+        return f"Context: {context}\n\nUser: {message}"
+    return message
+
+
+@dataclass(frozen=True)
+class ProviderSettings:
+    name: str
+    api_key: Optional[str]
+    model: str
+    base_url: Optional[str] = None
+    max_tokens: int = 2000
+    temperature: Optional[float] = None
+    max_concurrency: int = 32
+    timeout: float = 60.0
+    max_retries: int = 2
+
+
+async def _close_client(client) -> None:
+    try:
+        await client.close()
+    except Exception:
+        pass
+
+
+class LLMProvider:
+    """Base class holding a lazily created async SDK client and a concurrency cap."""
+
+    label = "LLM"
+
+    def __init__(self, settings: ProviderSettings):
+        self.settings = settings
+        self._client = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._closing: Set[asyncio.Future] = set()
+
+    @property
+    def name(self) -> str:
+        return self.settings.name
+
+    @property
+    def available(self) -> bool:
+        return bool(self.settings.api_key)
+
+    def _bind_loop(self) -> None:
+        # SDK clients and semaphores belong to the loop they were first used on;
+        # rebuild them when called from a new loop (e.g. successive asyncio.run calls).
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        old_client, old_loop = self._client, self._loop
+        self._loop = loop
+        self._client = None
+        self._semaphore = asyncio.Semaphore(self.settings.max_concurrency)
+        if old_client is None:
+            return
+        # Release the old connection pool, on its own loop if that is still running
+        if old_loop is not None and old_loop.is_running():
+            asyncio.run_coroutine_threadsafe(_close_client(old_client), old_loop)
+        else:
+            task = loop.create_task(_close_client(old_client))
+            self._closing.add(task)
+            task.add_done_callback(self._closing.discard)
+
+    @property
+    def client(self):
+        self._bind_loop()
+        if self._client is None:
+            self._client = self._create_client()
+        return self._client
+
+    def _create_client(self):
+        raise NotImplementedError
+
+    def _record_usage(self, input_tokens: Optional[int], output_tokens: Optional[int]) -> None:
+        get_monitor().record_tokens(self.name, self.settings.model, input_tokens or 0, output_tokens or 0)
+        span = current_span()
+        if span is not None:
+            span.attributes.update(model=self.settings.model, input_tokens=input_tokens, output_tokens=output_tokens)
+
+    async def _complete(self, prompt: str, max_tokens: int, temperature: Optional[float]) -> str:
+        raise NotImplementedError
+
+    async def complete(
+        self,
+        prompt: str,
+        max_tokens: Optional[int] = None,
+        temperature: Optional[float] = None,
+    ) -> str:
+        self._bind_loop()
+        async with self._semaphore:
+            return await self._complete(
+                prompt,
+                max_tokens or self.settings.max_tokens,
+                temperature if temperature is not None else self.settings.temperature,
+            )
+
+    def _stream(self, prompt: str, max_tokens: int, temperature: Optional[float]) -> AsyncIterator[str]:
+        raise NotImplementedError
+
+    async def stream(
+        self,
+        prompt: str,
+        max_tokens: Optional[int] = None,
+        temperature: Optional[float] = None,
+    ) -> AsyncIterator[str]:
+        """Yield text deltas as the provider produces them."""
+        self._bind_loop()
+        async with self._semaphore:
+            async for delta in self._stream(
+                prompt,
+                max_tokens or self.settings.max_tokens,
+                temperature if temperature is not None else self.settings.temperature,
+            ):
+                yield delta
+
+    async def aclose(self) -> None:
+        client, self._client = self._client, None
+        if client is not None:
+            await _close_client(client)
+        loop = asyncio.get_running_loop()
+        pending = [task for task in self._closing if task.get_loop() is loop]
+        if pending:
+            await asyncio.gather(*pending)
+
+
+class AnthropicProvider(LLMProvider):
+    label = "Anthropic"
+
+    def _create_client(self):
+        import anthropic
+
+        kwargs: Dict[str, Any] = {
+            "api_key": self.settings.api_key,
+            "timeout": self.settings.timeout,
+            "max_retries": self.settings.max_retries,
+        }
+        if self.settings.base_url:
+            kwargs["base_url"] = self.settings.base_url
+        return anthropic.AsyncAnthropic(**kwargs)
+
+    async def _complete(self, prompt: str, max_tokens: int, temperature: Optional[float]) -> str:
+        kwargs: Dict[str, Any] = {}
+        if temperature is not None:
+            kwargs["temperature"] = temperature
+        # Anthropic requires structured content blocks even for plain text prompts
+        response = await self.client.messages.create(
+            model=self.settings.model,
+            max_tokens=max_tokens,
+            messages=[{
+                "role": "user",
+                "content": [{"type": "text", "text": prompt}]
+            }],
+            **kwargs
+        )
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            self._record_usage(getattr(usage, "input_tokens", 0), getattr(usage, "output_tokens", 0))
+        return _join_text_blocks(response)
+
+    async def _stream(self, prompt: str, max_tokens: int, temperature: Optional[float]) -> AsyncIterator[str]:
+        kwargs: Dict[str, Any] = {}
+        if temperature is not None:
+            kwargs["temperature"] = temperature
+        events = await self.client.messages.create(
+            model=self.settings.model,
+            max_tokens=max_tokens,
+            messages=[{
+                "role": "user",
+                "content": [{"type": "text", "text": prompt}]
+            }],
+            stream=True,
+            **kwargs
+        )
+        input_tokens = output_tokens = 0
+        try:
+            async for event in events:
+                event_type = getattr(event, "type", None)
+                # Usage arrives on message_start (input) and message_delta (output)
+                if event_type == "message_start":
+                    input_tokens = getattr(getattr(event.message, "usage", None), "input_tokens", 0) or 0
+                elif event_type == "message_delta":
+                    output_tokens = getattr(getattr(event, "usage", None), "output_tokens", 0) or output_tokens
+                if event_type != "content_block_delta":
+                    continue
+                text = getattr(event.delta, "text", None)
+                if text:
+                    yield text
+        finally:
+            self._record_usage(input_tokens, output_tokens)
+
+
+class OpenAIProvider(LLMProvider):
+    label = "OpenAI"
+
+    def _create_client(self):
+        import openai
+
+        kwargs: Dict[str, Any] = {
+            "api_key": self.settings.api_key,
+            "timeout": self.settings.timeout,
+            "max_retries": self.settings.max_retries,
+        }
+        if self.settings.base_url:
+            kwargs["base_url"] = self.settings.base_url
+        return openai.AsyncOpenAI(**kwargs)
+
+    async def _complete(self, prompt: str, max_tokens: int, temperature: Optional[float]) -> str:
+        kwargs: Dict[str, Any] = {}
+        if temperature is not None:
+            kwargs["temperature"] = temperature
+        response = await self.client.chat.completions.create(
+            model=self.settings.model,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=max_tokens,
+            **kwargs
+        )
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            self._record_usage(getattr(usage, "prompt_tokens", 0), getattr(usage, "completion_tokens", 0))
+        return response.choices[0].message.content
+
+    async def _stream(self, prompt: str, max_tokens: int, temperature: Optional[float]) -> AsyncIterator[str]:
+        kwargs: Dict[str, Any] = {}
+        if temperature is not None:
+            kwargs["temperature"] = temperature
+        chunks = await self.client.chat.completions.create(
+            model=self.settings.model,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=max_tokens,
+            stream=True,
+            # Streamed responses carry no usage unless asked for: it comes as a last, choice-less chunk
+            stream_options={"include_usage": True},
+            **kwargs
+        )
+        async for chunk in chunks:
+            usage = getattr(chunk, "usage", None)
+            if usage is not None:
+                self._record_usage(getattr(usage, "prompt_tokens", 0), getattr(usage, "completion_tokens", 0))
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+def _join_text_blocks(response: Any) -> str:
+    """Combine any returned Anthropic text blocks to form the final reply."""
+    text_blocks = []
+    for block in getattr(response, "content", None) or []:
+        if isinstance(block, dict):
+            if block.get("type") == "text" and block.get("text"):
+                text_blocks.append(block["text"])
+        elif getattr(block, "type", None) == "text" and getattr(block, "text", None):
+            text_blocks.append(block.text)
+
+    if text_blocks:
+        return "".join(text_blocks)
+
+    # Fall back to stringifying the response when no text blocks are present
+    return str(response)
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def provider_settings_from_config(config: Dict[str, Any]) -> List[ProviderSettings]:
+    """Build provider settings, in fallback order, from a pipeline config dict."""
+    max_concurrency = int(config.get("provider_max_concurrency") or _env_int("LLM_MAX_CONCURRENCY", 32))
+    timeout = float(config.get("provider_timeout") or 60.0)
+    max_tokens = int(config.get("max_tokens", 2000))
+
+    return [
+        ProviderSettings(
+            name="anthropic",
+            api_key=config.get("anthropic_api_key"),
+            model=config.get("anthropic_model") or os.getenv("ANTHROPIC_MODEL", DEFAULT_ANTHROPIC_MODEL),
+            base_url=config.get("anthropic_base_url") or os.getenv("ANTHROPIC_BASE_URL"),
+            max_tokens=max_tokens,
+            max_concurrency=max_concurrency,
+            timeout=timeout,
+        ),
+        ProviderSettings(
+            name="openai",
+            api_key=config.get("openai_api_key"),
+            model=config.get("model_name") or DEFAULT_OPENAI_MODEL,
+            base_url=config.get("openai_base_url") or os.getenv("OPENAI_BASE_URL"),
+            max_tokens=max_tokens,
+            temperature=config.get("temperature", 0.7),
+            max_concurrency=max_concurrency,
+            timeout=timeout,
+        ),
+    ]
+
+
+def router_settings_from_config(config: Dict[str, Any]) -> RouterSettings:
+    """Build circuit-breaker and hedging settings from a pipeline config dict."""
+    defaults = RouterSettings()
+    hedge = config.get("provider_hedge")
+    if hedge is None:
+        hedge = os.getenv("LLM_HEDGE", "").lower() in ("1", "true", "yes")
+    return RouterSettings(
+        timeout=float(config.get("provider_attempt_timeout") or os.getenv("LLM_ATTEMPT_TIMEOUT", defaults.timeout)),
+        failure_threshold=int(config.get("circuit_failure_threshold") or _env_int("LLM_CIRCUIT_FAILURES", defaults.failure_threshold)),
+        reset_timeout=float(config.get("circuit_reset_timeout") or os.getenv("LLM_CIRCUIT_RESET", defaults.reset_timeout)),
+        hedge=bool(hedge),
+        hedge_percentile=float(config.get("hedge_percentile") or os.getenv("LLM_HEDGE_PERCENTILE", defaults.hedge_percentile)),
+    )
+
+
+_PROVIDER_TYPES = {
+    "anthropic": AnthropicProvider,
+    "openai": OpenAIProvider,
+}
+
+
+class ProviderPool:
+    """Ordered set of providers shared by every request in the process."""
+
+    def __init__(self, settings: List[ProviderSettings], router_settings: Optional[RouterSettings] = None):
+        self.providers: List[LLMProvider] = [
+            _PROVIDER_TYPES[s.name](s) for s in settings
+        ]
+        self.router = ProviderRouter(self.providers, router_settings)
+
+    def get(self, name: str) -> Optional[LLMProvider]:
+        for provider in self.providers:
+            if provider.name == name:
+                return provider
+        return None
+
+    def available(self) -> List[LLMProvider]:
+        return [p for p in self.providers if p.available]
+
+    async def complete(
+        self,
+        prompt: str,
+        errors: Optional[List[str]] = None,
+        **kwargs: Any
+    ) -> Optional[str]:
+        """Route to the first healthy provider; return None when all fail."""
+        return await self.router.complete(prompt, errors=errors, **kwargs)
+
+    def stream(
+        self,
+        prompt: str,
+        errors: Optional[List[str]] = None,
+        **kwargs: Any
+    ) -> AsyncIterator[str]:
+        """Stream from the first healthy provider that produces output."""
+        return self.router.stream(prompt, errors=errors, **kwargs)
+
+    async def aclose(self) -> None:
+        await asyncio.gather(*(p.aclose() for p in self.providers))
+
+
+_pools: Dict[Tuple[Any, ...], ProviderPool] = {}
+
+
+def get_provider_pool(config: Dict[str, Any]) -> ProviderPool:
+    """Return the process-wide pool for this configuration, creating it once."""
+    settings = tuple(provider_settings_from_config(config))
+    router_settings = router_settings_from_config(config)
+    key = settings + (router_settings,)
+    pool = _pools.get(key)
+    if pool is None:
+        pool = _pools[key] = ProviderPool(list(settings), router_settings)
+    return pool
+
+
+async def close_provider_pools() -> None:
+    pools = list(_pools.values())
+    _pools.clear()
+    await asyncio.gather(*(pool.aclose() for pool in pools))
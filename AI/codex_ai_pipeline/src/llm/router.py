@@ -0,0 +1,296 @@
+"""Provider routing with per-provider circuit breakers and optional hedging.
+
+Providers are tried in priority order. Each one sits behind a circuit breaker
+that opens after repeated failures (or immediately on a quota/billing error)
+and lets a single probe request through once its reset timeout has elapsed.
+In hedged mode the next provider is started when the current one is slower
+than its recent latency percentile, and whichever answers first wins.
+"""
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from ..monitoring.tracing import get_tracer
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_QUOTA_STATUS_CODES = {402, 429}
+_QUOTA_MARKERS = ("quota", "credit balance", "insufficient_quota", "rate limit", "billing")
+
+
+def is_quota_error(error: BaseException) -> bool:
+    """Best-effort detection of rate-limit and billing errors across SDKs."""
+    if getattr(error, "status_code", None) in _QUOTA_STATUS_CODES:
+        return True
+    message = str(error).lower()
+    return any(marker in message for marker in _QUOTA_MARKERS)
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+            return HALF_OPEN
+        return self._state
+
+    def allow_request(self) -> bool:
+        """Return True if a call may proceed; claims the probe slot when half-open."""
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and not self._probe_in_flight:
+            self._state = HALF_OPEN
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self._state = CLOSED
+        self._failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self, quota: bool = False) -> None:
+        self._failures += 1
+        self._probe_in_flight = False
+        if quota or self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+            self._state = OPEN
+            self._opened_at = self._clock()
+
+    def release(self) -> None:
+        """Give back a claimed probe slot without recording an outcome (e.g. cancellation)."""
+        self._probe_in_flight = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"state": self.state, "failures": self._failures}
+
+
+class LatencyWindow:
+    """Sliding window of recent successful call latencies."""
+
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, max(0, int(round(p / 100.0 * len(ordered))) - 1))
+        return ordered[index]
+
+
+@dataclass(frozen=True)
+class RouterSettings:
+    timeout: float = 30.0
+    failure_threshold: int = 5
+    reset_timeout: float = 30.0
+    hedge: bool = False
+    hedge_percentile: float = 95.0
+    hedge_delay: float = 2.0  # used until enough latency samples exist
+    hedge_min_samples: int = 20
+
+
+class ProviderRouter:
+    def __init__(self, providers: List[Any], settings: Optional[RouterSettings] = None):
+        self.providers = providers
+        self.settings = settings or RouterSettings()
+        self.breakers: Dict[str, CircuitBreaker] = {
+            p.name: CircuitBreaker(self.settings.failure_threshold, self.settings.reset_timeout)
+            for p in providers
+        }
+        self.latencies: Dict[str, LatencyWindow] = {p.name: LatencyWindow() for p in providers}
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            p.name: {
+                **self.breakers[p.name].snapshot(),
+                "available": p.available,
+                "p95_latency": self.latencies[p.name].percentile(95),
+            }
+            for p in self.providers
+        }
+
+    def _hedge_delay(self, provider: Any) -> float:
+        window = self.latencies[provider.name]
+        if len(window) < self.settings.hedge_min_samples:
+            return self.settings.hedge_delay
+        return window.percentile(self.settings.hedge_percentile)
+
+    def _describe_error(self, provider: Any, error: BaseException) -> str:
+        if isinstance(error, ImportError):
+            return f"{provider.label} package not installed"
+        if isinstance(error, asyncio.TimeoutError):
+            return f"{provider.label} timed out after {self.settings.timeout}s"
+        return f"{provider.label} API error: {str(error)}"
+
+    def _claim(self, provider: Any, errors: List[str]) -> bool:
+        if self.breakers[provider.name].allow_request():
+            return True
+        errors.append(f"{provider.label} circuit open")
+        return False
+
+    async def _attempt(self, provider: Any, prompt: str, kwargs: Dict[str, Any]) -> str:
+        breaker = self.breakers[provider.name]
+        started = time.monotonic()
+        # A losing hedged attempt ends up as a cancelled span next to the winner
+        with get_tracer().span("llm.complete", provider=provider.name):
+            try:
+                result = await asyncio.wait_for(
+                    provider.complete(prompt, **kwargs), self.settings.timeout
+                )
+            except asyncio.CancelledError:
+                breaker.release()
+                raise
+            except Exception as e:
+                breaker.record_failure(quota=is_quota_error(e))
+                raise
+        breaker.record_success()
+        self.latencies[provider.name].add(time.monotonic() - started)
+        return result
+
+    async def complete(
+        self,
+        prompt: str,
+        errors: Optional[List[str]] = None,
+        **kwargs: Any
+    ) -> Optional[str]:
+        """Return the first successful completion, or None when every provider fails."""
+        errors = errors if errors is not None else []
+        if self.settings.hedge:
+            return await self._complete_hedged(prompt, errors, kwargs)
+
+        for provider in self.providers:
+            if not provider.available or not self._claim(provider, errors):
+                continue
+            try:
+                return await self._attempt(provider, prompt, kwargs)
+            except Exception as e:
+                errors.append(self._describe_error(provider, e))
+        return None
+
+    async def _complete_hedged(
+        self, prompt: str, errors: List[str], kwargs: Dict[str, Any]
+    ) -> Optional[str]:
+        remaining = [p for p in self.providers if p.available]
+        pending: Dict[asyncio.Future, Any] = {}
+
+        def launch_next() -> None:
+            while remaining:
+                provider = remaining.pop(0)
+                if self._claim(provider, errors):
+                    task = asyncio.ensure_future(self._attempt(provider, prompt, kwargs))
+                    pending[task] = provider
+                    return
+
+        launch_next()
+        try:
+            while pending:
+                # Start the next provider once the newest one exceeds its usual latency
+                newest = list(pending.values())[-1]
+                delay = self._hedge_delay(newest) if remaining else None
+                done, _ = await asyncio.wait(
+                    pending, timeout=delay, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    launch_next()
+                    continue
+                # Retrieve every finished task, so a failure that lands next to the winner
+                # is still reported rather than left as a never-retrieved exception
+                winner = None
+                for task in done:
+                    provider = pending.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        errors.append(self._describe_error(provider, e))
+                    else:
+                        if winner is None:
+                            winner = (result,)
+                if winner is not None:
+                    return winner[0]
+                launch_next()
+            return None
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def stream(
+        self,
+        prompt: str,
+        errors: Optional[List[str]] = None,
+        **kwargs: Any
+    ) -> AsyncIterator[str]:
+        """Stream from the first healthy provider.
+
+        The timeout bounds time-to-first-token. A provider that fails before its
+        first delta falls through to the next one; later failures are raised.
+        Streams are never hedged, since partial output cannot be retracted.
+        """
+        errors = errors if errors is not None else []
+        tracer = get_tracer()
+        for provider in self.providers:
+            if not provider.available or not self._claim(provider, errors):
+                continue
+            breaker = self.breakers[provider.name]
+            deltas = provider.stream(prompt, **kwargs).__aiter__()
+            outcome_recorded = False
+            # Not made current: the consumer runs between yields and must not nest under it
+            span = tracer.start_span("llm.stream", provider=provider.name)
+            span_error: Optional[BaseException] = None
+            try:
+                try:
+                    first = await asyncio.wait_for(deltas.__anext__(), self.settings.timeout)
+                except StopAsyncIteration:
+                    breaker.record_success()
+                    outcome_recorded = True
+                    continue
+                except Exception as e:
+                    breaker.record_failure(quota=is_quota_error(e))
+                    outcome_recorded = True
+                    errors.append(self._describe_error(provider, e))
+                    span_error = e
+                    continue
+
+                span.set_attribute("time_to_first_token_ms", span.elapsed_ms())
+                yield first
+                try:
+                    async for delta in deltas:
+                        yield delta
+                except Exception as e:
+                    breaker.record_failure(quota=is_quota_error(e))
+                    outcome_recorded = True
+                    raise
+                breaker.record_success()
+                outcome_recorded = True
+                return
+            except BaseException as e:
+                span_error = e
+                raise
+            finally:
+                if not outcome_recorded:
+                    breaker.release()
+                await deltas.aclose()
+                tracer.end_span(span, span_error)
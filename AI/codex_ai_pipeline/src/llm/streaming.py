@@ -0,0 +1,13 @@
+"""Helpers for forwarding token streams to HTTP clients."""
+import json
+from typing import Any, Dict
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",  # disable proxy buffering (nginx)
+}
+
+
+def sse_event(data: Dict[str, Any]) -> str:
+    """Format one Server-Sent Events frame carrying a JSON payload."""
+    return f"data: {json.dumps(data, default=str)}\n\n"
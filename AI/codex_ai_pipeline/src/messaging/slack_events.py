@@ -0,0 +1,243 @@
+"""Questions from Slack (Events API and slash commands) answered by the pipeline.
+
+Slack retries any request not acknowledged within 3 seconds, so the HTTP
+handlers only verify the signature, drop duplicates and enqueue; a bounded
+pool of worker tasks does the answering. Each answer starts as a placeholder
+reply in the question's thread and is edited as tokens arrive, through the
+rate-limited ``SlackSender`` (which collapses queued edits into the latest
+text).
+
+    SLACK_BOT_TOKEN=xoxb-... SLACK_SIGNING_SECRET=... uvicorn api.main:app
+
+Point the app's Event Subscriptions at ``/slack/events`` (``app_mention`` and
+``message.im``) and a slash command at ``/slack/commands``. Duplicates are
+recognised per process; behind several workers, a Slack retry that lands on
+another worker is answered twice.
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+from urllib.parse import parse_qs
+
+from ..monitoring.monitor import get_monitor
+
+_MENTION = re.compile(r"<@[A-Z0-9]+>")
+
+
+class RecentIds:
+    """Ids seen in the last ``ttl`` seconds, capped at ``max_entries``."""
+
+    def __init__(self, ttl: float = 600.0, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._seen: "OrderedDict[str, float]" = OrderedDict()
+
+    def add(self, key: str) -> bool:
+        """Record ``key``; False if it was already seen."""
+        now = time.monotonic()
+        while self._seen and (next(iter(self._seen.values())) < now or len(self._seen) >= self.max_entries):
+            self._seen.popitem(last=False)
+        if key in self._seen:
+            return False
+        self._seen[key] = now + self.ttl
+        return True
+
+
+def verify_signature(signing_secret: str, headers, body: bytes, max_age: float = 300.0) -> bool:
+    """Check Slack's ``X-Slack-Signature`` for ``body``; stale timestamps are rejected to stop replays."""
+    timestamp = headers.get("x-slack-request-timestamp", "")
+    signature = headers.get("x-slack-signature", "")
+    try:
+        if abs(time.time() - int(timestamp)) > max_age:
+            return False
+    except ValueError:
+        return False
+    expected = "v0=" + hmac.new(
+        signing_secret.encode(), f"v0:{timestamp}:".encode() + body, hashlib.sha256
+    ).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+class SlackQuestionHandler:
+    def __init__(
+        self,
+        answer: Callable[[str], AsyncIterator[Dict[str, Any]]],
+        sender,
+        signing_secret: str,
+        workers: int = 4,
+        max_queue: int = 100,
+        edit_interval: float = 1.0,
+        dedupe_ttl: float = 600.0,
+    ):
+        """``answer`` streams ``delta``/``done``/``error`` events for a question, like
+        ``CodexAIPipeline.stream_query``; ``sender`` is a ``SlackSender``."""
+        self.answer = answer
+        self.sender = sender
+        self.signing_secret = signing_secret
+        self.workers = workers
+        # Seconds between edits of a streaming answer
+        self.edit_interval = edit_interval
+        self.recent = RecentIds(dedupe_ttl)
+        self.monitor = get_monitor()
+        self._queue: asyncio.Queue = asyncio.Queue(max_queue)
+        self._tasks = []
+        self.counts = {
+            "received": 0, "duplicates": 0, "rejected": 0, "busy_notices_failed": 0, "answered": 0, "failed": 0,
+        }
+
+    def start(self) -> None:
+        if not self._tasks:
+            loop = asyncio.get_running_loop()
+            self._tasks = [loop.create_task(self._work()) for _ in range(self.workers)]
+
+    async def join(self) -> None:
+        """Wait until every accepted question has been answered."""
+        await self._queue.join()
+
+    async def aclose(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def handle_event(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Response body for an Events API request (already signature-checked)."""
+        if payload.get("type") == "url_verification":
+            return {"challenge": payload.get("challenge")}
+        event = payload.get("event") or {}
+        # Ignore bots (our own replies included), edits and other message subtypes
+        if payload.get("type") != "event_callback" or event.get("bot_id") or event.get("subtype"):
+            return {}
+        if event.get("type") == "message" and event.get("channel_type") != "im":
+            return {}
+        if event.get("type") not in ("app_mention", "message"):
+            return {}
+        # The same message can arrive as several events (and as Slack retries of each)
+        if not self._first_time(payload.get("event_id"), f"{event.get('channel')}:{event.get('ts')}"):
+            return {}
+        question = _MENTION.sub("", event.get("text", "")).strip()
+        if question:
+            self._submit(question, event["channel"], event.get("thread_ts") or event["ts"])
+        return {}
+
+    def handle_command(self, form: Dict[str, str]) -> Dict[str, Any]:
+        """Response body for a slash command; the answer follows as a channel message."""
+        question = form.get("text", "").strip()
+        if not question:
+            return {"response_type": "ephemeral", "text": f"Usage: {form.get('command', '/ask')} <question>"}
+        if not self._first_time(form.get("trigger_id")):
+            return {}
+        self._submit(f"<@{form.get('user_id')}> asked: {question}", form["channel_id"], None, question)
+        return {"response_type": "ephemeral", "text": "Working on it; the answer will appear in the channel."}
+
+    def _first_time(self, *keys: Optional[str]) -> bool:
+        self.counts["received"] += 1
+        new = [self.recent.add(key) for key in keys if key]
+        if new and not all(new):
+            self.counts["duplicates"] += 1
+            return False
+        return True
+
+    def _submit(self, heading: str, channel: str, thread_ts: Optional[str], question: Optional[str] = None) -> None:
+        item = {"question": question or heading, "heading": heading, "channel": channel, "thread_ts": thread_ts}
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.counts["rejected"] += 1
+            notice = self.sender.post(channel, "Too many questions right now; please ask again in a minute.", thread_ts)
+            notice.add_done_callback(self._busy_notice_sent)
+
+    def _busy_notice_sent(self, future: asyncio.Future) -> None:
+        # The sender already records the failed delivery; count which message it was
+        if not future.cancelled() and future.exception() is not None:
+            self.counts["busy_notices_failed"] += 1
+
+    async def _work(self) -> None:
+        while True:
+            item = await self._queue.get()
+            try:
+                # The stage counts failures in pipeline_stage_errors_total and marks the span
+                with self.monitor.request("slack_question"), self.monitor.stage("slack_answer"):
+                    await self._answer(item)
+                self.counts["answered"] += 1
+            except Exception:
+                self.counts["failed"] += 1
+            finally:
+                self._queue.task_done()
+
+    async def _answer(self, item: Dict[str, Any]) -> None:
+        channel = item["channel"]
+        # Slash commands have no thread: the answer is a channel message headed by the question
+        placeholder = item["heading"] + "\n_Thinking…_" if item["thread_ts"] is None else "_Thinking…_"
+        posted = await self.sender.post(channel, placeholder, item["thread_ts"], coalesce=False)
+        ts = posted["ts"]
+        prefix = item["heading"] + "\n" if item["thread_ts"] is None else ""
+
+        text, last_edit = "", time.monotonic()
+        async for event in self.answer(item["question"]):
+            if event["type"] == "delta":
+                text += event["text"]
+                if time.monotonic() - last_edit >= self.edit_interval:
+                    self.sender.update(channel, ts, prefix + text + " …")
+                    last_edit = time.monotonic()
+            elif event["type"] == "done":
+                text = event["response"]
+            elif event["type"] == "error":
+                text = f"Sorry, I could not answer that ({event['error']})."
+        await self.sender.update(channel, ts, prefix + (text or "Sorry, I have no answer to that."))
+
+
+def add_slack_routes(app, handler: SlackQuestionHandler, prefix: str = "/slack") -> None:
+    """``POST {prefix}/events`` and ``{prefix}/commands`` on a FastAPI app, plus the worker lifecycle."""
+    from fastapi import HTTPException, Request
+
+    async def verified_body(request: Request) -> bytes:
+        body = await request.body()
+        if not verify_signature(handler.signing_secret, request.headers, body):
+            raise HTTPException(status_code=401, detail="Invalid Slack signature")
+        return body
+
+    @app.post(f"{prefix}/events", include_in_schema=False)
+    async def slack_events(request: Request):
+        return handler.handle_event(json.loads(await verified_body(request)))
+
+    @app.post(f"{prefix}/commands", include_in_schema=False)
+    async def slack_commands(request: Request):
+        form = {key: values[0] for key, values in parse_qs((await verified_body(request)).decode()).items()}
+        return handler.handle_command(form)
+
+    @app.on_event("startup")
+    async def _start_slack_workers():
+        handler.start()
+
+    @app.on_event("shutdown")
+    async def _stop_slack_workers():
+        await handler.aclose()
+        await handler.sender.aclose()
+
+
+def slack_handler_from_env(answer: Callable[[str], AsyncIterator[Dict[str, Any]]]) -> Optional[SlackQuestionHandler]:
+    """A handler configured from ``SLACK_BOT_TOKEN`` and ``SLACK_SIGNING_SECRET``; None if unset."""
+    token, secret = os.getenv("SLACK_BOT_TOKEN"), os.getenv("SLACK_SIGNING_SECRET")
+    if not token or not secret:
+        return None
+    try:
+        from .slack_integration import SlackIntegration
+
+        sender = SlackIntegration(token).sender
+    except ImportError as e:
+        print(f"Slack questions disabled ({e})")
+        return None
+    return SlackQuestionHandler(
+        answer,
+        sender,
+        secret,
+        workers=int(os.getenv("SLACK_WORKERS", "4")),
+        max_queue=int(os.getenv("SLACK_MAX_QUEUE", "100")),
+    )
@@ -1,9 +1,20 @@
+import asyncio
+from typing import Any, Optional
+
 from slack_sdk import WebClient
 from slack_sdk.errors import SlackApiError
 
+from .slack_sender import SlackSender
+
 class SlackIntegration:
-    def __init__(self, token: str):
-        self.client = WebClient(token=token)
+    def __init__(self, token: str, base_url: Optional[str] = None, **sender_options: Any):
+        """``base_url`` points the clients at another server (e.g. a local fake Slack);
+        ``sender_options`` go to ``SlackSender`` (rate, burst, retries, ...)."""
+        self.token = token
+        self.base_url = base_url
+        self.client = WebClient(token=token, base_url=base_url) if base_url else WebClient(token=token)
+        self.sender_options = sender_options
+        self._sender: Optional[SlackSender] = None
     
     def send_message(self, channel: str, text: str):
         try:
@@ -14,3 +25,25 @@ class SlackIntegration:
             return response
         except SlackApiError as e:
             print(f"Error: {e}")
+
+    @property
+    def sender(self) -> SlackSender:
+        """Async, rate-limited sender on ``AsyncWebClient``; created on first use."""
+        if self._sender is None:
+            # Imported here: the async client needs aiohttp, which the sync path does not
+            from slack_sdk.web.async_client import AsyncWebClient
+
+            options = {"base_url": self.base_url} if self.base_url else {}
+            self._sender = SlackSender(AsyncWebClient(token=self.token, **options), **self.sender_options)
+        return self._sender
+
+    def post_message(self, channel: str, text: str, thread_ts: Optional[str] = None) -> asyncio.Future:
+        """Queue a message without waiting; see ``SlackSender.post``."""
+        return self.sender.post(channel, text, thread_ts)
+
+    def update_message(self, channel: str, ts: str, text: str) -> asyncio.Future:
+        return self.sender.update(channel, ts, text)
+
+    async def aclose(self, timeout: float = 5.0) -> None:
+        if self._sender is not None:
+            await self._sender.aclose(timeout)
@@ -0,0 +1,276 @@
+"""Asynchronous, rate-limited delivery of Slack messages.
+
+``SlackSender.post`` and ``update`` only enqueue and return a future, so
+posting an alert or a summary never holds up request handling. Each channel
+has one worker that sends in order through a token bucket (Slack allows
+about one message per second per channel, with short bursts):
+
+* a 429 pauses the channel's bucket for the ``Retry-After`` Slack sent;
+* connection errors and 5xx responses are retried with exponential backoff;
+* posts that pile up while a channel waits are coalesced into one message,
+  and pending edits of the same message collapse into the latest text.
+
+Deliveries are counted by ``PipelineMonitor.record_delivery`` and in
+``stats()``. The client is anything with ``AsyncWebClient``'s async
+``chat_postMessage`` and ``chat_update``, so a local fake server or a stub
+works for tests.
+"""
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set
+
+from ..monitoring.monitor import get_monitor
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+
+    def pause(self, seconds: float) -> None:
+        """Send nothing for ``seconds``, e.g. after a 429 with ``Retry-After``."""
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+
+    async def acquire(self) -> None:
+        while True:
+            now = time.monotonic()
+            if now < self._blocked_until:
+                await asyncio.sleep(self._blocked_until - now)
+                continue
+            self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def _status(error: BaseException) -> Optional[int]:
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    """Seconds to wait if ``error`` is a Slack rate limit, else None."""
+    if _status(error) != 429:
+        return None
+    headers = getattr(error.response, "headers", None) or {}
+    value = headers.get("Retry-After") or headers.get("retry-after")
+    try:
+        return float(value[0] if isinstance(value, list) else value)
+    except (TypeError, ValueError):
+        return 1.0
+
+
+def _retryable(error: BaseException) -> bool:
+    status = _status(error)
+    # No HTTP status means the request never got an answer: a timeout or a dropped connection
+    return status is None or status >= 500
+
+
+class _Message:
+    def __init__(self, method: str, channel: str, text: str, thread_ts: Optional[str], ts: Optional[str]):
+        self.method = method
+        self.channel = channel
+        self.text = text
+        self.thread_ts = thread_ts
+        self.ts = ts
+        self.coalesce = method == "chat_postMessage"
+        self.enqueued = time.perf_counter()
+        self.futures: List[asyncio.Future] = []
+
+
+class _Channel:
+    def __init__(self, bucket: TokenBucket):
+        self.bucket = bucket
+        self.pending: Deque[_Message] = deque()
+        self.wakeup = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+
+class SlackSender:
+    def __init__(
+        self,
+        client,
+        rate_per_channel: float = 1.0,
+        burst: int = 3,
+        max_queue: int = 1000,
+        max_coalesce: int = 10,
+        max_message_chars: int = 3500,
+        max_retries: int = 5,
+        backoff: float = 1.0,
+        monitor=None,
+    ):
+        self.client = client
+        self.rate_per_channel = rate_per_channel
+        self.burst = burst
+        self.max_queue = max_queue
+        self.max_coalesce = max_coalesce
+        # Slack truncates messages past 40k characters and renders long ones poorly
+        self.max_message_chars = max_message_chars
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.monitor = monitor or get_monitor()
+        self._channels: Dict[str, _Channel] = {}
+        self._unfinished: Set[asyncio.Future] = set()
+        self._counts = {
+            "sent": 0, "coalesced": 0, "failed": 0, "dropped": 0, "retries": 0, "rate_limited": 0,
+        }
+
+    def post(self, channel: str, text: str, thread_ts: Optional[str] = None, coalesce: bool = True) -> asyncio.Future:
+        """Queue a message; the future resolves to Slack's response (None if dropped).
+
+        Call from the event loop. Nothing waits here: a full queue drops the message.
+        Pass ``coalesce=False`` for a message that will be edited later, so it keeps
+        its own ``ts``.
+        """
+        message = _Message("chat_postMessage", channel, text, thread_ts, None)
+        message.coalesce = coalesce
+        return self._enqueue(message)
+
+    def update(self, channel: str, ts: str, text: str) -> asyncio.Future:
+        """Queue an edit of message ``ts``; an edit still queued for it is replaced."""
+        state = self._channel(channel)
+        for message in state.pending:
+            if message.method == "chat_update" and message.ts == ts:
+                message.text = text
+                self._counts["coalesced"] += 1
+                future = asyncio.get_running_loop().create_future()
+                self._track(future)
+                message.futures.append(future)
+                return future
+        return self._enqueue(_Message("chat_update", channel, text, None, ts))
+
+    def _channel(self, channel: str) -> _Channel:
+        state = self._channels.get(channel)
+        if state is None:
+            state = self._channels[channel] = _Channel(TokenBucket(self.rate_per_channel, self.burst))
+        if state.task is None or state.task.done():
+            state.task = asyncio.get_running_loop().create_task(self._drain(channel, state))
+        return state
+
+    def _track(self, future: asyncio.Future) -> None:
+        self._unfinished.add(future)
+        future.add_done_callback(self._finished)
+
+    def _finished(self, future: asyncio.Future) -> None:
+        self._unfinished.discard(future)
+        # Reading the exception marks it retrieved, so fire-and-forget posts that fail do not log it again
+        if not future.cancelled():
+            future.exception()
+
+    def _enqueue(self, message: _Message) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        if self.queue_depth() >= self.max_queue:
+            self._counts["dropped"] += 1
+            self.monitor.record_delivery("slack", "dropped")
+            print(f"Slack queue full; dropped message to {message.channel}")
+            future.set_result(None)
+            return future
+        self._track(future)
+        message.futures.append(future)
+        state = self._channel(message.channel)
+        state.pending.append(message)
+        state.wakeup.set()
+        return future
+
+    def _take_batch(self, pending: Deque[_Message]) -> List[_Message]:
+        batch = [pending.popleft()]
+        first = batch[0]
+        if not first.coalesce:
+            return batch
+        length = len(first.text)
+        while pending and len(batch) < self.max_coalesce:
+            message = pending[0]
+            if not message.coalesce or message.thread_ts != first.thread_ts:
+                break
+            length += len(message.text) + 1
+            if length > self.max_message_chars:
+                break
+            batch.append(pending.popleft())
+        return batch
+
+    async def _drain(self, channel: str, state: _Channel) -> None:
+        while True:
+            while not state.pending:
+                state.wakeup.clear()
+                await state.wakeup.wait()
+            # Take the batch only once a token is free, so posts that arrive meanwhile are coalesced
+            await state.bucket.acquire()
+            batch = self._take_batch(state.pending)
+            try:
+                await self._deliver(batch, state.bucket)
+            except asyncio.CancelledError:
+                for message in batch:
+                    for future in message.futures:
+                        future.cancel()
+                raise
+
+    async def _deliver(self, batch: List[_Message], bucket: TokenBucket) -> None:
+        first = batch[0]
+        kwargs = {"channel": first.channel, "text": "\n".join(m.text for m in batch)}
+        if first.method == "chat_update":
+            kwargs["ts"] = first.ts
+        elif first.thread_ts is not None:
+            kwargs["thread_ts"] = first.thread_ts
+        futures = [future for message in batch for future in message.futures]
+
+        attempt = 0
+        while True:
+            try:
+                response = await getattr(self.client, first.method)(**kwargs)
+                break
+            except Exception as e:
+                retry_after = _retry_after(e)
+                if attempt >= self.max_retries or (retry_after is None and not _retryable(e)):
+                    print(f"Slack {first.method} to {first.channel} failed: {e}")
+                    self._counts["failed"] += len(batch)
+                    self.monitor.record_delivery("slack", "failed", count=len(batch))
+                    for future in futures:
+                        if not future.done():
+                            future.set_exception(e)
+                    return
+                attempt += 1
+                self._counts["retries"] += 1
+                if retry_after is not None:
+                    self._counts["rate_limited"] += 1
+                    bucket.pause(retry_after)
+                else:
+                    await asyncio.sleep(self.backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.0))
+                await bucket.acquire()
+
+        self._counts["sent"] += 1
+        self._counts["coalesced"] += len(batch) - 1
+        self.monitor.record_delivery("slack", "sent", time.perf_counter() - first.enqueued, count=len(batch))
+        for future in futures:
+            if not future.done():
+                future.set_result(response)
+
+    def queue_depth(self) -> int:
+        return sum(len(state.pending) for state in self._channels.values())
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._counts, "queued": self.queue_depth()}
+
+    async def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until everything queued so far is delivered or failed; False on timeout."""
+        if not self._unfinished:
+            return True
+        _, pending = await asyncio.wait(set(self._unfinished), timeout=timeout)
+        return not pending
+
+    async def aclose(self, timeout: float = 5.0) -> None:
+        """Deliver what is queued (up to ``timeout``), then stop the channel workers."""
+        await self.flush(timeout)
+        tasks = [state.task for state in self._channels.values() if state.task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for future in list(self._unfinished):
+            future.cancel()
@@ -1,19 +1,237 @@
-from prometheus_client import Counter, Histogram, start_http_server
+"""Prometheus instrumentation for the pipeline and the API apps.
+
+Metrics are registered once per registry and shared by every
+``PipelineMonitor`` that uses it, so creating several monitors (one per
+pipeline, one per app) is safe. Nothing listens on a port unless
+``start_http_server`` is called; the FastAPI apps expose ``/metrics`` through
+``add_metrics_route`` instead. Stages and requests are also traced as spans
+(see ``tracing.py``). Without ``prometheus_client`` the metrics are no-ops.
+"""
+import json
+import os
+import threading
 import time
+import weakref
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from .tracing import Span, Tracer, _wrap, get_tracer
+
+try:
+    from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+    from prometheus_client import start_http_server as _start_http_server
+except ImportError:  # pragma: no cover - optional dep
+    REGISTRY = None
+
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# USD per million (input, output) tokens, matched by model-name prefix;
+# override with LLM_PRICES='{"gpt-4o": [2.5, 10]}'
+DEFAULT_PRICES: Dict[str, Tuple[float, float]] = {
+    "claude-3-5-sonnet": (3.0, 15.0),
+    "claude-3-5-haiku": (0.8, 4.0),
+    "claude-3-opus": (15.0, 75.0),
+    "gpt-4o-mini": (0.15, 0.6),
+    "gpt-4o": (2.5, 10.0),
+    "gpt-4-turbo": (10.0, 30.0),
+    "gpt-4": (30.0, 60.0),
+    "gpt-3.5-turbo": (0.5, 1.5),
+}
+
+_metrics_lock = threading.Lock()
+# Weak keys: a registry's id can be reused once it is garbage collected
+_metrics_by_registry: "weakref.WeakKeyDictionary[Any, Dict[str, Any]]" = weakref.WeakKeyDictionary()
+
+
+def _prices() -> Dict[str, Tuple[float, float]]:
+    prices = dict(DEFAULT_PRICES)
+    override = os.getenv("LLM_PRICES")
+    if override:
+        prices.update({model: tuple(rates) for model, rates in json.loads(override).items()})
+    return prices
+
+
+def _metrics(registry) -> Dict[str, Any]:
+    with _metrics_lock:
+        if registry not in _metrics_by_registry:
+            _metrics_by_registry[registry] = {
+                "requests": Counter(
+                    "llm_requests_total", "Total pipeline requests", ["endpoint"], registry=registry
+                ),
+                "response_time": Histogram(
+                    "llm_response_time_seconds", "End-to-end request time", ["endpoint"],
+                    buckets=STAGE_BUCKETS, registry=registry,
+                ),
+                "stage_time": Histogram(
+                    "pipeline_stage_seconds", "Time spent per pipeline stage", ["stage"],
+                    buckets=STAGE_BUCKETS, registry=registry,
+                ),
+                "stage_errors": Counter(
+                    "pipeline_stage_errors_total", "Stage failures", ["stage"], registry=registry
+                ),
+                "in_flight": Gauge(
+                    "pipeline_in_flight", "Requests or stages currently executing", ["stage"], registry=registry
+                ),
+                "tokens": Counter(
+                    "llm_tokens_total", "LLM tokens by provider, model and direction",
+                    ["provider", "model", "direction"], registry=registry,
+                ),
+                "cost": Counter(
+                    "llm_cost_usd_total", "Estimated LLM spend in USD", ["provider", "model"], registry=registry
+                ),
+                "cache_hit_ratio": Gauge(
+                    "cache_hit_ratio", "Hit ratio since start", ["cache"], registry=registry
+                ),
+                "cache_entries": Gauge(
+                    "cache_entries", "Entries currently cached", ["cache"], registry=registry
+                ),
+                "deliveries": Counter(
+                    "message_deliveries_total", "Outbound messages by transport and outcome",
+                    ["transport", "status"], registry=registry,
+                ),
+                "delivery_time": Histogram(
+                    "message_delivery_seconds", "Time from enqueue to delivery", ["transport"],
+                    buckets=STAGE_BUCKETS, registry=registry,
+                ),
+            }
+        return _metrics_by_registry[registry]
+
 
 class PipelineMonitor:
-    def __init__(self):
-        self.request_count = Counter('llm_requests_total', 'Total LLM requests')
-        self.response_time = Histogram('llm_response_time_seconds', 'LLM response time')
-        start_http_server(8000)
-    
-    def track_request(self, func):
-        def wrapper(*args, **kwargs):
-            self.request_count.inc()
-            start_time = time.time()
-            
-            result = func(*args, **kwargs)
-            
-            self.response_time.observe(time.time() - start_time)
-            return result
-        return wrapper
+    def __init__(self, registry=None, tracer: Optional[Tracer] = None):
+        self.enabled = REGISTRY is not None
+        self.registry = registry if registry is not None else REGISTRY
+        self.tracer = tracer or get_tracer()
+        self._metrics = _metrics(self.registry) if self.enabled else {}
+        self._prices = _prices()
+
+    @contextmanager
+    def stage(self, name: str, current: bool = True) -> Iterator[Span]:
+        """Time a block as pipeline stage ``name`` and trace it as a span of the same name."""
+        with self.tracer.span(name, current=current) as span, self._timed_stage(name):
+            yield span
+
+    @contextmanager
+    def _timed_stage(self, name: str) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+        in_flight = self._metrics["in_flight"].labels(stage=name)
+        in_flight.inc()
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self._metrics["stage_errors"].labels(stage=name).inc()
+            raise
+        finally:
+            self._metrics["stage_time"].labels(stage=name).observe(time.perf_counter() - started)
+            in_flight.dec()
+
+    @contextmanager
+    def request(self, endpoint: str, current: bool = True) -> Iterator[Span]:
+        """Count, time and trace one request to ``endpoint``.
+
+        Pass ``current=False`` around an async generator's yields and make the
+        span current per step with ``iterate_in_span``.
+        """
+        with self.tracer.span(endpoint, current=current) as span, self._timed_request(endpoint):
+            yield span
+
+    @contextmanager
+    def _timed_request(self, endpoint: str) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+        self._metrics["requests"].labels(endpoint=endpoint).inc()
+        in_flight = self._metrics["in_flight"].labels(stage=f"request:{endpoint}")
+        in_flight.inc()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._metrics["response_time"].labels(endpoint=endpoint).observe(time.perf_counter() - started)
+            in_flight.dec()
+
+    def track_stage(self, name: str) -> Callable:
+        """Decorator form of ``stage`` for sync functions, coroutines and async generators."""
+        def decorator(func):
+            return _wrap(func, lambda **options: self.stage(name, **options))
+        return decorator
+
+    def track_request(self, func: Optional[Callable] = None, *, endpoint: Optional[str] = None) -> Callable:
+        """Decorator counting and timing calls, labelled ``endpoint`` or the function name.
+
+        Usable bare (``@monitor.track_request``) or with a label
+        (``@monitor.track_request(endpoint="POST /chat")``).
+        """
+        def decorator(f):
+            return _wrap(f, lambda **options: self.request(endpoint or f.__name__, **options))
+        return decorator(func) if func is not None else decorator
+
+    def record_tokens(self, provider: str, model: str, input_tokens: int = 0, output_tokens: int = 0) -> None:
+        if not self.enabled:
+            return
+        tokens = self._metrics["tokens"]
+        if input_tokens:
+            tokens.labels(provider=provider, model=model, direction="input").inc(input_tokens)
+        if output_tokens:
+            tokens.labels(provider=provider, model=model, direction="output").inc(output_tokens)
+        rates = self._price(model)
+        if rates is not None:
+            cost = (input_tokens * rates[0] + output_tokens * rates[1]) / 1_000_000
+            self._metrics["cost"].labels(provider=provider, model=model).inc(cost)
+
+    def record_delivery(self, transport: str, status: str, seconds: Optional[float] = None, count: int = 1) -> None:
+        """Count ``count`` outbound messages (e.g. Slack posts) that ended in ``status``."""
+        if not self.enabled:
+            return
+        self._metrics["deliveries"].labels(transport=transport, status=status).inc(count)
+        if seconds is not None:
+            self._metrics["delivery_time"].labels(transport=transport).observe(seconds)
+
+    def _price(self, model: str) -> Optional[Tuple[float, float]]:
+        # Longest prefix wins so gpt-4o-mini is not billed as gpt-4o or gpt-4
+        matches = [prefix for prefix in self._prices if model.startswith(prefix)]
+        return self._prices[max(matches, key=len)] if matches else None
+
+    def watch_cache(self, name: str, stats: Callable[[], Dict[str, Any]]) -> None:
+        """Export a cache's ``stats()`` (``hit_ratio``, ``size``) as gauges read at scrape time."""
+        if not self.enabled:
+            return
+        self._metrics["cache_hit_ratio"].labels(cache=name).set_function(lambda: stats().get("hit_ratio", 0.0))
+        self._metrics["cache_entries"].labels(cache=name).set_function(lambda: stats().get("size", 0))
+
+    def render(self) -> Tuple[bytes, str]:
+        """Current metrics in the Prometheus text format, with its content type."""
+        if not self.enabled:
+            return b"# prometheus_client is not installed\n", "text/plain; charset=utf-8"
+        return generate_latest(self.registry), CONTENT_TYPE_LATEST
+
+    def start_http_server(self, port: int = 8000) -> None:
+        """Serve metrics on a separate port, for processes without a FastAPI app."""
+        if self.enabled:
+            _start_http_server(port, registry=self.registry)
+
+
+_default_monitor: Optional[PipelineMonitor] = None
+
+
+def get_monitor() -> PipelineMonitor:
+    """Process-wide monitor on the default registry."""
+    global _default_monitor
+    if _default_monitor is None:
+        _default_monitor = PipelineMonitor()
+    return _default_monitor
+
+
+def add_metrics_route(app, monitor: Optional[PipelineMonitor] = None, path: str = "/metrics") -> None:
+    """Expose ``monitor`` (default: ``get_monitor()``) on a FastAPI app."""
+    from fastapi import Response
+
+    monitor = monitor or get_monitor()
+
+    @app.get(path, include_in_schema=False)
+    async def metrics():
+        body, content_type = monitor.render()
+        return Response(content=body, media_type=content_type)
@@ -0,0 +1,334 @@
+"""Lightweight in-process tracing for the pipeline and the API apps.
+
+Spans follow the OpenTelemetry model (trace id, span id, parent, attributes,
+status) and propagate through ``contextvars``, so tasks started with
+``asyncio.ensure_future`` and work sent through ``StageRunner.run_blocking``
+nest under the span that started them. Finished spans go to exporters that
+need no collector: an in-memory ring (served at ``GET /traces/{trace_id}``
+when ``TRACES_ENDPOINT=1``) and, when ``TRACE_FILE`` is set, a JSON-lines file.
+
+Incoming W3C ``traceparent`` headers are honoured, and every HTTP response
+carries ``X-Trace-Id`` and ``traceparent`` so a slow request can be looked up.
+"""
+import asyncio
+import contextvars
+import functools
+import inspect
+import json
+import os
+import secrets
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence
+
+
+class SpanContext(NamedTuple):
+    trace_id: str
+    span_id: str
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    start_time: float = field(default_factory=time.time)
+    duration_ms: Optional[float] = None
+    status: str = "ok"
+    error: Optional[str] = None
+    _started: float = field(default_factory=time.perf_counter, repr=False)
+
+    @property
+    def context(self) -> SpanContext:
+        return SpanContext(self.trace_id, self.span_id)
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._started) * 1000
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def record_error(self, error: BaseException) -> None:
+        self.status = "cancelled" if isinstance(error, (asyncio.CancelledError, GeneratorExit)) else "error"
+        self.error = f"{type(error).__name__}: {error}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time": self.start_time,
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class InMemorySpanExporter:
+    """Keeps the most recent ``max_spans`` finished spans."""
+
+    def __init__(self, max_spans: int = 10000):
+        self._spans = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            self._spans.append(span)
+
+    def spans(self, trace_id: Optional[str] = None) -> List[Span]:
+        with self._lock:
+            return [s for s in self._spans if trace_id is None or s.trace_id == trace_id]
+
+
+class JsonLinesSpanExporter:
+    """Appends one JSON object per finished span to ``path``."""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=str) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+_CURRENT = object()
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+@contextmanager
+def use_span(span: Optional[Span]) -> Iterator[Optional[Span]]:
+    """Make ``span`` current for a block without starting or ending it."""
+    token = _current_span.set(span)
+    try:
+        yield span
+    finally:
+        _current_span.reset(token)
+
+
+async def iterate_in_span(span: Optional[Span], items: AsyncIterator[Any]) -> AsyncIterator[Any]:
+    """Iterate ``items`` with ``span`` current while each item is produced, but not
+    across yields: the consumer runs in between and must not nest under it, and may
+    close the generator from another context, where resetting the span would fail."""
+    items = items.__aiter__()
+    try:
+        while True:
+            with use_span(span):
+                try:
+                    item = await items.__anext__()
+                except StopAsyncIteration:
+                    return
+            yield item
+    finally:
+        aclose = getattr(items, "aclose", None)
+        if aclose is not None:
+            with use_span(span):
+                await aclose()
+
+
+def detach_trace() -> None:
+    """Start new traces from here on in this context; for long-lived background tasks
+    that would otherwise inherit the span of whichever request created them."""
+    _current_span.set(None)
+
+
+class Tracer:
+    def __init__(self, exporters: Optional[Sequence[Any]] = None, enabled: bool = True):
+        self.memory = InMemorySpanExporter()
+        self.exporters = [self.memory, *(exporters or [])]
+        self.enabled = enabled
+
+    def start_span(self, name: str, parent: Any = _CURRENT, **attributes: Any) -> Span:
+        """Create a span without making it current; finish it with ``end_span``.
+
+        ``parent`` defaults to the current span; pass a ``SpanContext`` to
+        continue a remote trace or None to start a new one.
+        """
+        if parent is _CURRENT:
+            parent = current_span()
+        if parent is None:
+            trace_id, parent_id = secrets.token_hex(16), None
+        else:
+            trace_id, parent_id = parent.trace_id, parent.span_id
+        return Span(name, trace_id, secrets.token_hex(8), parent_id, dict(attributes))
+
+    def end_span(self, span: Span, error: Optional[BaseException] = None) -> None:
+        span.duration_ms = span.elapsed_ms()
+        if error is not None:
+            span.record_error(error)
+        if not self.enabled:
+            return
+        for exporter in self.exporters:
+            try:
+                exporter.export(span)
+            except Exception as e:
+                print(f"Span export failed: {e}")
+
+    @contextmanager
+    def span(self, name: str, parent: Any = _CURRENT, current: bool = True, **attributes: Any) -> Iterator[Span]:
+        """Run a block inside a new span; works inside async code too.
+
+        With ``current=False`` the span is timed and exported but not made
+        current, e.g. around an async generator's yields (see ``iterate_in_span``).
+        """
+        span = self.start_span(name, parent, **attributes)
+        token = _current_span.set(span) if current else None
+        error = None
+        try:
+            yield span
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            if token is not None:
+                _current_span.reset(token)
+            self.end_span(span, error)
+
+    def traced(self, name: Optional[str] = None) -> Callable:
+        """Decorator form of ``span`` for sync functions, coroutines and async generators."""
+        def decorator(func):
+            return _wrap(func, lambda **options: self.span(name or func.__qualname__, **options))
+        return decorator
+
+
+def _wrap(func: Callable, context: Callable[..., Any]) -> Callable:
+    """Run ``func`` inside ``context()``, a context manager yielding its span; an async
+    generator gets ``context(current=False)`` so the span is only current while it runs."""
+    if inspect.isasyncgenfunction(func):
+        @functools.wraps(func)
+        async def agen_wrapper(*args, **kwargs):
+            with context(current=False) as span:
+                async for item in iterate_in_span(span, func(*args, **kwargs)):
+                    yield item
+        return agen_wrapper
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            with context():
+                return await func(*args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with context():
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def format_traceparent(context: SpanContext) -> str:
+    return f"00-{context.trace_id}-{context.span_id}-01"
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[SpanContext]:
+    """Parse a W3C ``traceparent`` header; None if absent or malformed."""
+    parts = (header or "").strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    if set(parts[1]) == {"0"} or set(parts[2]) == {"0"}:
+        return None
+    return SpanContext(parts[1], parts[2])
+
+
+_default_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """Process-wide tracer; ``TRACING_ENABLED=0`` turns export off, ``TRACE_FILE``
+    adds a JSON-lines exporter."""
+    global _default_tracer
+    with _tracer_lock:
+        if _default_tracer is None:
+            trace_file = os.getenv("TRACE_FILE")
+            _default_tracer = Tracer(
+                exporters=[JsonLinesSpanExporter(trace_file)] if trace_file else None,
+                enabled=os.getenv("TRACING_ENABLED", "1").lower() not in ("0", "false", "no"),
+            )
+        return _default_tracer
+
+
+async def _end_span_after(tracer: Tracer, span: Span, body: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    # Streaming bodies are produced after call_next returns; the request span covers them
+    error = None
+    try:
+        async for chunk in body:
+            yield chunk
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        tracer.end_span(span, error)
+
+
+def add_tracing(
+    app,
+    tracer: Optional[Tracer] = None,
+    exclude: Sequence[str] = ("/metrics",),
+    serve_traces: Optional[bool] = None,
+) -> None:
+    """Trace every HTTP request on a FastAPI app.
+
+    ``GET /traces/{trace_id}`` returns span attributes, which can include
+    request content, so it is only added with ``serve_traces`` (default: the
+    ``TRACES_ENDPOINT`` environment variable).
+    """
+    from fastapi import HTTPException
+
+    tracer = tracer or get_tracer()
+    if serve_traces is None:
+        serve_traces = os.getenv("TRACES_ENDPOINT", "").lower() in ("1", "true", "yes")
+
+    @app.middleware("http")
+    async def trace_requests(request, call_next):
+        path = request.url.path
+        if path in exclude:
+            return await call_next(request)
+        parent = parse_traceparent(request.headers.get("traceparent"))
+        span = tracer.start_span(
+            f"http {request.method} {path}", parent, **{"http.method": request.method, "http.target": path}
+        )
+        try:
+            with use_span(span):
+                response = await call_next(request)
+        except BaseException as e:
+            tracer.end_span(span, e)
+            raise
+        span.set_attribute("http.status_code", response.status_code)
+        response.body_iterator = _end_span_after(tracer, span, response.body_iterator)
+        response.headers["X-Trace-Id"] = span.trace_id
+        response.headers["traceparent"] = format_traceparent(span.context)
+        return response
+
+    if not serve_traces:
+        return
+
+    @app.get("/traces/{trace_id}", include_in_schema=False)
+    async def get_trace(trace_id: str):
+        spans = tracer.memory.spans(trace_id)
+        if not spans:
+            raise HTTPException(status_code=404, detail="Trace not found")
+        return {"trace_id": trace_id, "spans": [s.to_dict() for s in sorted(spans, key=lambda s: s.start_time)]}
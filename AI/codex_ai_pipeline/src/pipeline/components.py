@@ -0,0 +1,106 @@
+"""Lazily built pipeline components.
+
+``lazy_component`` turns a factory method into an attribute that is built on
+first access, exactly once per instance even when several threads ask for it
+at the same time, and then stored on the instance so later reads are plain
+attribute lookups. Build times go to the owner's ``startup_profile``.
+
+Async code should use ``aget`` so a first access (a model load, say) runs on
+a worker thread instead of blocking the event loop.
+"""
+import asyncio
+import importlib
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+
+class StartupProfile:
+    """Where start-up time went: construction plus each component's first build."""
+
+    def __init__(self):
+        self._created = time.perf_counter()
+        self._lock = threading.Lock()
+        self.init_seconds: Optional[float] = None
+        self.components: Dict[str, Dict[str, Any]] = {}
+
+    def ready(self) -> None:
+        self.init_seconds = time.perf_counter() - self._created
+
+    def record(self, name: str, seconds: float, component: Any = None, error: Optional[str] = None) -> None:
+        entry = {
+            "seconds": round(seconds, 4),
+            "built_after": round(time.perf_counter() - self._created, 4),
+            "type": type(component).__name__ if error is None else None,
+        }
+        if error is not None:
+            entry["error"] = error
+        with self._lock:
+            self.components[name] = entry
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            components = dict(self.components)
+        return {
+            "init_seconds": round(self.init_seconds, 4) if self.init_seconds is not None else None,
+            "components": components,
+            "total_build_seconds": round(sum(c["seconds"] for c in components.values()), 4),
+        }
+
+
+class lazy_component:
+    """Descriptor for a component built on first use; see the module docstring."""
+
+    def __init__(self, factory: Callable[[Any], Any]):
+        self.factory = factory
+        self.name = factory.__name__
+        self.__doc__ = factory.__doc__
+
+    def __set_name__(self, owner, name: str) -> None:
+        self.name = name
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        values = obj.__dict__
+        if self.name in values:
+            return values[self.name]
+        # One lock per component, so a slow build does not hold up unrelated ones
+        locks = values.setdefault("_component_locks", {})
+        with locks.setdefault(self.name, threading.Lock()):
+            if self.name in values:
+                return values[self.name]
+            profile = getattr(obj, "startup_profile", None)
+            started = time.perf_counter()
+            try:
+                value = self.factory(obj)
+            except Exception as e:
+                if profile is not None:
+                    profile.record(self.name, time.perf_counter() - started, error=str(e))
+                raise
+            if profile is not None:
+                profile.record(self.name, time.perf_counter() - started, value)
+            values[self.name] = value
+            return value
+
+
+def is_built(obj: Any, name: str) -> bool:
+    return name in obj.__dict__
+
+
+async def aget(obj: Any, name: str, executor=None) -> Any:
+    """``getattr(obj, name)``, building a lazy component off the event loop."""
+    if name in obj.__dict__:
+        return obj.__dict__[name]
+    return await asyncio.get_running_loop().run_in_executor(executor, getattr, obj, name)
+
+
+def load_component(module: str, class_name: str, fallback: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Instantiate ``class_name`` from ``module`` (relative to ``src``), or ``fallback``
+    when the module or a dependency it imports on construction is not installed."""
+    try:
+        cls = getattr(importlib.import_module(module, __package__.rpartition(".")[0]), class_name)
+        return cls(*args, **kwargs)
+    except ImportError as e:
+        print(f"{class_name} unavailable ({e}); using {fallback.__name__}")
+        return fallback(*args, **kwargs)
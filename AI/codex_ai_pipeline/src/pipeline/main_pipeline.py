@@ -1,7 +1,18 @@
-from typing import Dict, Any, Optional
+from typing import AsyncIterator, Callable, Dict, Any, Iterable, List, Optional
 import asyncio
+import inspect
 import os
 
+from ..evaluation.background import EvaluationQueue
+from ..llm.providers import build_prompt, get_provider_pool
+from ..monitoring.monitor import PipelineMonitor
+from ..monitoring.tracing import current_span, iterate_in_span
+from ..rag.context import select_context
+from ..serving.model_registry import get_registry as get_model_registry
+from .components import StartupProfile, aget, lazy_component, load_component
+from .response_cache import ResponseCache
+from .stages import StageRunner
+
 # Best‑effort environment loading (safe if dotenv missing)
 try:
     from dotenv import load_dotenv  # type: ignore
@@ -9,14 +20,6 @@ except Exception:  # pragma: no cover - optional dep
     def load_dotenv(*args, **kwargs):
         return False
 
-# Optional LangChain imports with graceful fallbacks
-try:
-    from langchain_openai import ChatOpenAI as _ChatOpenAI  # type: ignore
-    from langchain.tools import Tool as _Tool  # type: ignore
-except Exception:
-    _ChatOpenAI = None
-    _Tool = None
-
 # Lightweight fallbacks so the pipeline can run without LangChain
 class MockChatOpenAI:
     def __init__(self, model: str = "gpt-3.5-turbo", temperature: float = 0.7, max_tokens: int = 1000, **_: Any):
@@ -46,49 +49,41 @@ class MockDocumentProcessor:
         pass
 
 class MockVectorSearch:
-    def search(self, query):
+    def __init__(self, **_: Any):
+        pass
+
+    def search(self, query, n_results=5):
         return {"documents": [{"document": f"Mock document for: {query}"}]}
 
 class MockMultiAgentSystem:
-    def __init__(self, llm, tools):
+    def __init__(self, llm, tools, **_: Any):
         self.llm = llm
         self.tools = tools
     
     def execute_workflow(self, query):
         return {"output": f"Mock AI response for: {query}"}
 
+    async def aexecute_workflow(self, query, sub_queries=None, context=None):
+        if inspect.isawaitable(context):
+            await context
+        return self.execute_workflow(query)
+
 class MockPipelineEvaluator:
     def evaluate_response(self, query, response, context):
         return {"score": 0.8, "reasoning": "Mock evaluation"}
 
-class MockPipelineMonitor:
-    def __init__(self):
-        pass
-
 class MockVoiceProcessor:
     def __init__(self):
         pass
 
-# Try to import real components, fallback to mocks
-try:
-    from .rag.document_processor import DocumentProcessor
-    from .rag.vector_search import VectorSearch
-    from .agents.multi_agent_system import MultiAgentSystem
-    from .evaluation.evaluator import PipelineEvaluator
-    from .monitoring.monitor import PipelineMonitor
-    from .voice.voice_processor import VoiceProcessor
-except ImportError:
-    DocumentProcessor = MockDocumentProcessor
-    VectorSearch = MockVectorSearch
-    MultiAgentSystem = MockMultiAgentSystem
-    PipelineEvaluator = MockPipelineEvaluator
-    PipelineMonitor = MockPipelineMonitor
-    VoiceProcessor = MockVoiceProcessor
+DEFAULT_WARM_UP = ("vector_search", "agent_system")
 
 class CodexAIPipeline:
     def __init__(self, config: Optional[Dict[str, Any]] = None):
         self.config = config or self._get_default_config()
+        self.startup_profile = StartupProfile()
         self.setup_components()
+        self.startup_profile.ready()
     
     def _get_default_config(self):
         return {
@@ -99,6 +94,36 @@ class CodexAIPipeline:
         }
     
     def setup_components(self):
+        """Create the cheap pieces every request needs.
+
+        Models, indexes, agents, the evaluator and the voice processor are
+        ``lazy_component``s: each is imported and built on first use, falling
+        back to its mock when its dependencies are not installed.
+        """
+        # Shared async provider clients (same pool the /chat endpoint uses)
+        self.providers = get_provider_pool(self.config)
+
+        # Prometheus metrics; exposed by the API apps on /metrics
+        self.monitor = PipelineMonitor()
+
+        # Blocking stages run on a bounded pool, each under its own timeout
+        self.stages = StageRunner(
+            max_workers=self.config.get("pipeline_max_workers", 8),
+            timeouts=self.config.get("stage_timeouts"),
+        )
+
+        # Grading happens in the background on a sample of responses; the
+        # evaluator itself is only built when the first batch is graded
+        self.evaluations = EvaluationQueue(
+            evaluator_factory=lambda: self.evaluator,
+            sample_rate=float(self.config.get("evaluation_sample_rate", os.getenv("EVAL_SAMPLE_RATE", 0.1))),
+            batch_size=self.config.get("evaluation_batch_size", 8),
+            flush_interval=self.config.get("evaluation_flush_interval", 2.0),
+            run_blocking=self._run_evaluation,
+        )
+
+    @lazy_component
+    def llm(self):
         # Initialize LLM with graceful fallback if LangChain or API key is unavailable
         llm_kwargs = {
             "model": self.config["model_name"],
@@ -107,30 +132,121 @@ class CodexAIPipeline:
         }
         api_key = self.config.get("openai_api_key")
 
-        if _ChatOpenAI is not None:
+        # use_mock_llm keeps offline runs (batch evaluation, benchmarks) off the network
+        if self.config.get("use_mock_llm"):
+            return MockChatOpenAI(**llm_kwargs)
+        try:
+            from langchain_openai import ChatOpenAI  # type: ignore
+
+            if api_key:
+                llm_kwargs["openai_api_key"] = api_key
+            return ChatOpenAI(**llm_kwargs)
+        except Exception:
+            return MockChatOpenAI(**llm_kwargs)
+
+    @lazy_component
+    def doc_processor(self):
+        return load_component(".rag.document_processor", "DocumentProcessor", MockDocumentProcessor)
+
+    @lazy_component
+    def vector_search(self):
+        if self.config.get("offline"):
+            # The real one downloads embedding weights
+            return MockVectorSearch()
+        vector_search = load_component(
+            ".rag.vector_search", "VectorSearch", MockVectorSearch, executor=self.stages.executor
+        )
+        embedding_cache = getattr(vector_search, "embedding_cache", None)
+        if embedding_cache is not None:
+            self.monitor.watch_cache("embedding", embedding_cache.stats)
+        return vector_search
+
+    @lazy_component
+    def response_cache(self):
+        # Response cache in front of process_query; the semantic tier reuses the
+        # retrieval embedding cache when available, so a query is embedded once
+        if not self.config.get("response_cache_enabled", True):
+            return None
+        embed = getattr(self.vector_search, "encode", None)
+        embedder = getattr(self.vector_search, "embedder", None)
+        if embed is None and embedder is not None:
+            embed = embedder.encode
+        response_cache = ResponseCache(
+            max_entries=self.config.get("response_cache_max_entries", 1024),
+            ttl_seconds=self.config.get("response_cache_ttl_seconds", 3600),
+            similarity_threshold=self.config.get("response_cache_similarity", 0.92),
+            embed=embed,
+        )
+        self.monitor.watch_cache("response", response_cache.stats)
+        return response_cache
+
+    @lazy_component
+    def tools(self):
+        # Bound to the (lazily built) vector search
+        return self._create_tools(self.vector_search)
+
+    @lazy_component
+    def agent_system(self):
+        if self.config.get("use_mock_llm"):
+            # The real agents need a LangChain chat model; they cannot drive MockChatOpenAI
+            return MockMultiAgentSystem(self.llm, self.tools)
+        return load_component(
+            ".agents.multi_agent_system",
+            "MultiAgentSystem",
+            MockMultiAgentSystem,
+            self.llm,
+            self.tools,
+            max_concurrency=self.config.get("agent_max_concurrency", 4),
+            monitor=self.monitor,
+        )
+
+    @lazy_component
+    def evaluator(self):
+        return load_component(".evaluation.evaluator", "PipelineEvaluator", MockPipelineEvaluator)
+
+    @lazy_component
+    def voice_processor(self):
+        return load_component(".voice.voice_processor", "VoiceProcessor", MockVoiceProcessor)
+
+    async def _component(self, name: str):
+        # First use builds on the stage pool, never on the event loop
+        return await aget(self, name, self.stages.executor)
+
+    def warm_up(self, components: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """Build ``components`` (default ``warm_up_components`` from the config, else
+        the vector search and agents) and load the persistent vector index, so the
+        first request does not pay for them. Returns the startup profile."""
+        names = components if components is not None else self.config.get("warm_up_components", DEFAULT_WARM_UP)
+        for name in names:
             try:
-                if api_key:
-                    llm_kwargs["openai_api_key"] = api_key
-                self.llm = _ChatOpenAI(**llm_kwargs)
-            except Exception:
-                self.llm = MockChatOpenAI(**llm_kwargs)
-        else:
-            self.llm = MockChatOpenAI(**llm_kwargs)
-
-        # Initialize core components first
-        self.doc_processor = DocumentProcessor()
-        self.vector_search = VectorSearch()
-
-        # Initialize tools (bound to initialized vector_search)
-        self.tools = self._create_tools(self.vector_search)
-
-        # Remaining components
-        self.agent_system = MultiAgentSystem(self.llm, self.tools)
-        self.evaluator = PipelineEvaluator()
-        self.monitor = PipelineMonitor()
-        self.voice_processor = VoiceProcessor()
-    
+                getattr(self, name)
+            except Exception as e:
+                print(f"Warm-up of {name} failed: {e}")
+
+        report = self.startup_profile.report()
+        warm_up = getattr(self.__dict__.get("vector_search"), "warm_up", None)
+        if warm_up is not None:
+            try:
+                report["vector_store"] = warm_up()
+            except Exception as e:
+                report["vector_store"] = {"error": str(e)}
+        # One inference per model loaded so far (including any preloaded pre-fork)
+        try:
+            report["models"] = get_model_registry().warm_up()
+        except Exception as e:
+            report["models"] = {"error": str(e)}
+        return report
+
+    def warm_up_in_background(self, components: Optional[Iterable[str]] = None) -> asyncio.Future:
+        """Run ``warm_up`` on the stage pool so a server can accept requests right away;
+        requests that arrive first build what they need themselves."""
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(self.stages.executor, self.warm_up, components)
+
     def _create_tools(self, vector_search):
+        tracer = self.monitor.tracer
+
+        @tracer.traced("tool.vector_search")
         def search_tool(query: str) -> str:
             """Search for information using vector search"""
             try:
@@ -139,11 +255,15 @@ class CodexAIPipeline:
             except Exception as e:
                 return f"Search error: {str(e)}"
         
+        @tracer.traced("tool.web_search")
         def web_search_tool(query: str) -> str:
             """Search the web for information"""
             return f"Web search results for: {query}"
 
-        ToolImpl = _Tool if _Tool is not None else SimpleTool
+        try:
+            from langchain.tools import Tool as ToolImpl  # type: ignore
+        except Exception:
+            ToolImpl = SimpleTool
 
         return [
             ToolImpl(
@@ -158,41 +278,226 @@ class CodexAIPipeline:
             ),
         ]
     
-    async def process_query(self, query: str, context: Optional[str] = None):
+    async def generate(self, query: str, context: Optional[str] = None) -> Optional[str]:
+        """Answer directly from the first provider that responds, or None."""
+        return await self.providers.complete(
+            build_prompt(query, context),
+            max_tokens=self.config.get("max_tokens"),
+        )
+
+    def close(self) -> None:
+        self.stages.close()
+
+    async def aclose(self, timeout: float = 5.0) -> None:
+        """Give queued evaluations up to ``timeout`` seconds to finish, then close."""
+        await self.evaluations.aclose(timeout)
+        self.close()
+
+    async def _retrieve_context(self, query: str) -> Optional[str]:
+        """Top chunks for ``query``, ranked and cut to ``context_token_budget``."""
+        n_results = self.config.get("retrieval_k", 8)
         try:
-            # Step 1: Retrieve relevant documents only when no explicit context provided
-            retrieved_context: Optional[str] = None
-            if not context:
-                try:
-                    relevant_docs = self.vector_search.search(query)
-                    retrieved_context = "\n".join(
-                        [doc.get("document", "") for doc in relevant_docs.get("documents", [])]
+            vector_search = await self._component("vector_search")
+            with self.monitor.stage("retrieval"):
+                asearch = getattr(vector_search, "asearch", None)
+                if asearch is not None:
+                    relevant_docs = await self.stages.run("retrieval", asearch(query, n_results))
+                else:
+                    relevant_docs = await self.stages.run_blocking(
+                        "retrieval", vector_search.search, query, n_results
                     )
-                except Exception:
-                    retrieved_context = None
-            
-            # Step 2: Execute agentic workflow
-            result = self.agent_system.execute_workflow(query)
+            return select_context(relevant_docs, self.config.get("context_token_budget", 2000)) or None
+        except Exception:
+            return None
+
+    async def _run_agents(self, query: str, context=None, sub_queries: Optional[List[str]] = None):
+        """Run the agent workflow grounded in ``context`` (text or a pending retrieval).
+
+        ``sub_queries`` are researched concurrently before the analysis.
+        """
+        agent_system = await self._component("agent_system")
+        aexecute = getattr(agent_system, "aexecute_workflow", None)
+        if aexecute is not None:
+            with self.monitor.stage("agents"):
+                return await self.stages.run("agents", aexecute(query, sub_queries, context=context))
+        if inspect.isawaitable(context):
+            await context
+        with self.monitor.stage("agents"):
+            return await self.stages.run_blocking("agents", agent_system.execute_workflow, query)
+
+    async def _run_evaluation(self, func, *args):
+        with self.monitor.stage("evaluation"):
+            return await self.stages.run_blocking("evaluation", func, *args)
+
+    def submit_evaluation(
+        self,
+        query: str,
+        response: str,
+        context: Optional[str],
+        on_result: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Queue a sampled background evaluation; returns a pending marker or None.
+
+        Poll ``self.evaluations.result(id)`` or pass ``on_result`` for the grade.
+        """
+        job_id = self.evaluations.submit(query, response, context or "", on_result)
+        return {"status": "pending", "id": job_id} if job_id else None
+
+    def _cache_model_config(self, path: Optional[str] = None) -> Dict[str, Any]:
+        config = {k: self.config.get(k) for k in ("model_name", "temperature", "max_tokens", "top_p")}
+        # Answers produced another way (e.g. a direct provider stream) get their own scope
+        if path is not None:
+            config["path"] = path
+        return config
+
+    async def _cache_get(
+        self, cache: ResponseCache, query: str, context: Optional[str], path: Optional[str] = None
+    ):
+        # Off the event loop: a semantic lookup embeds the query
+        return await self.stages.run_blocking(
+            "cache", cache.get, query, context, self._cache_model_config(path)
+        )
+
+    async def _cache_put(
+        self,
+        cache: ResponseCache,
+        query: str,
+        context: Optional[str],
+        response: Dict[str, Any],
+        path: Optional[str] = None,
+    ):
+        # The pending evaluation belongs to the run that produced the answer; hits are not re-evaluated
+        value = {**response, "evaluation": None}
+        await self.stages.run_blocking(
+            "cache", cache.put, query, value, context, self._cache_model_config(path)
+        )
+
+    async def process_query(
+        self,
+        query: str,
+        context: Optional[str] = None,
+        use_cache: bool = True,
+        evaluate: bool = True,
+        sub_queries: Optional[List[str]] = None,
+    ):
+        """Answer ``query``; ``sub_queries`` (e.g. the parts of a multi-part question)
+        are researched in parallel, and such answers bypass the response cache."""
+        with self.monitor.request("process_query"):
+            return await self._process_query(query, context, use_cache, evaluate, sub_queries)
+
+    async def _process_query(
+        self,
+        query: str,
+        context: Optional[str],
+        use_cache: bool,
+        evaluate: bool,
+        sub_queries: Optional[List[str]] = None,
+    ):
+        span = current_span()
+        cache = await self._component("response_cache") if use_cache and not sub_queries else None
+        if cache is not None:
+            cached = await self._cache_get(cache, query, context)
+            if span is not None:
+                span.set_attribute("cache_hit", cached is not None)
+            if cached is not None:
+                return cached
+
+        # Step 1: Retrieve relevant documents only when no explicit context provided.
+        # Retrieval runs while the agent workflow starts up; research waits on it.
+        retrieval = None if context else asyncio.ensure_future(self._retrieve_context(query))
+        try:
+            # Step 2: Execute agentic workflow grounded in the retrieved context
+            result = await self._run_agents(query, context or retrieval, sub_queries)
+            retrieved_context = await retrieval if retrieval is not None else None
             
-            # Step 3: Evaluate response
+            # Step 3: Queue the response for background evaluation; the caller does not wait
             final_context = context if context is not None else (retrieved_context or "")
-            evaluation = self.evaluator.evaluate_response(
-                query, result.get("output", str(result)), final_context
+            evaluation = (
+                self.submit_evaluation(query, result.get("output", str(result)), final_context)
+                if evaluate else None
             )
             
-            return {
+            response = {
                 "query": query,
                 "response": result.get("output", str(result)),
                 "evaluation": evaluation,
                 "context": final_context or None,
             }
+            if cache is not None:
+                await self._cache_put(cache, query, context, response)
+            return response
         except Exception as e:
+            # The error is returned rather than raised; keep it visible in the trace
+            if span is not None:
+                span.record_error(e)
             return {
                 "query": query,
                 "response": f"Error processing query: {str(e)}",
                 "evaluation": {"score": 0, "error": str(e)},
                 "context": context,
             }
+        finally:
+            if retrieval is not None:
+                retrieval.cancel()
+
+    async def stream_query(
+        self, query: str, context: Optional[str] = None, use_cache: bool = True
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream an answer as ``delta`` events followed by a final ``done`` event.
+
+        Provider token deltas are forwarded as they arrive, grounded in the same
+        retrieved context ``process_query`` uses. A cached answer, or the agent
+        workflow's answer when no provider is available, is emitted as a single delta.
+        """
+        with self.monitor.request("stream_query", current=False) as span:
+            async for event in iterate_in_span(span, self._stream_query(query, context, use_cache)):
+                yield event
+
+    async def _stream_query(
+        self, query: str, context: Optional[str], use_cache: bool
+    ) -> AsyncIterator[Dict[str, Any]]:
+        try:
+            cache = await self._component("response_cache") if use_cache else None
+            if cache is not None:
+                cached = await self._cache_get(cache, query, context, path="stream")
+                span = current_span()
+                if span is not None:
+                    span.set_attribute("cache_hit", cached is not None)
+                if cached is not None:
+                    yield {"type": "delta", "text": cached["response"]}
+                    yield {"type": "done", **cached}
+                    return
+
+            retrieved_context = None if context else await self._retrieve_context(query)
+            final_context = context if context is not None else (retrieved_context or "")
+
+            chunks = []
+            async for delta in self.providers.stream(
+                build_prompt(query, final_context or None),
+                max_tokens=self.config.get("max_tokens"),
+            ):
+                chunks.append(delta)
+                yield {"type": "delta", "text": delta}
+
+            if chunks:
+                response = "".join(chunks)
+            else:
+                # No provider: the agent workflow answers from the context already retrieved
+                result = await self._run_agents(query, final_context or None)
+                response = result.get("output", str(result))
+                yield {"type": "delta", "text": response}
+
+            result = {
+                "query": query,
+                "response": response,
+                "evaluation": self.submit_evaluation(query, response, final_context),
+                "context": final_context or None,
+            }
+            if cache is not None:
+                await self._cache_put(cache, query, context, result, path="stream")
+            yield {"type": "done", **result}
+        except Exception as e:
+            yield {"type": "error", "query": query, "error": str(e)}
 
 # Example usage
 if __name__ == "__main__":
@@ -0,0 +1,154 @@
+"""Two-tier response cache for ``CodexAIPipeline.process_query``.
+
+Tier 1 is an exact match on the normalized (query, context, model config) key.
+Tier 2 compares query embeddings against cached entries that share the same
+context and model config, and reuses an answer when the cosine similarity is
+above a threshold. Both tiers share one TTL and one LRU size bound.
+"""
+import hashlib
+import json
+import re
+import string
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = string.punctuation + " "
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation."""
+    if not text:
+        return ""
+    return _WHITESPACE.sub(" ", text.lower()).strip().rstrip(_TRAILING_PUNCTUATION)
+
+
+def _digest(*parts: Any) -> str:
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class _Entry:
+    value: Dict[str, Any]
+    scope: str
+    expires_at: float
+    embedding: Optional[Any] = None
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: float = 3600.0,
+        similarity_threshold: float = 0.92,
+        embed: Optional[Callable[[List[str]], Sequence[Sequence[float]]]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.embed = embed
+        self._clock = clock
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    @staticmethod
+    def scope_key(context: Optional[str], model_config: Optional[Dict[str, Any]]) -> str:
+        return _digest(normalize_text(context), model_config or {})
+
+    def key(self, query: str, context: Optional[str], model_config: Optional[Dict[str, Any]]) -> str:
+        return _digest(normalize_text(query), self.scope_key(context, model_config))
+
+    def _embed(self, query: str):
+        if self.embed is None:
+            return None
+        import numpy as np
+
+        vector = np.asarray(self.embed([normalize_text(query)])[0], dtype="float32")
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else None
+
+    def _evict_expired(self, now: float) -> None:
+        expired = [k for k, e in self._entries.items() if e.expires_at <= now]
+        for k in expired:
+            del self._entries[k]
+        self._stats["expirations"] += len(expired)
+
+    def get(
+        self,
+        query: str,
+        context: Optional[str] = None,
+        model_config: Optional[Dict[str, Any]] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Return a cached result annotated with ``cache_hit``, or None on a miss."""
+        key = self.key(query, context, model_config)
+        now = self._clock()
+        with self._lock:
+            self._evict_expired(now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._stats["exact_hits"] += 1
+                return {**entry.value, "cache_hit": "exact"}
+            has_candidates = any(e.embedding is not None for e in self._entries.values())
+
+        if not has_candidates:
+            with self._lock:
+                self._stats["misses"] += 1
+            return None
+
+        # Embedding happens outside the lock; it is the expensive part of a lookup
+        embedding = self._embed(query)
+        scope = self.scope_key(context, model_config)
+        with self._lock:
+            best_key, best_score = None, self.similarity_threshold
+            if embedding is not None:
+                for k, e in self._entries.items():
+                    if e.scope != scope or e.embedding is None or e.expires_at <= now:
+                        continue
+                    score = float(e.embedding @ embedding)
+                    if score >= best_score:
+                        best_key, best_score = k, score
+            if best_key is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self._stats["semantic_hits"] += 1
+            return {**self._entries[best_key].value, "cache_hit": "semantic"}
+
+    def put(
+        self,
+        query: str,
+        value: Dict[str, Any],
+        context: Optional[str] = None,
+        model_config: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        entry = _Entry(
+            value=value,
+            scope=self.scope_key(context, model_config),
+            expires_at=self._clock() + self.ttl_seconds,
+            embedding=self._embed(query),
+        )
+        key = self.key(query, context, model_config)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats, size=len(self._entries))
+        lookups = stats["exact_hits"] + stats["semantic_hits"] + stats["misses"]
+        stats["hit_ratio"] = (stats["exact_hits"] + stats["semantic_hits"]) / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,77 @@
+"""Run pipeline stages without blocking the event loop.
+
+Stages with native async clients are awaited directly; blocking stages
+(embedding, legacy LangChain ``invoke`` calls, evaluators) run on a bounded
+thread pool owned by the pipeline. Every stage gets its own timeout. A timed
+out or cancelled thread-pool stage stops being awaited immediately, but the
+worker thread finishes its current call in the background.
+"""
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+DEFAULT_STAGE_TIMEOUTS: Dict[str, float] = {
+    "retrieval": 5.0,
+    "agents": 60.0,
+    "evaluation": 30.0,
+}
+
+
+class StageTimeoutError(Exception):
+    def __init__(self, stage: str, timeout: float):
+        super().__init__(f"{stage} stage timed out after {timeout}s")
+        self.stage = stage
+        self.timeout = timeout
+
+
+class ClientDisconnected(Exception):
+    pass
+
+
+class StageRunner:
+    def __init__(self, max_workers: int = 8, timeouts: Optional[Dict[str, float]] = None):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pipeline-stage")
+        self.timeouts = {**DEFAULT_STAGE_TIMEOUTS, **(timeouts or {})}
+
+    async def run(self, stage: str, awaitable: Awaitable[Any]) -> Any:
+        """Await ``awaitable`` under the stage's timeout (None means no limit)."""
+        timeout = self.timeouts.get(stage)
+        try:
+            return await asyncio.wait_for(awaitable, timeout)
+        except asyncio.TimeoutError:
+            raise StageTimeoutError(stage, timeout) from None
+
+    async def run_blocking(self, stage: str, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run a blocking callable on the stage thread pool under the stage's timeout."""
+        loop = asyncio.get_running_loop()
+        # Carry the caller's context (e.g. the current trace span) into the worker thread
+        context = contextvars.copy_context()
+        future = loop.run_in_executor(self.executor, functools.partial(context.run, func, *args, **kwargs))
+        return await self.run(stage, future)
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def run_until_disconnected(
+    awaitable: Awaitable[Any],
+    is_disconnected: Callable[[], Awaitable[bool]],
+    poll_interval: float = 0.25,
+) -> Any:
+    """Await ``awaitable``, cancelling it if the client goes away first.
+
+    ``is_disconnected`` is e.g. Starlette's ``Request.is_disconnected``.
+    Raises ``ClientDisconnected`` once the work has been cancelled.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await is_disconnected():
+                raise ClientDisconnected()
+    finally:
+        task.cancel()
@@ -0,0 +1,45 @@
+"""Turn vector search results into a prompt context that fits a token budget."""
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Rough English average for GPT-style tokenizers; good enough for budgeting
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _ranked_chunks(results: Dict[str, Any]) -> Iterator[Tuple[float, str]]:
+    documents = results.get("documents") or []
+    distances = results.get("distances") or []
+    # Chroma returns one list per query; callers pass single-query results
+    if documents and isinstance(documents[0], list):
+        documents = documents[0]
+        distances = distances[0] if distances else []
+    for i, doc in enumerate(documents):
+        text = doc.get("document", "") if isinstance(doc, dict) else str(doc or "")
+        distance = distances[i] if i < len(distances) and distances[i] is not None else float(i)
+        yield distance, text
+
+
+def select_context(results: Optional[Dict[str, Any]], token_budget: int = 2000) -> str:
+    """Closest chunks first, duplicates dropped, stopping at ``token_budget``.
+
+    A best chunk that alone exceeds the budget is truncated rather than dropped.
+    """
+    selected: List[str] = []
+    seen = set()
+    used = 0
+    for _, text in sorted(_ranked_chunks(results or {}), key=lambda item: item[0]):
+        text = text.strip()
+        if not text or text in seen:
+            continue
+        cost = estimate_tokens(text)
+        if used + cost > token_budget:
+            if not selected:
+                selected.append(text[:token_budget * CHARS_PER_TOKEN])
+            break
+        seen.add(text)
+        selected.append(text)
+        used += cost
+    return "\n\n".join(selected)
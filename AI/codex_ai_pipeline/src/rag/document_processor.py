@@ -1,33 +1,346 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import PyPDFLoader
-import chromadb
+
+from .vector_store import DEFAULT_PERSIST_DIR, get_collection
+
+Page = Tuple[str, Dict[str, Any]]
+
+
+def _load_pdf(path: str) -> List[Page]:
+    """Parse one PDF into (text, metadata) pages; runs inside pool workers."""
+    return [(doc.page_content, doc.metadata) for doc in PyPDFLoader(path).load()]
+
+
+def chunk_id(text: str, metadata: Dict[str, Any]) -> str:
+    """Content-addressed chunk id: stable for the same source, page and text."""
+    source = str(metadata.get("source", "unknown"))
+    page = metadata.get("page", 0)
+    content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()[:24]
+    source_hash = hashlib.sha256(source.encode("utf-8")).hexdigest()[:16]
+    return f"{source_hash}:{page}:{content_hash}"
+
+
+def _source_path(path: str) -> str:
+    """Canonical form of a file path; it becomes the chunk ``source`` and manifest key."""
+    return os.path.abspath(path)
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@dataclass
+class IngestStats:
+    files: int = 0
+    pages: int = 0
+    chunks: int = 0
+    batches: int = 0
+    failed: int = 0
+    seconds: float = 0.0
+
+    @property
+    def pages_per_second(self) -> float:
+        return self.pages / self.seconds if self.seconds else 0.0
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks / self.seconds if self.seconds else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.files} files, {self.pages} pages, {self.chunks} chunks in {self.seconds:.1f}s "
+            f"({self.pages_per_second:.1f} pages/s, {self.chunks_per_second:.1f} chunks/s, "
+            f"{self.failed} failed)"
+        )
+
+
+@dataclass
+class SyncStats:
+    new_files: int = 0
+    changed_files: int = 0
+    unchanged_files: int = 0
+    removed_files: int = 0
+    failed: int = 0
+    chunks_added: int = 0
+    chunks_deleted: int = 0
+    seconds: float = 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.new_files} new, {self.changed_files} changed, {self.unchanged_files} unchanged, "
+            f"{self.removed_files} removed files; +{self.chunks_added}/-{self.chunks_deleted} chunks "
+            f"in {self.seconds:.1f}s ({self.failed} failed)"
+        )
+
+
+class IndexManifest:
+    """JSON record of indexed files: mtime, size, content hash and chunk ids."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.files: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.files = json.load(f).get("files", {})
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "files": self.files}, f)
+        os.replace(tmp_path, self.path)
+
 
 class DocumentProcessor:
-    def __init__(self, chunk_size=1000, chunk_overlap=200):
+    def __init__(self, chunk_size=1000, chunk_overlap=200, persist_dir: Optional[str] = None):
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=chunk_size,
             chunk_overlap=chunk_overlap
         )
-        self.client = chromadb.Client()
-        self.collection = self.client.create_collection("documents")
-    
+        persist_dir = persist_dir or DEFAULT_PERSIST_DIR
+        self.collection = get_collection(persist_dir)
+        # The manifest lives next to the index so snapshots capture both
+        self.manifest_path = os.path.join(persist_dir, "index_manifest.json")
+
     def process_documents(self, file_paths: list):
         documents = []
         for path in file_paths:
             loader = PyPDFLoader(path)
             docs = loader.load()
             documents.extend(docs)
-        
+
         chunks = self.text_splitter.split_documents(documents)
         return chunks
-    
-    def store_embeddings(self, chunks):
-        ids = [f"doc_{i}" for i in range(len(chunks))]
-        texts = [chunk.page_content for chunk in chunks]
-        metadatas = [chunk.metadata for chunk in chunks]
-        
-        self.collection.add(
+
+    def store_embeddings(self, chunks, batch_size: int = 256):
+        # Chroma embeds on add; bounded batches keep memory and request size flat
+        for start in range(0, len(chunks), batch_size):
+            self._add_batch(chunks[start:start + batch_size])
+
+    def _add_batch(self, chunks) -> None:
+        # Identical (source, page, text) chunks collapse onto one id
+        by_id = {chunk_id(chunk.page_content, chunk.metadata): chunk for chunk in chunks}
+        ids = list(by_id)
+        texts = [chunk.page_content for chunk in by_id.values()]
+        metadatas = [chunk.metadata for chunk in by_id.values()]
+
+        # Upsert keeps re-ingestion idempotent now that ids are content-addressed
+        self.collection.upsert(
             ids=ids,
             documents=texts,
             metadatas=metadatas
         )
+
+    def _load_pages(self, file_paths: List[str], max_workers: Optional[int], stats) -> Iterator[Tuple[str, List[Page]]]:
+        """Yield (path, parsed pages) per file, in completion order.
+
+        At most ``2 * max_workers`` files are parsed or waiting to be consumed at
+        any time, so memory stays bounded no matter how many paths are given.
+        """
+        if max_workers == 0:
+            for path in file_paths:
+                try:
+                    pages = _load_pdf(path)
+                except Exception as e:
+                    stats.failed += 1
+                    print(f"Failed to load {path}: {e}")
+                    continue
+                yield path, pages
+            return
+
+        workers = max_workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            window = 2 * workers
+            paths = iter(file_paths)
+            pending = {}
+            for path in paths:
+                pending[pool.submit(_load_pdf, path)] = path
+                if len(pending) >= window:
+                    break
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path = pending.pop(future)
+                    try:
+                        pages = future.result()
+                    except Exception as e:
+                        stats.failed += 1
+                        print(f"Failed to load {path}: {e}")
+                        pages = None
+                    next_path = next(paths, None)
+                    if next_path is not None:
+                        pending[pool.submit(_load_pdf, next_path)] = next_path
+                    if pages is not None:
+                        yield path, pages
+
+    def ingest(
+        self,
+        file_paths: Iterable[str],
+        batch_size: int = 256,
+        max_workers: Optional[int] = None,
+    ) -> IngestStats:
+        """Streaming ingestion: parse PDFs in a process pool, then split and
+        write chunks to the collection in fixed-size batches.
+
+        ``max_workers=0`` parses in-process. Ingested files are recorded in the
+        index manifest, so a later ``sync`` skips them. Returns throughput
+        statistics.
+        """
+        stats = IngestStats()
+        started = time.perf_counter()
+        manifest = IndexManifest(self.manifest_path)
+        batch = []
+
+        paths = list(dict.fromkeys(_source_path(p) for p in file_paths))
+        for path, pages in self._load_pages(paths, max_workers, stats):
+            stats.files += 1
+            stats.pages += len(pages)
+            chunks = self._split_pages(pages)
+            st = os.stat(path)
+            manifest.files[path] = {
+                "mtime": st.st_mtime,
+                "size": st.st_size,
+                "sha256": _file_sha256(path),
+                "chunk_ids": sorted({chunk_id(c.page_content, c.metadata) for c in chunks}),
+            }
+            for chunk in chunks:
+                batch.append(chunk)
+                if len(batch) >= batch_size:
+                    self._add_batch(batch)
+                    stats.chunks += len(batch)
+                    stats.batches += 1
+                    batch = []
+
+        if batch:
+            self._add_batch(batch)
+            stats.chunks += len(batch)
+            stats.batches += 1
+
+        manifest.save()
+        stats.seconds = time.perf_counter() - started
+        return stats
+
+    def _split_pages(self, pages: List[Page]):
+        return self.text_splitter.create_documents(
+            [text for text, _ in pages], metadatas=[metadata for _, metadata in pages]
+        )
+
+    def sync(
+        self,
+        file_paths: Iterable[str],
+        batch_size: int = 256,
+        max_workers: Optional[int] = None,
+        prune: bool = True,
+    ) -> SyncStats:
+        """Incrementally bring the collection in line with ``file_paths``.
+
+        Files whose mtime and size match the manifest are skipped without being
+        read; files whose bytes hash the same are skipped without being parsed.
+        Changed files are re-split and only chunks with new ids are embedded;
+        chunks that disappeared are deleted. With ``prune``, files in the
+        manifest that are not in ``file_paths`` have their chunks removed.
+        """
+        stats = SyncStats()
+        started = time.perf_counter()
+        manifest = IndexManifest(self.manifest_path)
+        current = {_source_path(p) for p in file_paths}
+
+        to_parse: Dict[str, Dict[str, Any]] = {}
+        for path in sorted(current):
+            try:
+                st = os.stat(path)
+            except OSError as e:
+                stats.failed += 1
+                print(f"Failed to stat {path}: {e}")
+                continue
+            entry = manifest.files.get(path)
+            if entry and entry["mtime"] == st.st_mtime and entry["size"] == st.st_size:
+                stats.unchanged_files += 1
+                continue
+            file_hash = _file_sha256(path)
+            if entry and entry["sha256"] == file_hash:
+                entry.update(mtime=st.st_mtime, size=st.st_size)
+                stats.unchanged_files += 1
+                continue
+            to_parse[path] = {"mtime": st.st_mtime, "size": st.st_size, "sha256": file_hash}
+
+        batch = []
+        for path, pages in self._load_pages(list(to_parse), max_workers, stats):
+            old_ids: Set[str] = set(manifest.files.get(path, {}).get("chunk_ids", []))
+            chunks = self._split_pages(pages)
+            new_ids = {chunk_id(c.page_content, c.metadata) for c in chunks}
+
+            for chunk in chunks:
+                if chunk_id(chunk.page_content, chunk.metadata) in old_ids:
+                    continue
+                batch.append(chunk)
+                if len(batch) >= batch_size:
+                    self._add_batch(batch)
+                    batch = []
+            stats.chunks_added += len(new_ids - old_ids)
+
+            stale = sorted(old_ids - new_ids)
+            if stale:
+                self.collection.delete(ids=stale)
+                stats.chunks_deleted += len(stale)
+
+            if path in manifest.files:
+                stats.changed_files += 1
+            else:
+                stats.new_files += 1
+            manifest.files[path] = {**to_parse[path], "chunk_ids": sorted(new_ids)}
+
+        if batch:
+            self._add_batch(batch)
+
+        if prune:
+            for path in [p for p in manifest.files if p not in current]:
+                stale = manifest.files.pop(path).get("chunk_ids", [])
+                if stale:
+                    self.collection.delete(ids=stale)
+                stats.chunks_deleted += len(stale)
+                stats.removed_files += 1
+
+        manifest.save()
+        stats.seconds = time.perf_counter() - started
+        return stats
+
+
+def _expand_paths(paths: List[str]) -> List[str]:
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(os.path.join(root, n) for n in sorted(names) if n.lower().endswith(".pdf"))
+        else:
+            files.append(path)
+    return files
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest PDF files or directories into the vector store")
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--workers", type=int, default=None, help="parser processes (0 = in-process)")
+    parser.add_argument("--sync", action="store_true", help="incremental sync against the index manifest")
+    args = parser.parse_args()
+
+    processor = DocumentProcessor()
+    if args.sync:
+        stats = processor.sync(_expand_paths(args.paths), args.batch_size, args.workers)
+    else:
+        stats = processor.ingest(_expand_paths(args.paths), args.batch_size, args.workers)
+    print(stats.summary())
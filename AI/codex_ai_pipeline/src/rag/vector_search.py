@@ -1,18 +1,174 @@
-from sentence_transformers import SentenceTransformer
-import chromadb
+import asyncio
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .vector_store import get_collection, get_embedder, warm_up
+
+_WHITESPACE = re.compile(r"\s+")
+# Keys of a Chroma query result that hold one list per query; others (e.g. "included") do not
+_PER_QUERY_KEYS = ("ids", "documents", "metadatas", "distances", "embeddings")
+
+
+def normalize_query(text: str, lowercase: bool = False) -> str:
+    # Tokenizers ignore whitespace runs, and an uncased one ignores case, so this
+    # does not change the embedding; it only widens cache hits
+    text = _WHITESPACE.sub(" ", text).strip()
+    return text.lower() if lowercase else text
+
+
+def _is_uncased(embedder) -> bool:
+    """True when the embedder's tokenizer lowercases its input (e.g. all-MiniLM-L6-v2)."""
+    return bool(getattr(getattr(embedder, "tokenizer", None), "do_lower_case", False))
+
+
+class EmbeddingCache:
+    """Thread-safe LRU of query embeddings keyed by normalized text."""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, key: str, vector: np.ndarray) -> None:
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class SearchBatcher:
+    """Coalesces concurrent ``asearch`` calls that arrive within ``max_wait``
+    seconds into one ``search_many`` call, run on ``executor`` (default: the
+    loop's default executor) so encoding never blocks the event loop."""
+
+    def __init__(self, search_many, max_batch: int = 32, max_wait: float = 0.005, executor=None):
+        self._search_many = search_many
+        self._executor = executor
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._pending: Dict[int, List[Tuple[str, asyncio.Future]]] = {}
+        self._timers: Dict[int, asyncio.TimerHandle] = {}
+
+    async def search(self, query: str, n_results: int):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        # Requests are grouped by n_results so one collection query serves the batch
+        batch = self._pending.setdefault(n_results, [])
+        batch.append((query, future))
+        if len(batch) >= self.max_batch:
+            self._flush(n_results)
+        elif len(batch) == 1:
+            self._timers[n_results] = loop.call_later(self.max_wait, self._flush, n_results)
+        return await future
+
+    def _flush(self, n_results: int) -> None:
+        timer = self._timers.pop(n_results, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(n_results, [])
+        if batch:
+            asyncio.ensure_future(self._run(batch, n_results))
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future]], n_results: int) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+            results = await loop.run_in_executor(
+                self._executor, self._search_many, [q for q, _ in batch], n_results
+            )
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
 
 class VectorSearch:
-    def __init__(self):
-        self.embedder = SentenceTransformer('all-MiniLM-L6-v2')
-        self.client = chromadb.Client()
-        self.collection = self.client.get_collection("documents")
-    
+    def __init__(
+        self,
+        persist_dir: Optional[str] = None,
+        embedder=None,
+        collection=None,
+        cache_size: int = 10000,
+        executor=None,
+    ):
+        # Same persistent collection and embedding model the DocumentProcessor writes with
+        self.persist_dir = persist_dir
+        self.embedder = embedder if embedder is not None else get_embedder()
+        self.collection = collection if collection is not None else get_collection(persist_dir)
+        self.embedding_cache = EmbeddingCache(cache_size)
+        self.lowercase_queries = _is_uncased(self.embedder)
+        self.executor = executor
+        self._batcher: Optional[SearchBatcher] = None
+        self._batcher_loop = None
+
+    def warm_up(self):
+        return warm_up(self.persist_dir)
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        """Embed texts, encoding only cache misses and doing so in one batch."""
+        keys = [normalize_query(t, self.lowercase_queries) for t in texts]
+        vectors: List[Optional[np.ndarray]] = [self.embedding_cache.get(k) for k in keys]
+        missing = sorted({k for k, v in zip(keys, vectors) if v is None})
+        if missing:
+            encoded = dict(zip(missing, np.asarray(self.embedder.encode(missing))))
+            for key, vector in encoded.items():
+                self.embedding_cache.put(key, vector)
+            vectors = [v if v is not None else encoded[k] for k, v in zip(keys, vectors)]
+        return np.stack(vectors)
+
     def search(self, query: str, n_results: int = 5):
-        query_embedding = self.embedder.encode([query])
-        
+        return self.search_many([query], n_results)[0]
+
+    def search_many(self, queries: Sequence[str], n_results: int = 5) -> List[Dict[str, Any]]:
+        """One encode batch and one multi-query call; returns one result per query."""
+        if not queries:
+            return []
         results = self.collection.query(
-            query_embeddings=query_embedding.tolist(),
+            query_embeddings=self.encode(queries).tolist(),
             n_results=n_results
         )
-        
-        return results
+        return [
+            {
+                key: ([value[i]] if key in _PER_QUERY_KEYS and isinstance(value, list) else value)
+                for key, value in results.items()
+            }
+            for i in range(len(queries))
+        ]
+
+    async def asearch(self, query: str, n_results: int = 5):
+        """Async search; concurrent callers are micro-batched into one query."""
+        loop = asyncio.get_running_loop()
+        if self._batcher is None or self._batcher_loop is not loop:
+            self._batcher = SearchBatcher(self.search_many, executor=self.executor)
+            self._batcher_loop = loop
+        return await self._batcher.search(query, n_results)
@@ -0,0 +1,176 @@
+"""Single on-disk Chroma store shared by ``DocumentProcessor`` and ``VectorSearch``.
+
+Both sides get the collection from ``get_collection`` so they always talk to
+the same persistent client and embed with the same model. The embedding model
+name is recorded in the collection metadata and checked on open, so a query
+side configured with a different model fails loudly instead of returning
+meaningless neighbours.
+
+Snapshots are tar.gz archives of the persist directory:
+
+    python -m src.rag.vector_store snapshot backups/index.tar.gz
+    python -m src.rag.vector_store restore backups/index.tar.gz
+
+Restore replaces the files under a live store, and open clients and
+collections (including chromadb's own client cache) would keep pointing at
+the old ones, so it refuses to run in a process that has the store open.
+Stop the API and any ingestion jobs before restoring.
+"""
+import argparse
+import os
+import shutil
+import tarfile
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from ..serving.model_registry import get_registry
+
+COLLECTION_NAME = "documents"
+DEFAULT_PERSIST_DIR = os.getenv("VECTOR_STORE_DIR", "data/chroma")
+DEFAULT_EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+
+_lock = threading.Lock()
+_clients: Dict[str, Any] = {}
+
+
+def get_embedder(model_name: str = DEFAULT_EMBEDDING_MODEL):
+    """Process-wide SentenceTransformer used for both documents and queries; comes
+    from the model registry, so a pre-fork master's copy is shared by its workers."""
+    return get_registry().get("embedder", model_name)
+
+
+class SentenceTransformerEmbedding:
+    """Chroma embedding function backed by the shared SentenceTransformer."""
+
+    def __init__(self, model_name: str = DEFAULT_EMBEDDING_MODEL):
+        self.model_name = model_name
+
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        return get_embedder(self.model_name).encode(list(input)).tolist()
+
+
+def get_client(persist_dir: Optional[str] = None):
+    persist_dir = os.path.abspath(persist_dir or DEFAULT_PERSIST_DIR)
+    with _lock:
+        if persist_dir not in _clients:
+            import chromadb
+
+            os.makedirs(persist_dir, exist_ok=True)
+            _clients[persist_dir] = chromadb.PersistentClient(path=persist_dir)
+        return _clients[persist_dir]
+
+
+def get_collection(
+    persist_dir: Optional[str] = None,
+    name: str = COLLECTION_NAME,
+    embedding_model: str = DEFAULT_EMBEDDING_MODEL,
+):
+    client = get_client(persist_dir)
+    embedding_function = SentenceTransformerEmbedding(embedding_model)
+    # get_or_create_collection overwrites the metadata of an existing collection, which would
+    # hide a model mismatch, so only pass the model when the collection is created
+    existing = {getattr(c, "name", c) for c in client.list_collections()}
+    if name in existing:
+        collection = client.get_collection(name, embedding_function=embedding_function)
+    else:
+        collection = client.get_or_create_collection(
+            name, embedding_function=embedding_function, metadata={"embedding_model": embedding_model}
+        )
+    stored_model = (collection.metadata or {}).get("embedding_model")
+    if stored_model and stored_model != embedding_model:
+        raise ValueError(
+            f"Collection '{name}' was built with embedding model '{stored_model}', "
+            f"but '{embedding_model}' is configured"
+        )
+    return collection
+
+
+def warm_up(persist_dir: Optional[str] = None, embedding_model: str = DEFAULT_EMBEDDING_MODEL) -> Dict[str, Any]:
+    """Open the store, load the embedding model and touch the index so the
+    first real query does not pay for it. Returns timing information."""
+    started = time.perf_counter()
+    collection = get_collection(persist_dir, embedding_model=embedding_model)
+    count = collection.count()
+    if count:
+        collection.query(query_texts=["warm up"], n_results=1)
+    else:
+        get_embedder(embedding_model).encode(["warm up"])
+    return {"documents": count, "seconds": round(time.perf_counter() - started, 3)}
+
+
+def snapshot(archive_path: str, persist_dir: Optional[str] = None) -> str:
+    """Write a tar.gz of the persist directory; stop writers first for a consistent copy."""
+    persist_dir = os.path.abspath(persist_dir or DEFAULT_PERSIST_DIR)
+    os.makedirs(os.path.dirname(os.path.abspath(archive_path)), exist_ok=True)
+    with tarfile.open(archive_path, "w:gz") as tar:
+        tar.add(persist_dir, arcname="chroma")
+    return archive_path
+
+
+def _extract(tar: tarfile.TarFile, destination: str) -> None:
+    """Extract without letting members escape ``destination`` (``..``, absolute paths, links)."""
+    if hasattr(tarfile, "data_filter"):
+        tar.extractall(destination, filter="data")
+        return
+    root = os.path.realpath(destination)
+    for member in tar.getmembers():
+        target = os.path.realpath(os.path.join(destination, member.name))
+        if not (member.isfile() or member.isdir()) or os.path.commonpath([root, target]) != root:
+            raise ValueError(f"Refusing to extract '{member.name}' from snapshot")
+    tar.extractall(destination)
+
+
+def restore(archive_path: str, persist_dir: Optional[str] = None) -> str:
+    """Replace the persist directory with the contents of a snapshot.
+
+    The current directory is kept as ``<dir>.bak`` until the new one is in place.
+    Raises ``RuntimeError`` if this process already opened the store.
+    """
+    persist_dir = os.path.abspath(persist_dir or DEFAULT_PERSIST_DIR)
+    with _lock:
+        if persist_dir in _clients:
+            raise RuntimeError(
+                f"Vector store at {persist_dir} is open in this process; restore it from a "
+                "separate process while the API and ingestion jobs are stopped"
+            )
+    parent = os.path.dirname(persist_dir)
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=parent)
+    try:
+        with tarfile.open(archive_path, "r:gz") as tar:
+            _extract(tar, staging)
+        restored = os.path.join(staging, "chroma")
+        if not os.path.isdir(restored):
+            raise ValueError(f"{archive_path} is not a vector store snapshot (no 'chroma' directory)")
+        backup = f"{persist_dir}.bak"
+        if os.path.exists(persist_dir):
+            shutil.rmtree(backup, ignore_errors=True)
+            os.replace(persist_dir, backup)
+        os.replace(restored, persist_dir)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return persist_dir
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the persistent vector store")
+    parser.add_argument("--persist-dir", default=None)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("snapshot").add_argument("archive")
+    commands.add_parser(
+        "restore",
+        help="replace the store with a snapshot; stop the API and ingestion jobs first",
+        description="Replace the persist directory with a snapshot. Processes that have the store "
+        "open keep reading the replaced files, so stop the API and any ingestion jobs first.",
+    ).add_argument("archive")
+    commands.add_parser("warm-up")
+    args = parser.parse_args()
+
+    if args.command == "snapshot":
+        print(f"Snapshot written to {snapshot(args.archive, args.persist_dir)}")
+    elif args.command == "restore":
+        print(f"Restored into {restore(args.archive, args.persist_dir)}")
+    else:
+        print(warm_up(args.persist_dir))
@@ -0,0 +1,149 @@
+"""Process-wide registry of the local models the pipeline serves from.
+
+Every model (the SentenceTransformer embedder, Whisper) is loaded through
+``get_registry().get(kind, name)``, so a process holds one copy of each set of
+weights. Loading them in a pre-fork master (see ``config/gunicorn.conf.py``)
+before the workers are forked lets every worker share those pages
+copy-on-write instead of loading its own copy:
+
+    PRELOAD_MODELS=embedder:all-MiniLM-L6-v2,whisper:base \\
+        gunicorn -c config/gunicorn.conf.py api.main:app
+
+``warm_up`` runs one small inference per loaded model. It belongs in each
+worker after the fork (inference in the master would start thread pools that
+do not survive a fork) and makes the first real request as fast as the rest.
+"""
+import gc
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+Key = Tuple[str, str]
+
+
+def _load_embedder(name: str):
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(name)
+
+
+def _warm_up_embedder(model) -> None:
+    model.encode(["warm up"])
+
+
+def _load_whisper(name: str):
+    import whisper
+
+    return whisper.load_model(name)
+
+
+def _warm_up_whisper(model) -> None:
+    import numpy as np
+
+    # One second of silence at Whisper's 16 kHz sample rate
+    model.transcribe(np.zeros(16000, dtype=np.float32), fp16=False)
+
+
+LOADERS: Dict[str, Tuple[Callable[[str], Any], Optional[Callable[[Any], None]]]] = {
+    "embedder": (_load_embedder, _warm_up_embedder),
+    "whisper": (_load_whisper, _warm_up_whisper),
+}
+
+
+def parse_model_list(spec: Optional[str]) -> List[Key]:
+    """``"embedder:all-MiniLM-L6-v2,whisper:base"`` -> [(kind, name), ...]."""
+    keys = []
+    for item in (spec or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        kind, sep, name = item.partition(":")
+        if not sep or kind not in LOADERS:
+            raise ValueError(f"Bad model spec '{item}'; expected one of {sorted(LOADERS)} as kind:name")
+        keys.append((kind, name))
+    return keys
+
+
+class ModelRegistry:
+    def __init__(self, loaders: Optional[Dict[str, Tuple[Callable[[str], Any], Optional[Callable[[Any], None]]]]] = None):
+        self.loaders = loaders if loaders is not None else LOADERS
+        self._models: Dict[Key, Any] = {}
+        self._locks: Dict[Key, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._stats: Dict[Key, Dict[str, Any]] = {}
+
+    def get(self, kind: str, name: str) -> Any:
+        """The model ``kind:name``, loading it on first use (once, even under concurrency)."""
+        key = (kind, name)
+        model = self._models.get(key)
+        if model is not None:
+            return model
+        with self._lock:
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            if key not in self._models:
+                load, _ = self.loaders[kind]
+                started = time.perf_counter()
+                self._models[key] = load(name)
+                self._stats[key] = {
+                    "load_seconds": round(time.perf_counter() - started, 3),
+                    "pid": os.getpid(),
+                    "warmed_up": False,
+                }
+            return self._models[key]
+
+    def loaded(self) -> List[Key]:
+        return list(self._models)
+
+    def preload(self, keys: Iterable[Key], freeze: bool = True) -> Dict[str, Any]:
+        """Load ``keys`` without running inference; meant for a pre-fork master.
+
+        ``freeze`` moves everything allocated so far into the permanent GC
+        generation so collections in the forked workers do not touch (and
+        thereby copy) the shared pages.
+        """
+        for kind, name in keys:
+            self.get(kind, name)
+        if freeze:
+            gc.freeze()
+        return self.stats()
+
+    def warm_up(self, keys: Optional[Iterable[Key]] = None) -> Dict[str, Any]:
+        """Run one small inference on ``keys`` (default: every loaded model).
+
+        A failed warm-up is recorded in the stats rather than raised, so one bad
+        model does not stop a worker from booting.
+        """
+        for key in list(keys) if keys is not None else self.loaded():
+            _, warm_up = self.loaders[key[0]]
+            model = self.get(*key)
+            started = time.perf_counter()
+            try:
+                if warm_up is not None:
+                    warm_up(model)
+            except Exception as e:
+                self._stats[key]["warm_up_error"] = str(e)
+                continue
+            self._stats[key].update(warmed_up=True, warm_up_seconds=round(time.perf_counter() - started, 3))
+        return self.stats()
+
+    def stats(self) -> Dict[str, Any]:
+        return {f"{kind}:{name}": dict(stats) for (kind, name), stats in self._stats.items()}
+
+
+_registry: Optional[ModelRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> ModelRegistry:
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ModelRegistry()
+        return _registry
+
+
+def preload_from_env(freeze: bool = True) -> Dict[str, Any]:
+    """Preload the models listed in ``PRELOAD_MODELS``."""
+    return get_registry().preload(parse_model_list(os.getenv("PRELOAD_MODELS")), freeze=freeze)
@@ -0,0 +1,315 @@
+"""Pluggable chat session stores.
+
+``InMemorySessionStore`` keeps a bounded LRU of sessions that expire after a
+period of inactivity. ``SQLiteSessionStore`` persists sessions in a WAL-mode
+SQLite database so they survive restarts and can be shared by several uvicorn
+workers on the same host. Messages are stored as compact tuples and history is
+read back a page at a time. Evaluations graded in the background are attached
+to their message once they complete.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+
+class StoredMessage(NamedTuple):
+    id: str
+    role: str
+    content: str
+    timestamp: float
+    context: Optional[str] = None
+    evaluation: Optional[Dict[str, Any]] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = self._asdict()
+        data["timestamp"] = datetime.fromtimestamp(self.timestamp).isoformat()
+        return data
+
+
+class SessionStore:
+    """Interface shared by the session backends."""
+
+    def get_or_create(self, session_id: Optional[str] = None) -> str:
+        raise NotImplementedError
+
+    def exists(self, session_id: str) -> bool:
+        raise NotImplementedError
+
+    def created_at(self, session_id: str) -> Optional[float]:
+        raise NotImplementedError
+
+    def append(self, session_id: str, role: str, content: str, context: Optional[str] = None) -> StoredMessage:
+        raise NotImplementedError
+
+    def set_evaluation(self, session_id: str, message_id: str, evaluation: Dict[str, Any]) -> bool:
+        """Attach an evaluation to a stored message; False if it no longer exists."""
+        raise NotImplementedError
+
+    def history(self, session_id: str, offset: int = 0, limit: int = 50) -> Tuple[List[StoredMessage], int]:
+        """Return one page of messages (oldest first) and the total message count."""
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+    @staticmethod
+    def _new_message(role: str, content: str, context: Optional[str]) -> StoredMessage:
+        return StoredMessage(str(uuid.uuid4()), role, content, time.time(), context)
+
+
+@dataclass
+class _SessionRecord:
+    created_at: float
+    last_active: float
+    messages: List[StoredMessage] = field(default_factory=list)
+
+
+class InMemorySessionStore(SessionStore):
+    def __init__(self, max_sessions: int = 10000, ttl_seconds: float = 24 * 3600, clock=time.time):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._sessions: "OrderedDict[str, _SessionRecord]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _live(self, session_id: str, now: float) -> Optional[_SessionRecord]:
+        record = self._sessions.get(session_id)
+        if record is None:
+            return None
+        if now - record.last_active > self.ttl_seconds:
+            del self._sessions[session_id]
+            return None
+        return record
+
+    def _evict(self, now: float) -> None:
+        # Oldest-first order means expired sessions sit at the front
+        while self._sessions:
+            session_id, record = next(iter(self._sessions.items()))
+            if len(self._sessions) <= self.max_sessions and now - record.last_active <= self.ttl_seconds:
+                break
+            del self._sessions[session_id]
+
+    def get_or_create(self, session_id: Optional[str] = None) -> str:
+        session_id = session_id or str(uuid.uuid4())
+        now = self._clock()
+        with self._lock:
+            record = self._live(session_id, now)
+            if record is None:
+                self._sessions[session_id] = _SessionRecord(created_at=now, last_active=now)
+            else:
+                record.last_active = now
+            self._sessions.move_to_end(session_id)
+            self._evict(now)
+        return session_id
+
+    def exists(self, session_id: str) -> bool:
+        with self._lock:
+            return self._live(session_id, self._clock()) is not None
+
+    def created_at(self, session_id: str) -> Optional[float]:
+        with self._lock:
+            record = self._live(session_id, self._clock())
+            return record.created_at if record else None
+
+    def append(self, session_id: str, role: str, content: str, context: Optional[str] = None) -> StoredMessage:
+        message = self._new_message(role, content, context)
+        now = self._clock()
+        with self._lock:
+            record = self._live(session_id, now)
+            if record is None:
+                record = self._sessions[session_id] = _SessionRecord(created_at=now, last_active=now)
+            record.messages.append(message)
+            record.last_active = now
+            self._sessions.move_to_end(session_id)
+            self._evict(now)
+        return message
+
+    def set_evaluation(self, session_id: str, message_id: str, evaluation: Dict[str, Any]) -> bool:
+        with self._lock:
+            record = self._sessions.get(session_id)
+            if record is None:
+                return False
+            # Evaluations arrive shortly after the reply, so search from the end
+            for i in range(len(record.messages) - 1, -1, -1):
+                if record.messages[i].id == message_id:
+                    record.messages[i] = record.messages[i]._replace(evaluation=evaluation)
+                    return True
+            return False
+
+    def history(self, session_id: str, offset: int = 0, limit: int = 50) -> Tuple[List[StoredMessage], int]:
+        with self._lock:
+            record = self._live(session_id, self._clock())
+            if record is None:
+                return [], 0
+            return record.messages[offset:offset + limit], len(record.messages)
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+
+class SQLiteSessionStore(SessionStore):
+    _SCHEMA = """
+    CREATE TABLE IF NOT EXISTS sessions (
+        id TEXT PRIMARY KEY,
+        created_at REAL NOT NULL,
+        last_active REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_sessions_last_active ON sessions(last_active);
+    CREATE TABLE IF NOT EXISTS messages (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id TEXT NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+        id TEXT NOT NULL,
+        role TEXT NOT NULL,
+        content TEXT NOT NULL,
+        timestamp REAL NOT NULL,
+        context TEXT,
+        evaluation TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_messages_session ON messages(session_id, seq);
+    """
+
+    def __init__(self, path: str, ttl_seconds: float = 7 * 24 * 3600, purge_every: int = 500, clock=time.time):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.purge_every = purge_every
+        self._clock = clock
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+        # WAL lets several worker processes read while one writes
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(self._SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(messages)")}
+        if "evaluation" not in columns:
+            # Databases created before evaluations were stored
+            self._conn.execute("ALTER TABLE messages ADD COLUMN evaluation TEXT")
+        self._conn.commit()
+
+    def _maybe_purge(self, now: float) -> None:
+        self._writes += 1
+        if self._writes % self.purge_every == 0:
+            self._conn.execute("DELETE FROM sessions WHERE last_active < ?", (now - self.ttl_seconds,))
+
+    def get_or_create(self, session_id: Optional[str] = None) -> str:
+        session_id = session_id or str(uuid.uuid4())
+        now = self._clock()
+        with self._lock, self._conn:
+            # Expired sessions that have not been purged yet start over
+            self._conn.execute(
+                "DELETE FROM sessions WHERE id = ? AND last_active < ?",
+                (session_id, now - self.ttl_seconds),
+            )
+            self._conn.execute(
+                "INSERT INTO sessions (id, created_at, last_active) VALUES (?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET last_active = excluded.last_active",
+                (session_id, now, now),
+            )
+            self._maybe_purge(now)
+        return session_id
+
+    def _row(self, session_id: str):
+        row = self._conn.execute(
+            "SELECT created_at, last_active FROM sessions WHERE id = ?", (session_id,)
+        ).fetchone()
+        if row is None or self._clock() - row[1] > self.ttl_seconds:
+            return None
+        return row
+
+    def exists(self, session_id: str) -> bool:
+        with self._lock:
+            return self._row(session_id) is not None
+
+    def created_at(self, session_id: str) -> Optional[float]:
+        with self._lock:
+            row = self._row(session_id)
+            return row[0] if row else None
+
+    def append(self, session_id: str, role: str, content: str, context: Optional[str] = None) -> StoredMessage:
+        message = self._new_message(role, content, context)
+        now = message.timestamp
+        with self._lock, self._conn:
+            # Expired sessions that have not been purged yet start over
+            self._conn.execute(
+                "DELETE FROM sessions WHERE id = ? AND last_active < ?",
+                (session_id, now - self.ttl_seconds),
+            )
+            self._conn.execute(
+                "INSERT INTO sessions (id, created_at, last_active) VALUES (?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET last_active = excluded.last_active",
+                (session_id, message.timestamp, message.timestamp),
+            )
+            self._conn.execute(
+                "INSERT INTO messages (session_id, id, role, content, timestamp, context) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (session_id, message.id, role, content, message.timestamp, context),
+            )
+            self._maybe_purge(message.timestamp)
+        return message
+
+    def set_evaluation(self, session_id: str, message_id: str, evaluation: Dict[str, Any]) -> bool:
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE messages SET evaluation = ? WHERE session_id = ? AND id = ?",
+                (json.dumps(evaluation, default=str), session_id, message_id),
+            )
+        return cursor.rowcount > 0
+
+    def history(self, session_id: str, offset: int = 0, limit: int = 50) -> Tuple[List[StoredMessage], int]:
+        with self._lock:
+            if self._row(session_id) is None:
+                return [], 0
+            total = self._conn.execute(
+                "SELECT COUNT(*) FROM messages WHERE session_id = ?", (session_id,)
+            ).fetchone()[0]
+            rows = self._conn.execute(
+                "SELECT id, role, content, timestamp, context, evaluation FROM messages "
+                "WHERE session_id = ? ORDER BY seq LIMIT ? OFFSET ?",
+                (session_id, limit, offset),
+            ).fetchall()
+        return [
+            StoredMessage(*row[:5], json.loads(row[5]) if row[5] else None) for row in rows
+        ], total
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM sessions WHERE last_active >= ?",
+                (self._clock() - self.ttl_seconds,),
+            ).fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def create_session_store(config: Optional[Dict[str, Any]] = None) -> SessionStore:
+    """Build the backend selected by ``session_store`` / ``SESSION_STORE`` (memory or sqlite)."""
+    config = config or {}
+    backend = (config.get("session_store") or os.getenv("SESSION_STORE", "memory")).lower()
+    if backend == "sqlite":
+        return SQLiteSessionStore(
+            config.get("session_db_path") or os.getenv("SESSION_DB_PATH", "data/sessions.db"),
+            ttl_seconds=float(config.get("session_ttl_seconds") or os.getenv("SESSION_TTL_SECONDS", 7 * 24 * 3600)),
+        )
+    if backend != "memory":
+        raise ValueError(f"Unknown session store backend: {backend}")
+    return InMemorySessionStore(
+        max_sessions=int(config.get("max_sessions") or os.getenv("SESSION_MAX_SESSIONS", 10000)),
+        ttl_seconds=float(config.get("session_ttl_seconds") or os.getenv("SESSION_TTL_SECONDS", 24 * 3600)),
+    )
@@ -0,0 +1,295 @@
+"""Overnight batch transcription of recorded consultations.
+
+Takes a directory of recordings, a JSONL manifest (``path`` plus optional
+``id`` per line) or a text file with one path per line. Worker processes
+decode each recording and cut it into utterances with the same VAD
+segmenter as live transcription. Segments from several recordings are then
+grouped into batches for one Whisper ``decode`` call per batch.
+
+    python -m src.voice.batch recordings/ --output transcripts/visits.jsonl --workers 4
+
+A recording's transcript is appended to the output JSONL as soon as all of
+its segments are done, and the output doubles as the checkpoint: a rerun
+skips every recording that already has a transcript there. Failed
+recordings are written with an ``error`` and retried on the next run (the
+last line per ``id`` wins). The report gives throughput in audio hours per
+CPU hour, counting the decode workers as well.
+"""
+import argparse
+import json
+import os
+import time
+import wave
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Set
+
+import numpy as np
+
+from .streaming import SAMPLE_RATE, Segmenter
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".m4a", ".flac", ".ogg", ".webm")
+
+
+def collect_inputs(source: str) -> List[Dict[str, str]]:
+    """``[{"id", "path"}, ...]`` from a directory, a JSONL manifest or a list of paths."""
+    if os.path.isdir(source):
+        items = []
+        for root, _, files in os.walk(source):
+            for name in files:
+                if name.lower().endswith(AUDIO_EXTENSIONS):
+                    path = os.path.join(root, name)
+                    items.append({"id": os.path.relpath(path, source), "path": path})
+        return sorted(items, key=lambda item: item["id"])
+
+    base = os.path.dirname(os.path.abspath(source))
+    items = []
+    with open(source, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            if source.endswith(".jsonl"):
+                row = json.loads(line)
+                if "path" not in row:
+                    raise ValueError(f"{source}:{line_number}: needs 'path'")
+            else:
+                row = {"path": line}
+            path = os.path.join(base, row["path"])  # absolute paths are kept as they are
+            items.append({"id": str(row.get("id", row["path"])), "path": path})
+    return items
+
+
+def load_audio(path: str) -> np.ndarray:
+    """Mono float32 samples at 16 kHz. PCM16 WAV is read directly, anything else through ffmpeg."""
+    if path.lower().endswith(".wav"):
+        with wave.open(path, "rb") as wav:
+            if wav.getsampwidth() == 2:
+                channels, rate = wav.getnchannels(), wav.getframerate()
+                samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype="<i2").astype(np.float32) / 32768.0
+                samples = samples.reshape(-1, channels).mean(axis=1)
+                if rate != SAMPLE_RATE:
+                    positions = np.arange(int(len(samples) * SAMPLE_RATE / rate)) * rate / SAMPLE_RATE
+                    samples = np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+                return samples
+    import whisper
+
+    return whisper.load_audio(path)
+
+
+def prepare_recording(path: str, segmenter_options: Dict[str, Any]) -> Dict[str, Any]:
+    """Decode and segment one recording; runs in a worker process."""
+    started = time.perf_counter()
+    samples = load_audio(path)
+    segmenter = Segmenter(**segmenter_options)
+    segments = segmenter.push(samples) + segmenter.flush()
+    return {
+        "duration": len(samples) / SAMPLE_RATE,
+        "segments": [(s.start, s.end, s.audio) for s in segments],
+        "decode_seconds": time.perf_counter() - started,
+    }
+
+
+class WhisperBatchTranscriber:
+    """Transcribes a list of segments (each at most 30 s) with one batched Whisper decode."""
+
+    def __init__(self, model, language: Optional[str] = None):
+        self.model = model
+        self.language = language
+
+    def __call__(self, segments: List[np.ndarray]) -> List[str]:
+        import torch
+        import whisper
+
+        n_mels = getattr(self.model.dims, "n_mels", 80)
+        options = {"n_mels": n_mels} if n_mels != 80 else {}
+        mels = torch.stack([
+            whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), **options) for audio in segments
+        ]).to(self.model.device)
+        results = whisper.decode(
+            self.model, mels, whisper.DecodingOptions(language=self.language, fp16=False, without_timestamps=True)
+        )
+        return [result.text.strip() for result in results]
+
+
+def completed_ids(output: str) -> Set[str]:
+    """Ids already transcribed in ``output``; drops a line left half-written by a crash."""
+    if not os.path.exists(output):
+        return set()
+    with open(output, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+            data = data[:data.rfind(b"\n") + 1]
+    done = set()
+    for line in data.decode("utf-8").splitlines():
+        if line.strip():
+            record = json.loads(line)
+            if "error" in record:
+                done.discard(record["id"])
+            else:
+                done.add(record["id"])
+    return done
+
+
+class _Recording:
+    def __init__(self, item: Dict[str, str], prepared: Dict[str, Any]):
+        self.item = item
+        self.duration = prepared["duration"]
+        self.decode_seconds = prepared["decode_seconds"]
+        self.segments = [
+            {"start": round(start, 3), "end": round(end, 3), "text": None} for start, end, _ in prepared["segments"]
+        ]
+        self.remaining = len(self.segments)
+        self.error: Optional[str] = None
+
+
+class BatchTranscriptionRunner:
+    def __init__(
+        self,
+        transcribe_batch: Callable[[List[np.ndarray]], List[str]],
+        output: str,
+        workers: Optional[int] = None,
+        batch_size: int = 16,
+        prefetch: Optional[int] = None,
+        **segmenter_options: Any,
+    ):
+        self.transcribe_batch = transcribe_batch
+        self.output = output
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        # Decoded recordings held in memory ahead of inference
+        self.prefetch = prefetch or 2 * self.workers
+        # Whisper sees at most 30 s at a time
+        self.segmenter_options = {"max_segment_s": 30.0, **segmenter_options}
+        self.stats = {"transcribed": 0, "failed": 0, "segments": 0, "batches": 0, "audio_seconds": 0.0}
+
+    def run(self, items: List[Dict[str, str]]) -> Dict[str, Any]:
+        done = completed_ids(self.output)
+        todo = [item for item in items if item["id"] not in done]
+        os.makedirs(os.path.dirname(os.path.abspath(self.output)), exist_ok=True)
+
+        wall_started, cpu_started, children_started = time.perf_counter(), time.process_time(), _children_cpu()
+        with open(self.output, "a", encoding="utf-8") as out:
+            self._out = out
+            with ProcessPoolExecutor(self.workers) as pool:
+                self._transcribe_all(pool, todo)
+        wall = time.perf_counter() - wall_started
+        # Worker CPU time is only counted once the pool's processes have been reaped
+        cpu = time.process_time() - cpu_started + _children_cpu() - children_started
+
+        audio_hours = self.stats["audio_seconds"] / 3600
+        return {
+            "recordings": len(items),
+            "skipped": len(items) - len(todo),
+            "transcribed": self.stats["transcribed"],
+            "failed": self.stats["failed"],
+            "segments": self.stats["segments"],
+            "batches": self.stats["batches"],
+            "workers": self.workers,
+            "batch_size": self.batch_size,
+            "audio_hours": round(audio_hours, 4),
+            "wall_seconds": round(wall, 3),
+            "cpu_seconds": round(cpu, 3),
+            "audio_hours_per_cpu_hour": round(audio_hours / (cpu / 3600), 2) if cpu else None,
+            "realtime_factor": round(self.stats["audio_seconds"] / wall, 2) if wall else None,
+        }
+
+    def _transcribe_all(self, pool: ProcessPoolExecutor, items: List[Dict[str, str]]) -> None:
+        queue = deque(items)
+        decoding = deque()
+        batch = []
+        while queue or decoding:
+            # Keep the workers decoding ahead while the model is busy
+            while queue and len(decoding) < self.prefetch:
+                item = queue.popleft()
+                decoding.append((item, pool.submit(prepare_recording, item["path"], self.segmenter_options)))
+            item, future = decoding.popleft()
+            try:
+                prepared = future.result()
+            except Exception as e:
+                self._write({"id": item["id"], "path": item["path"], "error": f"decode failed: {e}"})
+                self.stats["failed"] += 1
+                continue
+            recording = _Recording(item, prepared)
+            if not recording.segments:
+                self._finish(recording)
+            for index, (_, _, audio) in enumerate(prepared["segments"]):
+                batch.append((recording, index, audio))
+                if len(batch) >= self.batch_size:
+                    self._run_batch(batch)
+                    batch = []
+        if batch:
+            self._run_batch(batch)
+
+    def _run_batch(self, batch: List[Any]) -> None:
+        self.stats["batches"] += 1
+        self.stats["segments"] += len(batch)
+        try:
+            texts = self.transcribe_batch([audio for _, _, audio in batch])
+        except Exception as e:
+            texts = [None] * len(batch)
+            for recording, _, _ in batch:
+                recording.error = f"transcription failed: {e}"
+        for (recording, index, _), text in zip(batch, texts):
+            recording.segments[index]["text"] = text
+            recording.remaining -= 1
+            if recording.remaining == 0:
+                self._finish(recording)
+
+    def _finish(self, recording: _Recording) -> None:
+        record = {"id": recording.item["id"], "path": recording.item["path"], "duration_s": round(recording.duration, 3)}
+        if recording.error is not None:
+            record["error"] = recording.error
+            self.stats["failed"] += 1
+        else:
+            record["text"] = " ".join(s["text"] for s in recording.segments if s["text"])
+            record["segments"] = recording.segments
+            record["decode_seconds"] = round(recording.decode_seconds, 3)
+            self.stats["transcribed"] += 1
+            self.stats["audio_seconds"] += recording.duration
+        self._write(record)
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        self._out.write(json.dumps(record) + "\n")
+        # The output is the checkpoint, so a finished recording must survive a crash
+        self._out.flush()
+        os.fsync(self._out.fileno())
+
+
+def _children_cpu() -> float:
+    times = os.times()
+    return times.children_user + times.children_system
+
+
+def _main(args) -> Dict[str, Any]:
+    from ..serving.model_registry import get_registry
+
+    model = get_registry().get("whisper", args.model)
+    runner = BatchTranscriptionRunner(
+        WhisperBatchTranscriber(model, args.language),
+        args.output,
+        workers=args.workers,
+        batch_size=args.batch_size,
+    )
+    report = runner.run(collect_inputs(args.source)[:args.limit])
+    if args.report:
+        os.makedirs(os.path.dirname(os.path.abspath(args.report)), exist_ok=True)
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Transcribe a directory or manifest of recordings to JSONL")
+    parser.add_argument("source", help="directory, JSONL manifest or text file of paths")
+    parser.add_argument("--output", default="data/transcripts.jsonl")
+    parser.add_argument("--report", default=None, help="optional JSON report path")
+    parser.add_argument("--model", default=os.getenv("WHISPER_MODEL", "base"))
+    parser.add_argument("--language", default=None, help="skip language detection, e.g. 'en'")
+    parser.add_argument("--workers", type=int, default=None, help="decode processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--limit", type=int, default=None)
+    args = parser.parse_args()
+
+    print(json.dumps(_main(args), indent=2))
@@ -0,0 +1,108 @@
+"""Voice round trip: speech in, the pipeline's answer spoken back, one turn per utterance.
+
+Incoming audio is transcribed incrementally; when an utterance ends (the
+segmenter sees ``min_silence_ms`` of silence) its text goes to the answer
+stream, whose deltas feed the streaming synthesizer directly, so the first
+sentence is spoken while the rest of the answer is still being generated.
+
+Every turn ends with a ``turn_end`` event breaking the latency down by stage.
+``mouth_to_ear_ms`` is the time from the end of speech to the first audio
+sent back: the silence needed to detect the end of the utterance plus
+transcription, generation up to the first sentence and its synthesis.
+"""
+import os
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+from ..monitoring.monitor import get_monitor
+from ..monitoring.tracing import iterate_in_span
+from .streaming import AudioInput
+
+LATENCY_TARGET_MS = 1500.0
+
+
+def _ms_since(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
+
+
+class VoiceConversation:
+    def __init__(
+        self,
+        voice,
+        answer: Callable[[str], AsyncIterator[Dict[str, Any]]],
+        voice_name: str = "default",
+        min_silence_ms: Optional[int] = None,
+        latency_target_ms: Optional[float] = None,
+    ):
+        """``voice`` is a ``VoiceProcessor``; ``answer`` streams ``delta``/``done``/``error``
+        events for a query, like ``CodexAIPipeline.stream_query``."""
+        self.voice = voice
+        self.answer = answer
+        self.voice_name = voice_name
+        # Shorter than the transcription default: every millisecond here is heard as lag
+        self.min_silence_ms = min_silence_ms or int(os.getenv("VOICE_END_OF_UTTERANCE_MS", "400"))
+        self.latency_target_ms = latency_target_ms or float(os.getenv("VOICE_LATENCY_TARGET_MS", LATENCY_TARGET_MS))
+        self.monitor = get_monitor()
+
+    async def run(self, audio: AudioInput) -> AsyncIterator[Dict[str, Any]]:
+        """Yield ``transcript``, ``audio`` and ``turn_end`` events per utterance, then ``end``.
+
+        Audio keeps being read and transcribed while a turn is answered; the
+        next utterance is answered once the current turn has been spoken.
+        """
+        turns = 0
+        transcripts = self.voice.stream_speech_to_text(audio, min_silence_ms=self.min_silence_ms)
+        async for event in transcripts:
+            if event["type"] != "partial" or not event["text"]:
+                continue
+            # When the segmenter closed the utterance, i.e. end of speech plus the silence timeout
+            closed_at = time.perf_counter() - event["latency_ms"] / 1000
+            async for turn_event in self._turn(turns, event, closed_at):
+                yield turn_event
+            turns += 1
+        yield {"type": "end", "turns": turns}
+
+    async def _turn(self, turn: int, transcript: Dict[str, Any], closed_at: float) -> AsyncIterator[Dict[str, Any]]:
+        latency: Dict[str, Any] = {"end_of_utterance_ms": self.min_silence_ms, "stt_ms": transcript["latency_ms"]}
+        yield {
+            "type": "transcript",
+            "turn": turn,
+            "text": transcript["text"],
+            "start": transcript["start"],
+            "end": transcript["end"],
+        }
+
+        answer: Dict[str, Any] = {}
+        llm_started = time.perf_counter()
+
+        async def deltas() -> AsyncIterator[str]:
+            async for event in self.answer(transcript["text"]):
+                if event["type"] == "delta":
+                    latency.setdefault("llm_first_token_ms", _ms_since(llm_started))
+                    yield event["text"]
+                elif event["type"] == "done":
+                    answer["response"] = event["response"]
+                elif event["type"] == "error":
+                    answer["error"] = event["error"]
+
+        with self.monitor.request("voice_turn", current=False) as span:
+            speech = self.voice.stream_text_to_speech(deltas(), voice=self.voice_name)
+            async for event in iterate_in_span(span, speech):
+                if event["type"] != "audio":
+                    continue
+                if "first_audio_ms" not in latency:
+                    latency["tts_first_sentence_ms"] = event["latency_ms"]
+                    latency["first_audio_ms"] = _ms_since(closed_at)
+                yield {**event, "turn": turn}
+        latency["total_ms"] = _ms_since(closed_at)
+
+        if "first_audio_ms" in latency:
+            latency["mouth_to_ear_ms"] = round(self.min_silence_ms + latency["first_audio_ms"], 1)
+            latency["within_target"] = latency["mouth_to_ear_ms"] <= self.latency_target_ms
+        yield {
+            "type": "turn_end",
+            "turn": turn,
+            "response": answer.get("response"),
+            "error": answer.get("error"),
+            "latency": latency,
+        }
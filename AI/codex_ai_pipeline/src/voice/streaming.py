@@ -0,0 +1,256 @@
+"""Streaming speech-to-text: segment audio on silence, transcribe segments as they close.
+
+Audio arrives as 16 kHz mono PCM16 bytes (any chunk size, split anywhere),
+as float32 arrays, or as an async/sync iterator of either. A ``Segmenter``
+cuts utterances out of the stream with a voice-activity detector: a segment
+closes after ``min_silence_ms`` of silence, or at ``max_segment_s`` so a
+long monologue still produces text. Each closed segment is transcribed on a
+worker pool while more audio is read, and ``partial`` events are yielded in
+segment order as soon as they are ready, followed by one ``final`` event.
+"""
+import asyncio
+import contextvars
+import functools
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Deque, Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+AudioChunk = Union[bytes, bytearray, memoryview, np.ndarray]
+AudioInput = Union[AudioChunk, Iterable[AudioChunk], AsyncIterable[AudioChunk]]
+
+
+class PCM16Decoder:
+    """Turns PCM16 byte chunks into float32 samples, carrying a split sample over."""
+
+    def __init__(self):
+        self._remainder = b""
+
+    def decode(self, chunk: AudioChunk) -> np.ndarray:
+        if isinstance(chunk, np.ndarray):
+            return chunk.astype(np.float32, copy=False).reshape(-1)
+        data = self._remainder + bytes(chunk)
+        usable = len(data) - len(data) % 2
+        self._remainder = data[usable:]
+        return np.frombuffer(data[:usable], dtype="<i2").astype(np.float32) / 32768.0
+
+
+class EnergyVAD:
+    """RMS energy voice-activity detector with an adaptive noise floor.
+
+    A frame is speech when its RMS exceeds both ``threshold`` and
+    ``noise_ratio`` times the running noise floor, which tracks non-speech
+    frames, so steady background noise (monitors, ventilation) is ignored.
+    """
+
+    def __init__(self, threshold: float = 0.01, noise_ratio: float = 3.0, alpha: float = 0.05):
+        self.threshold = threshold
+        self.noise_ratio = noise_ratio
+        self.alpha = alpha
+        self.noise_floor = 0.0
+
+    def is_speech(self, frame: np.ndarray) -> bool:
+        rms = float(np.sqrt(np.mean(np.square(frame)))) if len(frame) else 0.0
+        speech = rms > max(self.threshold, self.noise_floor * self.noise_ratio)
+        if not speech:
+            self.noise_floor += self.alpha * (rms - self.noise_floor)
+        return speech
+
+
+@dataclass
+class Segment:
+    index: int
+    start: float  # seconds from the start of the stream
+    end: float
+    audio: np.ndarray
+
+
+class Segmenter:
+    def __init__(
+        self,
+        vad: Optional[Any] = None,
+        sample_rate: int = SAMPLE_RATE,
+        frame_ms: int = 30,
+        min_speech_ms: int = 90,
+        min_silence_ms: int = 500,
+        max_segment_s: float = 30.0,
+        padding_ms: int = 200,
+    ):
+        self.vad = vad or EnergyVAD()
+        self.sample_rate = sample_rate
+        self.frame_size = sample_rate * frame_ms // 1000
+        self.min_speech_frames = max(1, min_speech_ms // frame_ms)
+        self.min_silence_frames = max(1, min_silence_ms // frame_ms)
+        self.max_segment_frames = int(max_segment_s * 1000 // frame_ms)
+        self._pre_roll: Deque[np.ndarray] = deque(maxlen=max(1, padding_ms // frame_ms))
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._frames: List[np.ndarray] = []
+        self._speech_frames = 0
+        self._silence_run = 0
+        self._position = 0  # samples consumed so far
+        self._segment_start = 0
+        self._next_index = 0
+
+    @property
+    def segments(self) -> int:
+        """Segments closed so far."""
+        return self._next_index
+
+    def push(self, samples: np.ndarray) -> List[Segment]:
+        """Feed samples; returns the segments that closed."""
+        self._pending = np.concatenate([self._pending, samples])
+        closed = []
+        while len(self._pending) >= self.frame_size:
+            frame, self._pending = self._pending[:self.frame_size], self._pending[self.frame_size:]
+            segment = self._feed_frame(frame)
+            if segment is not None:
+                closed.append(segment)
+        return closed
+
+    def flush(self) -> List[Segment]:
+        """Close whatever is buffered at the end of the stream."""
+        if len(self._pending):
+            # A trailing partial frame only matters inside an open segment
+            if self._frames:
+                self._frames.append(self._pending)
+            self._position += len(self._pending)
+            self._pending = np.zeros(0, dtype=np.float32)
+        segment = self._close()
+        return [segment] if segment is not None else []
+
+    def _feed_frame(self, frame: np.ndarray) -> Optional[Segment]:
+        speech = self.vad.is_speech(frame)
+        self._position += len(frame)
+        if not self._frames:
+            if not speech:
+                self._pre_roll.append(frame)
+                return None
+            # Keep a little audio before the onset so the first phoneme is not clipped
+            self._frames = list(self._pre_roll)
+            self._pre_roll.clear()
+            self._segment_start = self._position - len(frame) - sum(len(f) for f in self._frames)
+        self._frames.append(frame)
+        if speech:
+            self._speech_frames += 1
+            self._silence_run = 0
+        else:
+            self._silence_run += 1
+        if self._silence_run >= self.min_silence_frames or len(self._frames) >= self.max_segment_frames:
+            return self._close()
+        return None
+
+    def _close(self) -> Optional[Segment]:
+        frames, speech_frames = self._frames, self._speech_frames
+        self._frames, self._speech_frames, self._silence_run = [], 0, 0
+        if speech_frames < self.min_speech_frames:
+            return None  # a click or a cough, not an utterance
+        segment = Segment(
+            index=self._next_index,
+            start=self._segment_start / self.sample_rate,
+            end=self._position / self.sample_rate,
+            audio=np.concatenate(frames),
+        )
+        self._next_index += 1
+        return segment
+
+
+async def _iterate(audio: AudioInput) -> AsyncIterator[AudioChunk]:
+    if isinstance(audio, (bytes, bytearray, memoryview, np.ndarray)):
+        yield audio
+    elif hasattr(audio, "__aiter__"):
+        async for chunk in audio:
+            yield chunk
+    else:
+        for chunk in audio:
+            yield chunk
+
+
+async def pipelined(
+    items: AsyncIterable[Any],
+    work: Callable[[Any], Any],
+    executor=None,
+    max_pending: int = 4,
+) -> AsyncIterator[Tuple[Any, Any, float]]:
+    """Run blocking ``work`` on each item on ``executor`` while later items are
+    still being produced; yield ``(item, result, submitted_at)`` in input order.
+
+    At most ``max_pending`` items wait or run at once; past that, reading
+    ``items`` waits, which pushes back on the source.
+    """
+    loop = asyncio.get_running_loop()
+    pending: asyncio.Queue = asyncio.Queue(max_pending)
+    failure: List[BaseException] = []
+
+    async def read() -> None:
+        try:
+            async for item in items:
+                # The copied context keeps spans opened by ``work`` in the caller's trace
+                call = functools.partial(contextvars.copy_context().run, work, item)
+                await pending.put((item, loop.run_in_executor(executor, call), time.perf_counter()))
+        except Exception as e:
+            failure.append(e)
+        await pending.put(None)
+
+    reader = asyncio.ensure_future(read())
+    try:
+        while True:
+            entry = await pending.get()
+            if entry is None:
+                break
+            item, future, submitted_at = entry
+            yield item, await future, submitted_at
+        if failure:
+            raise failure[0]
+    finally:
+        reader.cancel()
+        while not pending.empty():
+            entry = pending.get_nowait()
+            if entry is not None:
+                entry[1].cancel()
+
+
+class StreamingTranscriber:
+    def __init__(
+        self,
+        transcribe: Callable[[np.ndarray], str],
+        executor=None,
+        max_pending: int = 4,
+        **segmenter_options: Any,
+    ):
+        self._transcribe = transcribe
+        self.executor = executor
+        self.max_pending = max_pending
+        self.segmenter_options = segmenter_options
+
+    async def stream(self, audio: AudioInput) -> AsyncIterator[Dict[str, Any]]:
+        """Yield ``partial`` events per transcribed segment, in order, then ``final``."""
+        segmenter = Segmenter(**self.segmenter_options)
+        decoder = PCM16Decoder()
+
+        async def segments() -> AsyncIterator[Segment]:
+            async for chunk in _iterate(audio):
+                for segment in segmenter.push(decoder.decode(chunk)):
+                    yield segment
+            for segment in segmenter.flush():
+                yield segment
+
+        texts = []
+        async for segment, text, closed_at in pipelined(
+            segments(), lambda segment: self._transcribe(segment.audio), self.executor, self.max_pending
+        ):
+            text = text.strip()
+            if text:
+                texts.append(text)
+            yield {
+                "type": "partial",
+                "segment": segment.index,
+                "start": round(segment.start, 3),
+                "end": round(segment.end, 3),
+                "text": text,
+                "latency_ms": round((time.perf_counter() - closed_at) * 1000, 1),
+            }
+        yield {"type": "final", "text": " ".join(texts), "segments": segmenter.segments}
@@ -0,0 +1,289 @@
+"""Streaming text-to-speech: synthesize sentence by sentence, cache the clips on disk.
+
+``StreamingSynthesizer.stream`` takes a whole text or the deltas of an LLM
+response, cuts them into sentences as they complete, and synthesizes each
+sentence on a worker pool while the next ones are still arriving, so the
+first sentence can play while the rest is generated. Clips are cached on
+disk by (engine, voice, text); standard instructions (discharge notes,
+medication reminders) are synthesized once and then served from the cache.
+
+The engine is pluggable (``TTS_ENGINE``): ``elevenlabs`` calls the ElevenLabs
+API, ``waveform`` is an offline engine that renders a deterministic WAV per
+text, for tests and for running without network access.
+"""
+import hashlib
+import io
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import wave
+import zlib
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+from ..monitoring.monitor import get_monitor
+from .streaming import pipelined
+
+TextInput = Union[str, Iterable[str], AsyncIterable[str]]
+
+# A terminator followed by whitespace, or a line break (list items rarely end in a period)
+_BOUNDARY = re.compile(r"([.!?]+[\"')\]]*)\s+|\n+")
+# Words whose trailing period does not end a sentence
+ABBREVIATIONS = {"dr", "mr", "mrs", "ms", "st", "vs", "e.g", "i.e", "etc", "approx", "fig"}
+
+
+class SentenceBuffer:
+    """Accumulates text deltas and releases complete sentences.
+
+    A sentence is complete once its terminator is followed by whitespace, so
+    "2.5 mg" or "e.g. rest" arriving in pieces is never cut in the middle.
+    """
+
+    def __init__(self):
+        self._text = ""
+
+    def feed(self, delta: str) -> List[str]:
+        self._text += delta
+        sentences, start = [], 0
+        for match in _BOUNDARY.finditer(self._text):
+            end = match.end(1) if match.group(1) else match.start()
+            if match.group(1):
+                ends = _ends_sentence(self._text[start:match.start(1)], self._text[match.end():])
+                if ends is None:
+                    break  # decided by the next word, which has not arrived yet
+                if not ends:
+                    continue
+            sentence = self._text[start:end].strip()
+            if sentence:
+                sentences.append(sentence)
+            start = match.end()
+        self._text = self._text[start:]
+        return sentences
+
+    def flush(self) -> List[str]:
+        sentence, self._text = self._text.strip(), ""
+        return [sentence] if sentence else []
+
+
+def _ends_sentence(text: str, following: str) -> Optional[bool]:
+    """Whether the period after ``text`` ends a sentence; None when that depends on
+    the next word and ``following`` does not have it yet."""
+    words = text.split()
+    if not words:
+        return True
+    word = words[-1].lstrip("(\"'").lower()
+    # Initials ("J. Smith") and the known abbreviations
+    if word in ABBREVIATIONS or (len(word) == 1 and word.isalpha()):
+        return False
+    if word.isdigit():
+        # List numbering ("1. Rest") opens a sentence
+        if len(words) == 1:
+            return False
+        # "dose is 10. Repeat" ends one; a number followed by a digit or a lowercase word does not
+        following = following.lstrip()
+        if not following:
+            return None
+        return not (following[0].isdigit() or following[0].islower())
+    return True
+
+
+def split_sentences(text: str) -> List[str]:
+    buffer = SentenceBuffer()
+    return buffer.feed(text) + buffer.flush()
+
+
+class ElevenLabsEngine:
+    name = "elevenlabs"
+    format = "mp3"
+
+    def synthesize(self, text: str, voice: str) -> bytes:
+        from elevenlabs import generate
+
+        return generate(text=text, voice=voice)
+
+
+class WaveformEngine:
+    """Offline engine: a short tone per word, pitched by the word, as 16-bit WAV.
+
+    Not speech, but deterministic and proportional to the text, which is what
+    tests and offline runs need.
+    """
+
+    name = "waveform"
+    format = "wav"
+
+    def __init__(self, sample_rate: int = 16000, word_seconds: float = 0.25, delay: float = 0.0):
+        self.sample_rate = sample_rate
+        self.word_seconds = word_seconds
+        self.delay = delay  # simulated synthesis time per call
+
+    def synthesize(self, text: str, voice: str) -> bytes:
+        if self.delay:
+            time.sleep(self.delay)
+        t = np.arange(int(self.word_seconds * self.sample_rate)) / self.sample_rate
+        gap = np.zeros(int(0.05 * self.sample_rate))
+        parts = []
+        for word in text.split():
+            pitch = 150 + zlib.crc32(f"{voice}:{word}".encode()) % 300
+            parts += [0.3 * np.sin(2 * np.pi * pitch * t), gap]
+        samples = np.concatenate(parts) if parts else gap
+        output = io.BytesIO()
+        with wave.open(output, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(self.sample_rate)
+            wav.writeframes((samples * 32767).astype("<i2").tobytes())
+        return output.getvalue()
+
+
+ENGINES = {"elevenlabs": ElevenLabsEngine, "waveform": WaveformEngine}
+
+
+def get_tts_engine(name: Optional[str] = None):
+    name = name or os.getenv("TTS_ENGINE", "elevenlabs")
+    if name not in ENGINES:
+        raise ValueError(f"Unknown TTS engine '{name}'; expected one of {sorted(ENGINES)}")
+    return ENGINES[name]()
+
+
+class AudioCache:
+    """Synthesized clips on disk, evicting the least recently used past ``max_bytes``.
+
+    Files are written atomically and reads refresh their mtime, so several
+    worker processes can share one directory.
+    """
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.directory = directory or os.getenv("TTS_CACHE_DIR", os.path.join("data", "tts_cache"))
+        if max_bytes is None:
+            max_bytes = int(float(os.getenv("TTS_CACHE_MAX_MB", "512")) * 1024 * 1024)
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._size = sum(size for _, _, size in self._entries())
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(engine: str, voice: str, text: str) -> str:
+        return hashlib.sha256(json.dumps([engine, voice, " ".join(text.split())]).encode()).hexdigest()
+
+    def _path(self, key: str, audio_format: str) -> str:
+        return os.path.join(self.directory, f"{key}.{audio_format}")
+
+    def get(self, key: str, audio_format: str) -> Optional[bytes]:
+        path = self._path(key, audio_format)
+        try:
+            with open(path, "rb") as f:
+                audio = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return audio
+
+    def put(self, key: str, audio_format: str, audio: bytes) -> None:
+        if len(audio) > self.max_bytes:
+            return
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(audio)
+        os.replace(tmp, self._path(key, audio_format))
+        with self._lock:
+            self._size += len(audio)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _entries(self) -> List[Tuple[float, str, int]]:
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".tmp"):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, entry.path, stat.st_size))
+        return entries
+
+    def _evict(self) -> None:
+        # Re-read the directory: other processes may have added or evicted files
+        entries = sorted(self._entries())
+        self._size = sum(size for _, _, size in entries)
+        for _, path, size in entries:
+            if self._size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._size -= size
+
+    def stats(self) -> Dict[str, Any]:
+        return {"bytes": self._size, "max_bytes": self.max_bytes, "hits": self.hits, "misses": self.misses}
+
+
+async def _iterate_text(text: TextInput) -> AsyncIterator[str]:
+    if isinstance(text, str):
+        yield text
+    elif hasattr(text, "__aiter__"):
+        async for delta in text:
+            yield delta
+    else:
+        for delta in text:
+            yield delta
+
+
+class StreamingSynthesizer:
+    def __init__(self, engine, cache: Optional[AudioCache] = None, executor=None, lookahead: int = 2):
+        self.engine = engine
+        self.cache = cache
+        self.executor = executor
+        # Sentences synthesized ahead of the one being sent
+        self.lookahead = lookahead
+        self.monitor = get_monitor()
+
+    def synthesize(self, text: str, voice: str = "default") -> Tuple[bytes, bool]:
+        """Audio for ``text`` (blocking) and whether it came from the cache."""
+        key = AudioCache.key(self.engine.name, voice, text)
+        if self.cache is not None:
+            audio = self.cache.get(key, self.engine.format)
+            if audio is not None:
+                return audio, True
+        with self.monitor.stage("tts"):
+            audio = self.engine.synthesize(text, voice)
+        if self.cache is not None:
+            self.cache.put(key, self.engine.format, audio)
+        return audio, False
+
+    async def stream(self, text: TextInput, voice: str = "default") -> AsyncIterator[Dict[str, Any]]:
+        """Yield an ``audio`` event per sentence, in order, then ``end``."""
+        async def sentences() -> AsyncIterator[str]:
+            buffer = SentenceBuffer()
+            async for delta in _iterate_text(text):
+                for sentence in buffer.feed(delta):
+                    yield sentence
+            for sentence in buffer.flush():
+                yield sentence
+
+        count = cached_count = 0
+        async for sentence, (audio, cached), submitted_at in pipelined(
+            sentences(), lambda sentence: self.synthesize(sentence, voice), self.executor, self.lookahead
+        ):
+            yield {
+                "type": "audio",
+                "sentence": count,
+                "text": sentence,
+                "format": self.engine.format,
+                "audio": audio,
+                "cached": cached,
+                "latency_ms": round((time.perf_counter() - submitted_at) * 1000, 1),
+            }
+            count += 1
+            cached_count += cached
+        yield {"type": "end", "sentences": count, "cached": cached_count}
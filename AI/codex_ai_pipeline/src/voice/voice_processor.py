@@ -1,14 +1,85 @@
-import whisper
-from elevenlabs import generate, play
+import os
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, Optional
+
+from ..monitoring.monitor import get_monitor
+from ..serving.model_registry import get_registry
+from .streaming import AudioInput, StreamingTranscriber
+from .tts import AudioCache, StreamingSynthesizer, TextInput, get_tts_engine
+
+# Whisper's decoder keeps its KV cache in hooks on the model, so two transcriptions running
+# on one model instance at once corrupt each other. One lock per model, shared by every
+# VoiceProcessor that got the same instance from the registry, and dropped with the model.
+_model_locks: "weakref.WeakKeyDictionary[Any, threading.Lock]" = weakref.WeakKeyDictionary()
+_model_locks_guard = threading.Lock()
+
+
+def _model_lock(model) -> threading.Lock:
+    with _model_locks_guard:
+        lock = _model_locks.get(model)
+        if lock is None:
+            lock = _model_locks[model] = threading.Lock()
+        return lock
 
 class VoiceProcessor:
-    def __init__(self):
-        self.whisper_model = whisper.load_model("base")
+    def __init__(
+        self,
+        model_name: Optional[str] = None,
+        whisper_model=None,
+        stt_workers: Optional[int] = None,
+        tts_engine=None,
+        tts_cache: Optional[AudioCache] = None,
+        tts_workers: Optional[int] = None,
+    ):
+        # Shared through the model registry (and across pre-forked workers)
+        self.whisper_model = whisper_model or get_registry().get(
+            "whisper", model_name or os.getenv("WHISPER_MODEL", "base")
+        )
+        self._transcribe_lock = _model_lock(self.whisper_model)
+        self.monitor = get_monitor()
+        # Streaming transcription runs segments here, off the event loop. Calls on the model
+        # are serialized, so more than one worker only pays off with a separate model instance.
+        self.stt_executor = ThreadPoolExecutor(
+            max_workers=stt_workers or int(os.getenv("STT_WORKERS", "1")), thread_name_prefix="stt"
+        )
+        self.tts_executor = ThreadPoolExecutor(
+            max_workers=tts_workers or int(os.getenv("TTS_WORKERS", "2")), thread_name_prefix="tts"
+        )
+        self.synthesizer = StreamingSynthesizer(
+            tts_engine or get_tts_engine(), tts_cache if tts_cache is not None else AudioCache(), self.tts_executor
+        )
     
     def speech_to_text(self, audio_file: str) -> str:
-        result = self.whisper_model.transcribe(audio_file)
+        with self._transcribe_lock, self.monitor.stage("stt"):
+            result = self.whisper_model.transcribe(audio_file)
         return result["text"]
+
+    def transcribe_segment(self, audio) -> str:
+        """Transcribe one 16 kHz float32 segment (blocking)."""
+        with self._transcribe_lock, self.monitor.stage("stt"):
+            result = self.whisper_model.transcribe(audio, fp16=False)
+        return result["text"].strip()
+
+    def stream_speech_to_text(self, audio: AudioInput, **options: Any) -> AsyncIterator[Dict[str, Any]]:
+        """Live transcription of 16 kHz mono PCM16 audio (bytes or an iterator of chunks).
+
+        Yields a ``partial`` event per utterance as soon as it is transcribed and a
+        ``final`` event with the full text; ``options`` go to ``StreamingTranscriber``
+        and the segmenter (e.g. ``min_silence_ms``, ``max_segment_s``).
+        """
+        return StreamingTranscriber(self.transcribe_segment, self.stt_executor, **options).stream(audio)
     
-    def text_to_speech(self, text: str, voice: str = "default"):
-        audio = generate(text=text, voice=voice)
+    def text_to_speech(self, text: str, voice: str = "default") -> bytes:
+        """Audio for the whole of ``text`` (blocking), from the cache when it was synthesized before."""
+        audio, _ = self.synthesizer.synthesize(text, voice)
         return audio
+
+    def stream_text_to_speech(self, text: TextInput, voice: str = "default") -> AsyncIterator[Dict[str, Any]]:
+        """Speak ``text`` (a string or the deltas of a streamed response) sentence by sentence.
+
+        Yields an ``audio`` event per sentence as soon as it and every earlier
+        sentence are ready, while later sentences are synthesized, then ``end``.
+        """
+        return self.synthesizer.stream(text, voice)
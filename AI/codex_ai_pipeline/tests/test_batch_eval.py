@@ -0,0 +1,92 @@
+import asyncio
+import json
+import os
+import sys
+
+# Add project root to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.evaluation.batch_eval import BatchEvaluator, GraderCache, LexicalGrader, load_dataset, percentile
+
+
+class CountingGrader(LexicalGrader):
+    def __init__(self):
+        self.calls = 0
+
+    def evaluate_response(self, question, answer, reference):
+        self.calls += 1
+        return super().evaluate_response(question, answer, reference)
+
+
+def test_lexical_grader_and_percentile():
+    grader = LexicalGrader()
+    assert grader.evaluate_response("q", "High blood pressure", "high blood pressure")["score"] == 1.0
+    assert grader.evaluate_response("q", "low sugar", "high blood pressure")["score"] == 0.0
+    assert percentile([5, 1, 3, 2, 4], 50) == 3
+    assert percentile([], 95) is None
+
+
+def test_batch_run_is_offline_and_reuses_cached_grades(tmp_path):
+    from src.pipeline.main_pipeline import CodexAIPipeline
+
+    dataset = tmp_path / "qa.jsonl"
+    dataset.write_text("\n".join(json.dumps(row) for row in [
+        {"id": "a", "question": "What is AI?", "reference": "Mock AI response for: What is AI?"},
+        {"query": "Define BP", "answer": "blood pressure"},
+    ]))
+    items = load_dataset(str(dataset))
+    assert [item["id"] for item in items] == ["a", "2"]
+
+    pipeline = CodexAIPipeline({
+        "model_name": "gpt-3.5-turbo", "temperature": 0.0, "max_tokens": 100,
+        "use_mock_llm": True, "evaluation_sample_rate": 0.0,
+    })
+    grader = CountingGrader()
+    cache = GraderCache(str(tmp_path / "grades.db"))
+    evaluator = BatchEvaluator(pipeline, grader, cache, concurrency=2)
+
+    first = asyncio.run(evaluator.run(items))
+    second = asyncio.run(evaluator.run(items))
+    pipeline.close()
+
+    assert grader.calls == 2
+    assert [r["grade"]["cached"] for r in second] == [True, True]
+    assert first[0]["grade"]["score"] == 1.0
+
+    report = evaluator.summarize(first + second, seconds=1.0)
+    assert report["items"] == 4 and report["failed"] == 0
+    assert report["grader_cache"] == {"hits": 2, "misses": 2}
+    assert report["pipeline_latency"]["p95"] is not None
+
+
+def test_pipeline_errors_are_recorded_not_graded():
+    class FailingPipeline:
+        async def process_query(self, query, context=None, use_cache=True, evaluate=True):
+            # How CodexAIPipeline reports a failure: as data, not an exception
+            return {
+                "query": query,
+                "response": "Error processing query: agents unavailable",
+                "evaluation": {"score": 0, "error": "agents unavailable"},
+                "context": context,
+            }
+
+    grader = CountingGrader()
+    evaluator = BatchEvaluator(FailingPipeline(), grader)
+    records = asyncio.run(evaluator.run([{"id": "1", "question": "q", "reference": "r", "context": None}]))
+
+    assert records[0]["error"] == "agents unavailable"
+    assert "grade" not in records[0] and "prediction" not in records[0]
+    assert grader.calls == 0
+    assert evaluator.summarize(records, seconds=1.0)["failed"] == 1
+
+
+def test_offline_pipeline_uses_mock_components():
+    from src.evaluation.batch_eval import _pipeline_config
+    from src.pipeline.main_pipeline import CodexAIPipeline, MockMultiAgentSystem, MockVectorSearch
+
+    pipeline = CodexAIPipeline(_pipeline_config(online=False))
+    try:
+        assert isinstance(pipeline.vector_search, MockVectorSearch)
+        assert isinstance(pipeline.agent_system, MockMultiAgentSystem)
+    finally:
+        pipeline.close()
@@ -0,0 +1,107 @@
+import json
+import os
+import sys
+import wave
+
+import numpy as np
+import pytest
+
+# Add project root to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.voice.batch import BatchTranscriptionRunner, collect_inputs, completed_ids, load_audio
+from src.voice.streaming import SAMPLE_RATE
+
+
+def tone(seconds, amplitude=0.3):
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    return (amplitude * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+
+def silence(seconds):
+    return np.zeros(int(seconds * SAMPLE_RATE), dtype=np.float32)
+
+
+def write_wav(path, samples, rate=SAMPLE_RATE, channels=1):
+    data = np.repeat(samples, channels) if channels > 1 else samples
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes((data * 32767).astype("<i2").tobytes())
+
+
+class FakeBatchModel:
+    def __init__(self, fail_on_call=None):
+        self.batches = []
+        self.fail_on_call = fail_on_call
+
+    def __call__(self, segments):
+        self.batches.append(len(segments))
+        if len(self.batches) == self.fail_on_call:
+            raise RuntimeError("out of memory")
+        return [f"{len(audio) / SAMPLE_RATE:.1f}s" for audio in segments]
+
+
+@pytest.fixture
+def recordings(tmp_path):
+    folder = tmp_path / "visits"
+    (folder / "ward").mkdir(parents=True)
+    # One utterance, two utterances, and silence only
+    write_wav(folder / "a.wav", np.concatenate([silence(0.3), tone(1.0), silence(0.8)]))
+    write_wav(folder / "ward" / "b.wav", np.concatenate([tone(0.5), silence(0.8), tone(0.5), silence(0.8)]))
+    write_wav(folder / "c.wav", silence(1.0))
+    (folder / "notes.txt").write_text("not audio")
+    return folder
+
+
+def test_collect_inputs_from_directory_and_manifest(recordings, tmp_path):
+    assert [item["id"] for item in collect_inputs(str(recordings))] == ["a.wav", "c.wav", os.path.join("ward", "b.wav")]
+
+    manifest = tmp_path / "manifest.jsonl"
+    manifest.write_text(json.dumps({"id": "visit-1", "path": "visits/a.wav"}) + "\n")
+    assert collect_inputs(str(manifest)) == [{"id": "visit-1", "path": str(recordings / "a.wav")}]
+
+
+def test_load_audio_downmixes_and_resamples(tmp_path):
+    path = tmp_path / "stereo.wav"
+    write_wav(path, tone(0.5), rate=8000, channels=2)  # 8000 samples at 8 kHz: one second
+    samples = load_audio(str(path))
+    assert len(samples) == SAMPLE_RATE
+    assert np.abs(samples).max() == pytest.approx(0.3, abs=0.01)
+
+
+def test_runner_batches_across_recordings_and_reports_throughput(recordings, tmp_path):
+    output = tmp_path / "out" / "transcripts.jsonl"
+    model = FakeBatchModel()
+    report = BatchTranscriptionRunner(model, str(output), workers=2, batch_size=2).run(
+        collect_inputs(str(recordings))
+    )
+
+    records = {r["id"]: r for r in map(json.loads, output.read_text().splitlines())}
+    assert records["a.wav"]["text"] == "1.7s"
+    assert [s["text"] for s in records[os.path.join("ward", "b.wav")]["segments"]] == ["1.0s", "1.2s"]
+    assert records["c.wav"]["text"] == "" and records["c.wav"]["segments"] == []
+    # Three segments from two recordings in two batches
+    assert model.batches == [2, 1]
+    assert report["transcribed"] == 3 and report["failed"] == 0
+    assert report["audio_hours"] == pytest.approx(5.7 / 3600, abs=1e-4)
+    assert report["audio_hours_per_cpu_hour"] > 0
+
+
+def test_rerun_resumes_and_retries_failures(recordings, tmp_path):
+    output = tmp_path / "transcripts.jsonl"
+    items = collect_inputs(str(recordings))
+    report = BatchTranscriptionRunner(FakeBatchModel(fail_on_call=1), str(output), workers=1, batch_size=1).run(items)
+    assert report["failed"] == 1
+    assert completed_ids(str(output)) == {"c.wav", os.path.join("ward", "b.wav")}
+
+    # A crash halfway through a line is discarded on resume
+    with open(output, "a") as f:
+        f.write('{"id": "ward/b.wa')
+
+    model = FakeBatchModel()
+    report = BatchTranscriptionRunner(model, str(output), workers=1, batch_size=4).run(items)
+    assert report["skipped"] == 2 and report["transcribed"] == 1
+    assert model.batches == [1]
+    assert completed_ids(str(output)) == {item["id"] for item in items}
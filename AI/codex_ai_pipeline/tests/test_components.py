@@ -0,0 +1,72 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+
+# Add project root to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.pipeline.components import StartupProfile, aget, is_built, lazy_component, load_component
+from src.pipeline.main_pipeline import CodexAIPipeline, MockVoiceProcessor
+
+
+class Holder:
+    def __init__(self):
+        self.startup_profile = StartupProfile()
+        self.builds = 0
+
+    @lazy_component
+    def model(self):
+        self.builds += 1
+        time.sleep(0.05)
+        return {"thread": threading.current_thread().name}
+
+
+def test_lazy_component_builds_once_under_concurrency():
+    holder = Holder()
+    assert not is_built(holder, "model")
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(holder.model)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert holder.builds == 1
+    assert all(result is results[0] for result in results)
+    assert holder.startup_profile.report()["components"]["model"]["type"] == "dict"
+
+
+def test_aget_builds_off_the_event_loop():
+    holder = Holder()
+
+    async def run():
+        return await aget(holder, "model"), threading.current_thread().name
+
+    model, loop_thread = asyncio.run(run())
+    assert model["thread"] != loop_thread
+    assert asyncio.run(aget(holder, "model")) is model
+
+
+def test_load_component_falls_back_when_dependencies_are_missing():
+    component = load_component(".does_not_exist", "Nothing", MockVoiceProcessor)
+    assert isinstance(component, MockVoiceProcessor)
+
+
+def test_pipeline_builds_components_on_first_use():
+    pipeline = CodexAIPipeline({
+        "model_name": "gpt-3.5-turbo", "temperature": 0.0, "max_tokens": 10,
+        "use_mock_llm": True, "evaluation_sample_rate": 0.0,
+    })
+    assert not any(is_built(pipeline, name) for name in ("vector_search", "agent_system", "voice_processor"))
+
+    result = asyncio.run(pipeline.process_query("what is triage?"))
+    assert result["response"]
+
+    report = pipeline.startup_profile.report()
+    assert {"vector_search", "agent_system", "response_cache"} <= set(report["components"])
+    assert "voice_processor" not in report["components"]
+    assert "evaluator" not in report["components"]
+    pipeline.close()
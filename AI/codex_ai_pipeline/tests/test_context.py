@@ -0,0 +1,56 @@
+import asyncio
+import os
+import sys
+
+# Add project root to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.rag.context import estimate_tokens, select_context
+
+
+def _chroma_results(documents, distances):
+    return {"ids": [[str(i) for i in range(len(documents))]], "documents": [documents], "distances": [distances]}
+
+
+def test_chunks_ranked_by_distance_and_deduplicated():
+    results = _chroma_results(["far", "near", "middle", "near"], [0.9, 0.1, 0.5, 0.1])
+    assert select_context(results) == "near\n\nmiddle\n\nfar"
+
+
+def test_token_budget_stops_before_overflow():
+    chunk = "x" * 40  # 10 tokens
+    results = _chroma_results([chunk + "a", chunk + "b", chunk + "c"], [0.1, 0.2, 0.3])
+    context = select_context(results, token_budget=25)
+    assert context.split("\n\n") == [chunk + "a", chunk + "b"]
+
+
+def test_oversized_best_chunk_is_truncated():
+    context = select_context(_chroma_results(["y" * 400], [0.1]), token_budget=10)
+    assert estimate_tokens(context) == 10
+
+
+def test_legacy_result_shape():
+    assert select_context({"documents": [{"document": "Mock document"}]}) == "Mock document"
+
+
+def test_pipeline_feeds_retrieved_context_to_agents():
+    from src.pipeline.main_pipeline import CodexAIPipeline
+
+    pipeline = CodexAIPipeline({
+        "model_name": "gpt-3.5-turbo", "temperature": 0.7, "max_tokens": 100,
+        "response_cache_enabled": False,
+    })
+    seen = {}
+
+    async def aexecute_workflow(query, sub_queries=None, context=None):
+        # Retrieval is still pending when the workflow starts
+        seen["pending"] = not isinstance(context, str)
+        seen["context"] = await context
+        return {"output": "answer"}
+
+    pipeline.agent_system.aexecute_workflow = aexecute_workflow
+    result = asyncio.run(pipeline.process_query("What is AI?"))
+    pipeline.close()
+
+    assert seen == {"pending": True, "context": "Mock document for: What is AI?"}
+    assert result["context"] == "Mock document for: What is AI?"
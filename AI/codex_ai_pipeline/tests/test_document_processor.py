@@ -0,0 +1,159 @@
+import json
+import os
+import sys
+
+import pytest
+
+# Add project root to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+pytest.importorskip("langchain")
+pytest.importorskip("langchain_community")
+
+from src.rag import document_processor
+from src.rag.document_processor import DocumentProcessor, chunk_id
+
+
+class FakeCollection:
+    def __init__(self):
+        self.documents = {}
+        self.upserted = []
+        self.deleted = []
+
+    def upsert(self, ids, documents, metadatas):
+        self.upserted.extend(ids)
+        self.documents.update(zip(ids, documents))
+
+    def delete(self, ids):
+        self.deleted.extend(ids)
+        for id_ in ids:
+            self.documents.pop(id_, None)
+
+
+def load_text(path):
+    """Stands in for the PDF parser: one page per file."""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    if text.startswith("%BROKEN"):
+        raise ValueError("not a PDF")
+    return [(text, {"source": path, "page": 0})]
+
+
+def paragraphs(*lines):
+    # Each paragraph fits one 40-character chunk, two do not, so chunks map to paragraphs
+    return "\n\n".join(lines)
+
+
+@pytest.fixture
+def processor(tmp_path, monkeypatch):
+    monkeypatch.setattr(document_processor, "get_collection", lambda persist_dir: FakeCollection())
+    monkeypatch.setattr(document_processor, "_load_pdf", load_text)
+    return DocumentProcessor(chunk_size=40, chunk_overlap=0, persist_dir=str(tmp_path / "index"))
+
+
+def write(path, text):
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def manifest(processor):
+    with open(processor.manifest_path, encoding="utf-8") as f:
+        return json.load(f)["files"]
+
+
+def test_chunk_ids_are_stable_and_content_addressed():
+    metadata = {"source": "/docs/discharge.pdf", "page": 2}
+    assert chunk_id("Rest for two days.", metadata) == chunk_id("Rest for two days.", dict(metadata))
+    assert chunk_id("Rest for two days.", metadata) != chunk_id("Rest for three days.", metadata)
+    assert chunk_id("Rest for two days.", metadata) != chunk_id("Rest for two days.", {**metadata, "page": 3})
+
+
+def test_sync_handles_new_unchanged_changed_and_removed_files(processor, tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    a = write(docs / "a.txt", paragraphs("Rest for two days after surgery.", "Keep the wound clean and dry."))
+    b = write(docs / "b.txt", paragraphs("Take antibiotics with food.", "Finish the whole course."))
+    c = write(docs / "c.txt", paragraphs("Call us if the fever returns."))
+    store = processor.collection
+
+    stats = processor.sync([a, b, c], max_workers=0)
+    assert (stats.new_files, stats.changed_files, stats.unchanged_files, stats.removed_files) == (3, 0, 0, 0)
+    assert stats.chunks_added == len(store.documents) == 5
+    files = manifest(processor)
+    assert set(files) == {a, b, c}
+    assert {id_ for entry in files.values() for id_ in entry["chunk_ids"]} == set(store.documents)
+    first_ids = {path: list(entry["chunk_ids"]) for path, entry in files.items()}
+
+    # Nothing changed; a touched file with the same bytes is recognised by its hash
+    os.utime(a, (0, 0))
+    store.upserted.clear()
+    stats = processor.sync([a, b, c], max_workers=0)
+    assert stats.unchanged_files == 3 and stats.chunks_added == stats.chunks_deleted == 0
+    assert store.upserted == []
+
+    # Edit one paragraph of b, delete c
+    write(docs / "b.txt", paragraphs("Take antibiotics with food.", "Stop if a rash appears."))
+    os.remove(c)
+    stats = processor.sync([a, b], max_workers=0)
+    assert (stats.new_files, stats.changed_files, stats.unchanged_files, stats.removed_files) == (0, 1, 1, 1)
+    assert stats.chunks_added == 1 and stats.chunks_deleted == 2
+
+    files = manifest(processor)
+    assert set(files) == {a, b}
+    assert files[a]["chunk_ids"] == first_ids[a]
+    # The unchanged paragraph keeps its id, so only the edited one was embedded
+    kept, added = set(files[b]["chunk_ids"]) & set(first_ids[b]), set(files[b]["chunk_ids"]) - set(first_ids[b])
+    assert len(kept) == 1 and len(added) == 1 and set(store.upserted) == added
+    assert set(store.deleted) == (set(first_ids[b]) - kept) | set(first_ids[c])
+    assert set(store.documents) == set(files[a]["chunk_ids"]) | set(files[b]["chunk_ids"])
+
+
+def test_ids_do_not_depend_on_the_run(processor, tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    a = write(docs / "a.txt", paragraphs("Rest for two days after surgery.", "Keep the wound clean and dry."))
+    processor.sync([a], max_workers=0)
+
+    other = DocumentProcessor(chunk_size=40, chunk_overlap=0, persist_dir=str(tmp_path / "other"))
+    other.ingest([a], max_workers=0)
+    assert set(other.collection.documents) == set(processor.collection.documents)
+
+
+def test_ingest_batches_through_a_small_window_and_survives_a_bad_file(processor, tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    paths = [
+        write(docs / f"{i}.txt", paragraphs(f"Discharge note {i}: rest today.", f"Note {i}: drink plenty of water."))
+        for i in range(5)
+    ]
+    paths.insert(2, write(docs / "broken.txt", "%BROKEN"))
+
+    # One worker process, so at most two files are parsed or waiting at a time
+    stats = processor.ingest(paths, batch_size=3, max_workers=1)
+
+    assert (stats.files, stats.pages, stats.failed) == (5, 5, 1)
+    assert stats.chunks == len(processor.collection.upserted) == len(processor.collection.documents) == 10
+    assert stats.batches == 4  # 3 + 3 + 3 + 1
+    assert stats.seconds > 0 and stats.chunks_per_second > 0
+    assert "1 failed" in stats.summary()
+
+
+def test_sync_after_ingest_adds_nothing(processor, tmp_path, monkeypatch):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    write(docs / "a.txt", paragraphs("Rest for two days after surgery.", "Keep the wound clean and dry."))
+    write(docs / "b.txt", paragraphs("Take antibiotics with food."))
+    store = processor.collection
+
+    # Ingest relative paths and sync absolute ones: both must name the same source
+    monkeypatch.chdir(tmp_path)
+    processor.ingest([os.path.join("docs", "a.txt"), os.path.join("docs", "b.txt")], max_workers=0)
+    ingested = dict(store.documents)
+    upserted = len(store.upserted)
+
+    stats = processor.sync([str(docs / "a.txt"), str(docs / "b.txt")], max_workers=0)
+
+    assert (stats.new_files, stats.changed_files, stats.unchanged_files) == (0, 0, 2)
+    assert (stats.chunks_added, stats.chunks_deleted) == (0, 0)
+    assert len(store.upserted) == upserted
+    assert store.documents == ingested
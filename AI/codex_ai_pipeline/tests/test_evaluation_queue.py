@@ -0,0 +1,97 @@
+import asyncio
+import os
+import sys
+import time
+
+# Add project root to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.evaluation.background import EvaluationQueue
+
+
+class BatchEvaluator:
+    def __init__(self, delay=0.0, fail=False):
+        self.batches = []
+        self.delay = delay
+        self.fail = fail
+
+    def evaluate_batch(self, items):
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("grader down")
+        self.batches.append([question for question, _, _ in items])
+        return [{"score": 1, "question": question} for question, _, _ in items]
+
+
+def test_jobs_are_sampled_and_batched():
+    evaluator = BatchEvaluator()
+    rolls = iter([0.0, 0.9, 0.0, 0.0])
+    queue = EvaluationQueue(evaluator, sample_rate=0.5, batch_size=8, flush_interval=0.05, rng=lambda: next(rolls))
+    attached = []
+
+    async def run():
+        ids = [queue.submit(f"q{i}", "a", "ref", on_result=attached.append) for i in range(4)]
+        assert queue.result(ids[0]) == {"status": "pending"}
+        await queue.drain(timeout=2)
+        results = [queue.result(i) for i in ids if i]
+        await queue.aclose()
+        return ids, results
+
+    ids, results = asyncio.run(run())
+    assert ids[1] is None
+    assert evaluator.batches == [["q0", "q2", "q3"]]
+    assert [r["status"] for r in results] == ["done"] * 3
+    assert len(attached) == 3
+    assert queue.stats()["skipped"] == 1
+
+
+def test_submit_does_not_wait_for_grading():
+    evaluator = BatchEvaluator(delay=0.3)
+    queue = EvaluationQueue(evaluator, sample_rate=1.0, flush_interval=0.0)
+
+    async def run():
+        started = time.perf_counter()
+        queue.submit("q", "a", "ref")
+        elapsed = time.perf_counter() - started
+        await queue.drain(timeout=2)
+        await queue.aclose()
+        return elapsed
+
+    assert asyncio.run(run()) < 0.05
+    assert evaluator.batches == [["q"]]
+
+
+def test_failed_batch_is_recorded():
+    queue = EvaluationQueue(BatchEvaluator(fail=True), sample_rate=1.0, flush_interval=0.0)
+
+    async def run():
+        job_id = queue.submit("q", "a", "ref")
+        await queue.drain(timeout=2)
+        await queue.aclose()
+        return queue.result(job_id)
+
+    result = asyncio.run(run())
+    assert result["status"] == "done" and "grader down" in result["error"]
+    assert queue.stats()["failed"] == 1
+
+
+def test_pipeline_returns_before_evaluation():
+    from src.pipeline.main_pipeline import CodexAIPipeline
+
+    pipeline = CodexAIPipeline({
+        "model_name": "gpt-3.5-turbo", "temperature": 0.7, "max_tokens": 100,
+        "response_cache_enabled": False, "evaluation_sample_rate": 1.0,
+    })
+    pipeline.evaluator.evaluate_response = lambda *args: time.sleep(0.3) or {"score": 0.5}
+
+    async def run():
+        started = time.perf_counter()
+        result = await pipeline.process_query("What is AI?")
+        elapsed = time.perf_counter() - started
+        await pipeline.aclose()
+        return result, elapsed
+
+    result, elapsed = asyncio.run(run())
+    assert elapsed < 0.25
+    assert result["evaluation"]["status"] == "pending"
+    assert pipeline.evaluations.result(result["evaluation"]["id"]) == {"status": "done", "score": 0.5}
@@ -0,0 +1,89 @@
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+# Add project root to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.serving.model_registry import ModelRegistry, parse_model_list
+
+
+class FakeModel:
+    def __init__(self, name):
+        self.name = name
+        self.inferences = 0
+
+    def warm_up(self):
+        self.inferences += 1
+
+
+def make_registry(loads):
+    def load(name):
+        loads.append(name)
+        time.sleep(0.05)
+        return FakeModel(name)
+
+    def fail(model):
+        raise RuntimeError("no audio backend")
+
+    return ModelRegistry({"embedder": (load, FakeModel.warm_up), "whisper": (load, fail)})
+
+
+def test_model_loads_once_under_concurrency():
+    loads = []
+    registry = make_registry(loads)
+    models = []
+    threads = [threading.Thread(target=lambda: models.append(registry.get("embedder", "mini"))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert loads == ["mini"]
+    assert all(model is models[0] for model in models)
+
+
+def test_preload_then_warm_up():
+    registry = make_registry([])
+    stats = registry.preload([("embedder", "mini"), ("whisper", "base")], freeze=False)
+    assert stats["embedder:mini"]["warmed_up"] is False
+    assert registry.get("embedder", "mini").inferences == 0
+
+    stats = registry.warm_up()
+    assert registry.get("embedder", "mini").inferences == 1
+    assert stats["embedder:mini"]["warmed_up"] is True
+    assert stats["whisper:base"]["warm_up_error"] == "no audio backend"
+
+
+def _child_sees_preloaded_model(registry, parent_pid, conn):
+    # No load happens in the child; the weights came across the fork
+    model = registry.get("embedder", "mini")
+    conn.send((model.name, registry.stats()["embedder:mini"]["pid"] == parent_pid))
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_forked_workers_reuse_preloaded_models():
+    loads = []
+    registry = make_registry(loads)
+    registry.preload([("embedder", "mini")], freeze=False)
+
+    context = multiprocessing.get_context("fork")
+    parent, child = context.Pipe()
+    worker = context.Process(target=_child_sees_preloaded_model, args=(registry, os.getpid(), child))
+    worker.start()
+    assert parent.recv() == ("mini", True)
+    worker.join(5)
+    assert loads == ["mini"]
+
+
+def test_parse_model_list():
+    assert parse_model_list("embedder:all-MiniLM-L6-v2, whisper:base") == [
+        ("embedder", "all-MiniLM-L6-v2"), ("whisper", "base")
+    ]
+    assert parse_model_list(None) == []
+    with pytest.raises(ValueError):
+        parse_model_list("tts:eleven")
@@ -0,0 +1,89 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+# Add project root to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+prometheus_client = pytest.importorskip("prometheus_client")
+
+from src.monitoring.monitor import PipelineMonitor, add_metrics_route
+
+
+def _value(registry, name, **labels):
+    return registry.get_sample_value(name, labels)
+
+
+def test_monitors_share_metrics_without_binding_a_port():
+    registry = prometheus_client.CollectorRegistry()
+    first, second = PipelineMonitor(registry), PipelineMonitor(registry)
+    with first.stage("retrieval"):
+        pass
+    with second.stage("retrieval"):
+        pass
+    assert _value(registry, "pipeline_stage_seconds_count", stage="retrieval") == 2
+
+
+def test_async_decorators_and_stage_errors():
+    registry = prometheus_client.CollectorRegistry()
+    monitor = PipelineMonitor(registry)
+
+    @monitor.track_request(endpoint="POST /query")
+    async def handler():
+        assert _value(registry, "pipeline_in_flight", stage="request:POST /query") == 1
+        return "ok"
+
+    @monitor.track_stage("tts")
+    async def speak():
+        for chunk in ("a", "b"):
+            yield chunk
+
+    @monitor.track_stage("evaluation")
+    def grade():
+        raise RuntimeError("boom")
+
+    async def run():
+        assert await handler() == "ok"
+        return [chunk async for chunk in speak()]
+
+    assert asyncio.run(run()) == ["a", "b"]
+    with pytest.raises(RuntimeError):
+        grade()
+
+    assert _value(registry, "llm_requests_total", endpoint="POST /query") == 1
+    assert _value(registry, "pipeline_in_flight", stage="request:POST /query") == 0
+    assert _value(registry, "pipeline_stage_seconds_count", stage="tts") == 1
+    assert _value(registry, "pipeline_stage_errors_total", stage="evaluation") == 1
+
+
+def test_token_cost_and_cache_gauges():
+    registry = prometheus_client.CollectorRegistry()
+    monitor = PipelineMonitor(registry)
+    monitor.record_tokens("openai", "gpt-4o-mini-2024-07-18", input_tokens=1000, output_tokens=500)
+    monitor.watch_cache("response", lambda: {"hit_ratio": 0.25, "size": 3})
+
+    labels = {"provider": "openai", "model": "gpt-4o-mini-2024-07-18"}
+    assert _value(registry, "llm_tokens_total", direction="input", **labels) == 1000
+    assert _value(registry, "llm_cost_usd_total", **labels) == pytest.approx((1000 * 0.15 + 500 * 0.6) / 1e6)
+    assert _value(registry, "cache_hit_ratio", cache="response") == 0.25
+    assert _value(registry, "cache_entries", cache="response") == 3
+
+
+def test_metrics_route():
+    pytest.importorskip("fastapi")
+    pytest.importorskip("httpx")
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    registry = prometheus_client.CollectorRegistry()
+    monitor = PipelineMonitor(registry)
+    app = FastAPI()
+    add_metrics_route(app, monitor)
+    with monitor.stage("stt"):
+        pass
+
+    response = TestClient(app).get("/metrics")
+    assert response.status_code == 200
+    assert 'pipeline_stage_seconds_count{stage="stt"} 1.0' in response.text
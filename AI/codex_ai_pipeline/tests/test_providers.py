@@ -0,0 +1,228 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# Add project root to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.llm.providers import LLMProvider, ProviderPool, ProviderSettings, provider_settings_from_config
+
+
+class _StubLLMHandler(BaseHTTPRequestHandler):
+    """Answers Anthropic `/v1/messages` and OpenAI `/v1/chat/completions` calls."""
+
+    in_flight = 0
+    max_in_flight = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        cls = type(self)
+        with cls.lock:
+            cls.in_flight += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+        time.sleep(0.05)
+        with cls.lock:
+            cls.in_flight -= 1
+
+        if self.path.endswith("/messages"):
+            prompt = body["messages"][0]["content"][0]["text"]
+            payload = {
+                "id": "msg_stub", "type": "message", "role": "assistant",
+                "model": body["model"], "stop_reason": "end_turn", "stop_sequence": None,
+                "content": [{"type": "text", "text": f"claude: {prompt}"}],
+                "usage": {"input_tokens": 1, "output_tokens": 1},
+            }
+        elif self.path.endswith("/chat/completions") and body.get("stream"):
+            self._stream_openai(body, body["messages"][0]["content"].split())
+            return
+        elif self.path.endswith("/chat/completions"):
+            prompt = body["messages"][0]["content"]
+            payload = {
+                "id": "chatcmpl-stub", "object": "chat.completion", "created": 0,
+                "model": body["model"],
+                "choices": [{
+                    "index": 0, "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": f"gpt: {prompt}"},
+                }],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+            }
+        else:
+            self.send_error(404)
+            return
+
+        data = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream_openai(self, body, words):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for word in words:
+            chunk = {
+                "id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": 0,
+                "model": body["model"],
+                "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+        if (body.get("stream_options") or {}).get("include_usage"):
+            usage = {
+                "id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": 0,
+                "model": body["model"], "choices": [],
+                "usage": {"prompt_tokens": len(words), "completion_tokens": len(words), "total_tokens": 2 * len(words)},
+            }
+            self.wfile.write(f"data: {json.dumps(usage)}\n\n".encode())
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubLLMHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def _pool(base_url, **overrides):
+    config = {
+        "anthropic_api_key": "test-anthropic",
+        "openai_api_key": "test-openai",
+        "anthropic_base_url": base_url,
+        "openai_base_url": f"{base_url}/v1",
+        "model_name": "gpt-test",
+        "max_tokens": 50,
+        "provider_max_concurrency": 4,
+    }
+    config.update(overrides)
+    return ProviderPool(provider_settings_from_config(config))
+
+
+def test_pool_prefers_anthropic_and_reuses_client(stub_server):
+    pytest.importorskip("anthropic")
+    pool = _pool(stub_server)
+
+    async def run():
+        first = await pool.complete("hello")
+        client = pool.get("anthropic").client
+        second = await pool.complete("again")
+        assert pool.get("anthropic").client is client
+        await pool.aclose()
+        return first, second
+
+    assert asyncio.run(run()) == ("claude: hello", "claude: again")
+
+
+def test_pool_falls_back_to_openai(stub_server):
+    pytest.importorskip("openai")
+    pool = _pool(stub_server, anthropic_api_key=None)
+    assert asyncio.run(pool.complete("hi")) == "gpt: hi"
+
+
+def test_concurrency_is_capped_per_provider(stub_server):
+    pytest.importorskip("openai")
+    _StubLLMHandler.max_in_flight = 0
+    pool = _pool(stub_server, anthropic_api_key=None)
+
+    async def run():
+        results = await asyncio.gather(*(pool.complete(f"q{i}") for i in range(12)))
+        await pool.aclose()
+        return results
+
+    results = asyncio.run(run())
+    assert results == [f"gpt: q{i}" for i in range(12)]
+    assert _StubLLMHandler.max_in_flight <= 4
+
+
+def test_stream_yields_deltas_in_order(stub_server):
+    pytest.importorskip("openai")
+    pool = _pool(stub_server, anthropic_api_key=None)
+
+    async def run():
+        deltas = [delta async for delta in pool.stream("one two three")]
+        await pool.aclose()
+        return deltas
+
+    assert asyncio.run(run()) == ["one ", "two ", "three "]
+
+
+def test_stream_records_usage_from_the_final_chunk(stub_server):
+    pytest.importorskip("openai")
+    pool = _pool(stub_server, anthropic_api_key=None)
+    provider = pool.get("openai")
+    usage = []
+    provider._record_usage = lambda input_tokens, output_tokens: usage.append((input_tokens, output_tokens))
+
+    async def run():
+        deltas = [delta async for delta in pool.stream("one two three")]
+        await pool.aclose()
+        return deltas
+
+    assert asyncio.run(run()) == ["one ", "two ", "three "]
+    assert usage == [(3, 3)]
+
+
+class _FakeClient:
+    def __init__(self):
+        self.closed_on = None
+
+    async def close(self):
+        self.closed_on = asyncio.get_running_loop()
+
+
+class _FakeProvider(LLMProvider):
+    def _create_client(self):
+        return _FakeClient()
+
+
+def test_client_from_a_finished_loop_is_closed_on_the_new_one():
+    provider = _FakeProvider(ProviderSettings("fake", "key", "model"))
+
+    async def use():
+        return provider.client, asyncio.get_running_loop()
+
+    old_client, _ = asyncio.run(use())
+
+    async def use_again():
+        client, loop = await use()
+        await provider.aclose()
+        return client, loop
+
+    new_client, new_loop = asyncio.run(use_again())
+    assert new_client is not old_client
+    assert old_client.closed_on is new_loop and new_client.closed_on is new_loop
+
+
+def test_client_is_closed_on_its_own_loop_while_that_loop_runs():
+    provider = _FakeProvider(ProviderSettings("fake", "key", "model"))
+    other_loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=other_loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        async def use():
+            return provider.client
+
+        old_client = asyncio.run_coroutine_threadsafe(use(), other_loop).result(5)
+        asyncio.run(use())
+        # The close was handed to the loop the client belongs to
+        asyncio.run_coroutine_threadsafe(asyncio.sleep(0), other_loop).result(5)
+        assert old_client.closed_on is other_loop
+    finally:
+        other_loop.call_soon_threadsafe(other_loop.stop)
+        thread.join(5)
+        other_loop.close()
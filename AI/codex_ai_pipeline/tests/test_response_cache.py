@@ -0,0 +1,163 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+# Add project root to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.pipeline.response_cache import ResponseCache, normalize_text
+
+_VOCAB = ["hypertension", "mean", "diabetes", "what", "does", "is"]
+
+
+def _bag_of_words(texts):
+    return [[text.split().count(word) for word in _VOCAB] for text in texts]
+
+
+def test_normalize_text():
+    assert normalize_text("  What does   HYPERTENSION mean?? ") == "what does hypertension mean"
+
+
+def test_exact_hit_ignores_case_and_punctuation():
+    cache = ResponseCache()
+    cache.put("What does hypertension mean?", {"response": "High blood pressure"})
+
+    hit = cache.get("what does hypertension mean")
+    assert hit == {"response": "High blood pressure", "cache_hit": "exact"}
+    assert cache.get("what does hypertension mean", context="pediatrics") is None
+    assert cache.stats()["exact_hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_semantic_hit_within_same_scope():
+    pytest.importorskip("numpy")
+    cache = ResponseCache(similarity_threshold=0.8, embed=_bag_of_words)
+    cache.put("what does hypertension mean", {"response": "High blood pressure"})
+
+    assert cache.get("hypertension what does it mean")["cache_hit"] == "semantic"
+    assert cache.get("what does diabetes mean") is None
+    assert cache.get("hypertension what does it mean", model_config={"model_name": "other"}) is None
+
+
+def test_ttl_and_lru_eviction():
+    now = [0.0]
+    cache = ResponseCache(max_entries=2, ttl_seconds=10, clock=lambda: now[0])
+    cache.put("a", {"response": "A"})
+    cache.put("b", {"response": "B"})
+    cache.get("a")
+    cache.put("c", {"response": "C"})  # evicts "b", the least recently used
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    now[0] = 11
+    assert cache.get("c") is None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_pipeline_bypass_flag():
+    from src.pipeline.main_pipeline import CodexAIPipeline
+
+    pipeline = CodexAIPipeline({"model_name": "gpt-3.5-turbo", "temperature": 0.7, "max_tokens": 100})
+    calls = []
+    original = pipeline.agent_system.execute_workflow
+    pipeline.agent_system.execute_workflow = lambda q: calls.append(q) or original(q)
+
+    async def run():
+        await pipeline.process_query("What is AI?")
+        cached = await pipeline.process_query("what is ai")
+        fresh = await pipeline.process_query("what is ai", use_cache=False)
+        return cached, fresh
+
+    cached, fresh = asyncio.run(run())
+    assert cached["cache_hit"] == "exact"
+    assert "cache_hit" not in fresh
+    assert len(calls) == 2
+
+
+def test_stream_query_uses_cache_and_retrieves_once():
+    from src.pipeline.main_pipeline import CodexAIPipeline
+
+    pipeline = CodexAIPipeline({"model_name": "gpt-3.5-turbo", "temperature": 0.7, "max_tokens": 100})
+    searches, calls = [], []
+    original_search = pipeline.vector_search.search
+    pipeline.vector_search.search = lambda q, n_results=5: searches.append(q) or original_search(q, n_results)
+    original_workflow = pipeline.agent_system.execute_workflow
+    pipeline.agent_system.execute_workflow = lambda q: calls.append(q) or original_workflow(q)
+
+    async def no_nested_request(*args, **kwargs):
+        raise AssertionError("the no-provider fallback must not start a second request")
+
+    pipeline.process_query = no_nested_request
+
+    async def stream(query, **options):
+        return [event async for event in pipeline.stream_query(query, **options)]
+
+    async def run():
+        return await stream("What is AI?"), await stream("what is ai"), await stream("what is ai", use_cache=False)
+
+    first, cached, fresh = asyncio.run(run())
+    pipeline.close()
+
+    # No provider is configured, so each answer comes from the agents as one delta
+    assert [e["type"] for e in first] == ["delta", "done"]
+    assert first[-1]["context"] == "Mock document for: What is AI?"
+    assert [e["type"] for e in cached] == ["delta", "done"]
+    assert cached[0]["text"] == first[0]["text"] and cached[-1]["cache_hit"] == "exact"
+    assert "cache_hit" not in fresh[-1]
+    assert len(calls) == 2 and len(searches) == 2
+
+
+def test_pipeline_embeds_off_the_event_loop_and_does_not_cache_evaluations():
+    import threading
+
+    from src.pipeline.main_pipeline import CodexAIPipeline
+
+    pipeline = CodexAIPipeline({
+        "model_name": "gpt-3.5-turbo", "temperature": 0.7, "max_tokens": 100, "evaluation_sample_rate": 1.0,
+    })
+    embedding_threads = set()
+
+    def embed(texts):
+        embedding_threads.add(threading.current_thread())
+        return _bag_of_words(texts)
+
+    pipeline.response_cache = ResponseCache(similarity_threshold=0.8, embed=embed)
+
+    async def run():
+        first = await pipeline.process_query("what does hypertension mean")
+        cached = await pipeline.process_query("hypertension what does it mean")
+        await pipeline.aclose()
+        return first, cached
+
+    first, cached = asyncio.run(run())
+
+    assert first["evaluation"]["status"] == "pending"
+    assert cached["cache_hit"] == "semantic" and cached["evaluation"] is None
+    assert embedding_threads and threading.main_thread() not in embedding_threads
+
+
+def test_streamed_provider_answers_are_not_served_to_process_query():
+    from src.pipeline.main_pipeline import CodexAIPipeline
+
+    pipeline = CodexAIPipeline({"model_name": "gpt-3.5-turbo", "temperature": 0.7, "max_tokens": 100})
+
+    async def provider_stream(prompt, **kwargs):
+        for word in ("provider ", "only"):
+            yield word
+
+    pipeline.providers.stream = provider_stream
+
+    async def run():
+        streamed = [event async for event in pipeline.stream_query("What is AI?")]
+        answered = await pipeline.process_query("What is AI?")
+        streamed_again = [event async for event in pipeline.stream_query("What is AI?")]
+        return streamed, answered, streamed_again
+
+    streamed, answered, streamed_again = asyncio.run(run())
+    pipeline.close()
+
+    assert streamed[-1]["response"] == "provider only"
+    assert "cache_hit" not in answered and answered["response"] != "provider only"
+    # The stream still reuses its own answer
+    assert streamed_again[-1]["cache_hit"] == "exact" and streamed_again[-1]["response"] == "provider only"
@@ -0,0 +1,159 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+# Add project root to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.llm.router import (
+    CLOSED, HALF_OPEN, OPEN, CircuitBreaker, ProviderRouter, RouterSettings, is_quota_error
+)
+
+
+class FakeProvider:
+    def __init__(self, name, delay=0.0, error=None, available=True):
+        self.name = name
+        self.label = name.title()
+        self.delay = delay
+        self.error = error
+        self.available = available
+        self.calls = 0
+
+    async def complete(self, prompt, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return f"{self.name}: {prompt}"
+
+    async def stream(self, prompt, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        for word in prompt.split():
+            yield word
+
+
+class QuotaError(Exception):
+    status_code = 429
+
+
+def test_breaker_opens_after_threshold_and_probes_once():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=lambda: now[0])
+
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow_request()
+
+    now[0] = 11
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow_request()
+    assert not breaker.allow_request()  # only one probe in flight
+
+    breaker.record_success()
+    assert breaker.state == CLOSED
+
+
+def test_quota_error_opens_breaker_immediately():
+    assert is_quota_error(QuotaError("slow down"))
+    assert is_quota_error(Exception("Your credit balance is too low"))
+
+    breaker = CircuitBreaker(failure_threshold=5)
+    breaker.record_failure(quota=True)
+    assert breaker.state == OPEN
+
+
+def test_router_falls_back_and_stops_calling_open_provider():
+    primary = FakeProvider("anthropic", error=QuotaError("quota exceeded"))
+    secondary = FakeProvider("openai")
+    router = ProviderRouter([primary, secondary], RouterSettings(failure_threshold=3))
+
+    async def run():
+        first = await router.complete("hi")
+        errors = []
+        second = await router.complete("again", errors=errors)
+        return first, second, errors
+
+    first, second, errors = asyncio.run(run())
+    assert (first, second) == ("openai: hi", "openai: again")
+    assert primary.calls == 1
+    assert errors == ["Anthropic circuit open"]
+
+
+def test_attempt_timeout_bounds_latency():
+    slow = FakeProvider("anthropic", delay=5)
+    fast = FakeProvider("openai")
+    router = ProviderRouter([slow, fast], RouterSettings(timeout=0.05))
+    errors = []
+
+    assert asyncio.run(router.complete("hi", errors=errors)) == "openai: hi"
+    assert errors == ["Anthropic timed out after 0.05s"]
+
+
+def test_hedged_request_takes_first_answer():
+    slow = FakeProvider("anthropic", delay=1.0)
+    fast = FakeProvider("openai", delay=0.01)
+    router = ProviderRouter([slow, fast], RouterSettings(hedge=True, hedge_delay=0.05))
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        result = await router.complete("hi")
+        return result, loop.time() - started
+
+    result, elapsed = asyncio.run(run())
+    assert result == "openai: hi"
+    assert elapsed < 0.5
+    assert router.breakers["anthropic"].state == CLOSED
+
+
+def test_hedged_failure_finishing_with_the_winner_is_recorded():
+    import gc
+
+    class GatedProvider(FakeProvider):
+        async def complete(self, prompt, **kwargs):
+            self.calls += 1
+            await self.gate.wait()
+            if self.error:
+                raise self.error
+            return f"{self.name}: {prompt}"
+
+    working = GatedProvider("anthropic")
+    broken = GatedProvider("openai", error=RuntimeError("boom"))
+    router = ProviderRouter([working, broken], RouterSettings(hedge=True, hedge_delay=0.01))
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        unhandled = []
+        loop.set_exception_handler(lambda _, context: unhandled.append(context))
+        broken.gate = working.gate = gate = asyncio.Event()
+        # Both attempts are running by then and finish in the same loop iteration
+        loop.call_later(0.05, gate.set)
+        errors = []
+        result = await router.complete("hi", errors=errors)
+        gc.collect()
+        await asyncio.sleep(0)
+        return result, errors, unhandled
+
+    result, errors, unhandled = asyncio.run(run())
+    assert result == "anthropic: hi"
+    assert errors == ["Openai API error: boom"]
+    assert unhandled == []
+    assert router.breakers["openai"].snapshot()["failures"] == 1
+
+
+def test_stream_falls_through_before_first_token():
+    broken = FakeProvider("anthropic", error=RuntimeError("boom"))
+    healthy = FakeProvider("openai")
+    router = ProviderRouter([broken, healthy])
+
+    async def run():
+        return [delta async for delta in router.stream("a b c")]
+
+    assert asyncio.run(run()) == ["a", "b", "c"]
+    assert router.breakers["anthropic"].snapshot()["failures"] == 1
@@ -0,0 +1,153 @@
+import os
+import sys
+
+import pytest
+
+# Add project root to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.sessions.session_store import InMemorySessionStore, SQLiteSessionStore
+
+
+def test_memory_store_is_bounded_lru():
+    store = InMemorySessionStore(max_sessions=2)
+    a = store.get_or_create()
+    b = store.get_or_create()
+    store.append(a, "user", "hello")  # touches a, so b is least recently used
+    c = store.get_or_create()
+
+    assert store.count() == 2
+    assert store.exists(a) and store.exists(c)
+    assert not store.exists(b)
+
+
+def test_memory_store_expires_idle_sessions():
+    now = [0.0]
+    store = InMemorySessionStore(ttl_seconds=60, clock=lambda: now[0])
+    session_id = store.get_or_create()
+    now[0] = 61
+    assert not store.exists(session_id)
+    assert store.history(session_id) == ([], 0)
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_history_is_paginated(backend, tmp_path):
+    if backend == "memory":
+        store = InMemorySessionStore()
+    else:
+        store = SQLiteSessionStore(str(tmp_path / "sessions.db"))
+    session_id = store.get_or_create("abc")
+    for i in range(5):
+        store.append(session_id, "user", f"m{i}", context="ctx" if i == 0 else None)
+
+    page, total = store.history(session_id, offset=2, limit=2)
+    assert total == 5
+    assert [m.content for m in page] == ["m2", "m3"]
+    first, _ = store.history(session_id, limit=1)
+    assert first[0].context == "ctx" and first[0].to_dict()["role"] == "user"
+    store.close()
+
+
+def test_sqlite_store_survives_reopen(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    store = SQLiteSessionStore(path)
+    session_id = store.get_or_create()
+    store.append(session_id, "assistant", "persisted")
+    store.close()
+
+    reopened = SQLiteSessionStore(path)
+    messages, total = reopened.history(session_id)
+    assert total == 1 and messages[0].content == "persisted"
+    assert reopened.count() == 1
+    reopened.close()
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_evaluation_attached_to_message(backend, tmp_path):
+    if backend == "memory":
+        store = InMemorySessionStore()
+    else:
+        store = SQLiteSessionStore(str(tmp_path / "sessions.db"))
+    session_id = store.get_or_create()
+    store.append(session_id, "user", "question")
+    reply = store.append(session_id, "assistant", "answer")
+
+    assert store.set_evaluation(session_id, reply.id, {"score": 1})
+    assert not store.set_evaluation(session_id, "missing", {"score": 0})
+    messages, _ = store.history(session_id)
+    assert [m.evaluation for m in messages] == [None, {"score": 1}]
+    assert messages[1].to_dict()["evaluation"] == {"score": 1}
+
+
+def _load_chat_app():
+    pytest.importorskip("fastapi")
+    pytest.importorskip("uvicorn")
+    import importlib.util
+
+    path = os.path.join(os.path.dirname(__file__), '..', 'api', 'AI Pipeline.py')
+    spec = importlib.util.spec_from_file_location("ai_pipeline_app", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_history_endpoint_clamps_offset_and_reads_off_the_event_loop():
+    import asyncio
+    import threading
+
+    chat_app = _load_chat_app()
+    threads = set()
+
+    class RecordingStore(InMemorySessionStore):
+        def history(self, *args, **kwargs):
+            threads.add(threading.current_thread())
+            return super().history(*args, **kwargs)
+
+    store = chat_app.session_store = RecordingStore()
+    session_id = store.get_or_create()
+    for i in range(3):
+        store.append(session_id, "user", f"message {i}")
+
+    page = asyncio.run(chat_app.get_chat_history(session_id, offset=-5, limit=2))
+
+    assert page["offset"] == 0 and page["next_offset"] == 2
+    assert [m["content"] for m in page["messages"]] == ["message 0", "message 1"]
+    assert threads and threading.main_thread() not in threads
+
+
+def test_chat_evaluates_only_pipeline_fallback_replies(monkeypatch):
+    import asyncio
+
+    chat_app = _load_chat_app()
+    chat_app.session_store = InMemorySessionStore()
+    evaluated = []
+
+    class FakePipeline:
+        def submit_evaluation(self, question, response, context, on_result=None):
+            evaluated.append(response)
+
+    async def fallback(message, context=None):
+        return "pipeline answer"
+
+    async def connected():
+        return False
+
+    class FakeRequest:
+        is_disconnected = staticmethod(connected)
+
+    monkeypatch.setattr(chat_app, "_get_pipeline", lambda: FakePipeline())
+    monkeypatch.setattr(chat_app, "_pipeline_fallback_response", fallback)
+
+    async def direct(message, context=None):
+        return "provider answer"
+
+    monkeypatch.setattr(chat_app, "get_direct_ai_response", direct)
+    reply = asyncio.run(chat_app.chat_endpoint(chat_app.ChatRequest(message="hi"), FakeRequest()))
+    assert reply["response"] == "provider answer" and evaluated == []
+
+    async def no_provider(message, context=None):
+        return None
+
+    monkeypatch.setattr(chat_app, "get_direct_ai_response", no_provider)
+    reply = asyncio.run(chat_app.chat_endpoint(chat_app.ChatRequest(message="hi"), FakeRequest()))
+    assert reply["response"] == "pipeline answer" and evaluated == ["pipeline answer"]
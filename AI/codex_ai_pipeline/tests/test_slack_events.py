@@ -0,0 +1,163 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import sys
+import time
+from urllib.parse import urlencode
+
+import pytest
+
+# Add project root to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.messaging.slack_events import RecentIds, SlackQuestionHandler, add_slack_routes, verify_signature
+from src.messaging.slack_sender import SlackSender
+
+SECRET = "test-signing-secret"
+
+
+class FakeClient:
+    def __init__(self):
+        self.calls = []
+
+    async def chat_postMessage(self, **kwargs):
+        self.calls.append(("post", kwargs))
+        return {"ok": True, "ts": f"{len(self.calls)}.0"}
+
+    async def chat_update(self, **kwargs):
+        self.calls.append(("update", kwargs))
+        return {"ok": True, "ts": kwargs["ts"]}
+
+
+async def answer(question):
+    for word in ["Rest", " and", " drink", " fluids."]:
+        await asyncio.sleep(0.05)
+        yield {"type": "delta", "text": word}
+    yield {"type": "done", "response": f"Rest and drink fluids. ({question})"}
+
+
+def signed(body: bytes, timestamp=None):
+    timestamp = str(int(timestamp if timestamp is not None else time.time()))
+    signature = "v0=" + hmac.new(SECRET.encode(), f"v0:{timestamp}:".encode() + body, hashlib.sha256).hexdigest()
+    return {"X-Slack-Request-Timestamp": timestamp, "X-Slack-Signature": signature}
+
+
+def mention(event_id, ts="100.1", text="<@U0BOT> how long should I rest?"):
+    return {
+        "type": "event_callback",
+        "event_id": event_id,
+        "event": {"type": "app_mention", "channel": "C1", "user": "U1", "ts": ts, "text": text},
+    }
+
+
+def test_signature_and_recent_ids():
+    body = b'{"type": "event_callback"}'
+    assert verify_signature(SECRET, {k.lower(): v for k, v in signed(body).items()}, body)
+    assert not verify_signature(SECRET, {k.lower(): v for k, v in signed(body).items()}, body + b" ")
+    stale = {k.lower(): v for k, v in signed(body, time.time() - 600).items()}
+    assert not verify_signature(SECRET, stale, body)
+
+    recent = RecentIds(ttl=60, max_entries=2)
+    assert recent.add("a") and not recent.add("a")
+    recent.add("b"), recent.add("c")  # "a" is pushed out
+    assert recent.add("a")
+
+
+def test_mention_is_answered_in_thread_with_streaming_edits():
+    client = FakeClient()
+
+    async def run():
+        handler = SlackQuestionHandler(answer, SlackSender(client, rate_per_channel=50), SECRET, edit_interval=0.08)
+        handler.start()
+        handler.handle_event(mention("Ev1"))
+        handler.handle_event(mention("Ev1"))  # a Slack retry
+        handler.handle_event({**mention("Ev2"), "event": {**mention("Ev2")["event"], "bot_id": "B1"}})
+        await handler.join()
+        await handler.aclose()
+        return handler.counts
+
+    counts = asyncio.run(run())
+    assert counts["answered"] == 1 and counts["duplicates"] == 1
+    kinds = [kind for kind, _ in client.calls]
+    assert kinds[0] == "post" and set(kinds[1:]) == {"update"} and len(kinds) >= 3
+    assert client.calls[0][1] == {"channel": "C1", "text": "_Thinking…_", "thread_ts": "100.1"}
+    # An intermediate edit showed a partial answer before the final text
+    assert any(call[1]["text"].endswith(" …") for call in client.calls[1:-1])
+    assert client.calls[-1][1]["text"] == "Rest and drink fluids. (how long should I rest?)"
+
+
+def test_full_queue_replies_busy():
+    client = FakeClient()
+
+    async def run():
+        handler = SlackQuestionHandler(answer, SlackSender(client), SECRET, max_queue=1)
+        handler.handle_event(mention("Ev1", ts="1.0"))
+        handler.handle_event(mention("Ev2", ts="2.0"))
+        await handler.sender.flush()
+        return handler.counts
+
+    counts = asyncio.run(run())
+    assert counts["rejected"] == 1
+    assert client.calls == [("post", {
+        "channel": "C1", "text": "Too many questions right now; please ask again in a minute.", "thread_ts": "2.0"
+    })]
+
+
+def test_slack_routes_ack_immediately():
+    pytest.importorskip("httpx")
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    client = FakeClient()
+    app = FastAPI()
+    handler = SlackQuestionHandler(answer, SlackSender(client, rate_per_channel=50), SECRET)
+    add_slack_routes(app, handler)
+
+    with TestClient(app) as http:
+        body = json.dumps({"type": "url_verification", "challenge": "abc"}).encode()
+        assert http.post("/slack/events", content=body, headers=signed(body)).json() == {"challenge": "abc"}
+        assert http.post("/slack/events", content=body, headers=signed(b"other")).status_code == 401
+
+        body = json.dumps(mention("Ev1")).encode()
+        started = time.perf_counter()
+        assert http.post("/slack/events", content=body, headers=signed(body)).status_code == 200
+        assert time.perf_counter() - started < 0.15  # the 0.2s answer runs after the ack
+
+        body = urlencode({
+            "command": "/ask", "text": "Is ibuprofen safe?", "channel_id": "C2", "user_id": "U7", "trigger_id": "T1",
+        }).encode()
+        headers = {**signed(body), "Content-Type": "application/x-www-form-urlencoded"}
+        assert http.post("/slack/commands", content=body, headers=headers).json()["response_type"] == "ephemeral"
+
+        deadline = time.time() + 3
+        while handler.counts["answered"] < 2 and time.time() < deadline:
+            time.sleep(0.02)
+
+    finals = {call[1]["channel"]: call[1]["text"] for call in client.calls if call[0] == "update"}
+    assert finals["C1"].startswith("Rest and drink fluids.")
+    assert finals["C2"] == "<@U7> asked: Is ibuprofen safe?\nRest and drink fluids. (Is ibuprofen safe?)"
+
+
+def test_failed_busy_notice_and_answer_are_counted():
+    class FailingClient(FakeClient):
+        async def chat_postMessage(self, **kwargs):
+            raise RuntimeError("channel_not_found")
+
+    async def run():
+        sender = SlackSender(FailingClient(), max_retries=0)
+        # Both the busy notice and the accepted question's placeholder fail to post
+        handler = SlackQuestionHandler(answer, sender, SECRET, max_queue=1)
+        handler.handle_event(mention("Ev1", ts="1.0"))
+        handler.handle_event(mention("Ev2", ts="2.0"))
+        handler.start()
+        await handler.join()
+        await sender.flush()
+        await asyncio.sleep(0)  # let the notice's done-callback run
+        await handler.aclose()
+        return handler.counts
+
+    counts = asyncio.run(run())
+    assert counts["rejected"] == 1 and counts["busy_notices_failed"] == 1
+    assert counts["failed"] == 1 and counts["answered"] == 0
@@ -0,0 +1,184 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# Add project root to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.messaging.slack_sender import SlackSender, TokenBucket
+from src.monitoring.monitor import PipelineMonitor
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class FakeSlackError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.response = FakeResponse(status_code, headers)
+
+
+class FakeClient:
+    def __init__(self, failures=()):
+        self.calls = []
+        self.failures = list(failures)
+
+    async def _call(self, method, kwargs):
+        self.calls.append((method, time.monotonic(), kwargs))
+        if self.failures:
+            raise self.failures.pop(0)
+        return {"ok": True, "ts": f"{len(self.calls)}.0"}
+
+    async def chat_postMessage(self, **kwargs):
+        return await self._call("post", kwargs)
+
+    async def chat_update(self, **kwargs):
+        return await self._call("update", kwargs)
+
+
+def test_token_bucket_allows_a_burst_then_the_rate():
+    async def run():
+        bucket = TokenBucket(rate=20, burst=2)
+        begin = time.monotonic()
+        for _ in range(4):
+            await bucket.acquire()
+        return time.monotonic() - begin
+
+    assert 0.08 <= asyncio.run(run()) < 0.2
+
+
+def test_burst_is_coalesced_and_post_does_not_wait():
+    client = FakeClient()
+
+    async def run():
+        sender = SlackSender(client, rate_per_channel=20, burst=1, max_coalesce=3)
+        begin = time.perf_counter()
+        futures = [sender.post("C1", f"alert {i}") for i in range(7)] + [sender.post("C1", "reply", thread_ts="9.0")]
+        queued_in = time.perf_counter() - begin
+        responses = await asyncio.gather(*futures)
+        await sender.aclose()
+        return queued_in, responses, sender.stats()
+
+    queued_in, responses, stats = asyncio.run(run())
+    assert queued_in < 0.01
+    assert [call[2]["text"] for call in client.calls] == [
+        "alert 0\nalert 1\nalert 2", "alert 3\nalert 4\nalert 5", "alert 6", "reply"
+    ]
+    assert client.calls[-1][2]["thread_ts"] == "9.0"
+    # One message per 50ms after the first
+    assert client.calls[-1][1] - client.calls[0][1] >= 0.14
+    assert responses[0] is responses[2] and responses[0]["ts"] == "1.0"
+    assert stats == {"sent": 4, "coalesced": 4, "failed": 0, "dropped": 0, "retries": 0, "rate_limited": 0, "queued": 0}
+
+
+def test_retry_after_is_honoured_and_server_errors_retried():
+    client = FakeClient([FakeSlackError(429, {"Retry-After": "0.3"}), FakeSlackError(503)])
+
+    async def run():
+        sender = SlackSender(client, rate_per_channel=100, backoff=0.01)
+        response = await sender.post("C1", "hello")
+        return response, sender.stats()
+
+    response, stats = asyncio.run(run())
+    assert response["ok"]
+    assert len(client.calls) == 3
+    assert client.calls[1][1] - client.calls[0][1] >= 0.3
+    assert stats["retries"] == 2 and stats["rate_limited"] == 1
+
+
+def test_client_errors_fail_without_retry():
+    client = FakeClient([FakeSlackError(404)])
+    prometheus_client = pytest.importorskip("prometheus_client")
+    registry = prometheus_client.CollectorRegistry()
+
+    async def run():
+        sender = SlackSender(client, monitor=PipelineMonitor(registry))
+        with pytest.raises(FakeSlackError):
+            await sender.post("C404", "hello")
+        await sender.post("C1", "hello")
+        return sender.stats()
+
+    stats = asyncio.run(run())
+    assert len(client.calls) == 2 and stats["failed"] == 1
+    assert registry.get_sample_value("message_deliveries_total", {"transport": "slack", "status": "failed"}) == 1
+    assert registry.get_sample_value("message_deliveries_total", {"transport": "slack", "status": "sent"}) == 1
+    assert registry.get_sample_value("message_delivery_seconds_count", {"transport": "slack"}) == 1
+
+
+def test_queued_edits_collapse_to_the_latest_text():
+    client = FakeClient()
+
+    async def run():
+        sender = SlackSender(client, rate_per_channel=10, burst=1)
+        posted = await sender.post("C1", "Thinking...")
+        edits = [sender.update("C1", posted["ts"], "Answer" + "." * i) for i in range(1, 5)]
+        await asyncio.gather(*edits)
+        return sender.stats()
+
+    stats = asyncio.run(run())
+    assert [(call[0], call[2]["text"]) for call in client.calls] == [("post", "Thinking..."), ("update", "Answer....")]
+    assert client.calls[1][2]["ts"] == "1.0"
+    assert stats["coalesced"] == 3
+
+
+def test_full_queue_drops_instead_of_waiting():
+    async def run():
+        sender = SlackSender(FakeClient(), max_queue=1)
+        first, second = sender.post("C1", "one"), sender.post("C1", "two")
+        return await first, await second, sender.stats()["dropped"]
+
+    first, second, dropped = asyncio.run(run())
+    assert first["ok"] and second is None and dropped == 1
+
+
+class _FakeSlackHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.requests.append((self.path, time.monotonic(), body))
+        if len(self.server.requests) == 1:
+            status, payload, headers = 429, {"ok": False, "error": "ratelimited"}, {"Retry-After": "1"}
+        else:
+            status, payload, headers = 200, {"ok": True, "channel": "C1", "ts": "1700000000.000100"}, {}
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        for name, value in {**headers, "Content-Type": "application/json", "Content-Length": str(len(data))}.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_slack_integration_against_a_local_fake_slack():
+    pytest.importorskip("slack_sdk")
+    pytest.importorskip("aiohttp")
+    from src.messaging.slack_integration import SlackIntegration
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeSlackHandler)
+    server.requests = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        async def run():
+            slack = SlackIntegration("xoxb-test", base_url=f"http://127.0.0.1:{server.server_port}/api/")
+            response = await slack.post_message("C1", "Daily summary")
+            await slack.aclose()
+            return response
+
+        response = asyncio.run(run())
+    finally:
+        server.shutdown()
+    assert response["ts"] == "1700000000.000100"
+    assert [path for path, _, _ in server.requests] == ["/api/chat.postMessage"] * 2
+    assert server.requests[1][1] - server.requests[0][1] >= 1.0
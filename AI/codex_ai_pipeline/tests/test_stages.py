@@ -0,0 +1,60 @@
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+# Add project root to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.pipeline.stages import ClientDisconnected, StageRunner, StageTimeoutError, run_until_disconnected
+
+
+def test_blocking_stages_do_not_block_the_loop():
+    runner = StageRunner(max_workers=4)
+
+    async def run():
+        started = time.perf_counter()
+        await asyncio.gather(*(runner.run_blocking("retrieval", time.sleep, 0.2) for _ in range(4)))
+        return time.perf_counter() - started
+
+    try:
+        assert asyncio.run(run()) < 0.6
+    finally:
+        runner.close()
+
+
+def test_stage_timeout():
+    runner = StageRunner(timeouts={"agents": 0.05})
+
+    with pytest.raises(StageTimeoutError) as excinfo:
+        asyncio.run(runner.run("agents", asyncio.sleep(1)))
+    assert excinfo.value.stage == "agents"
+    runner.close()
+
+
+def test_work_is_cancelled_when_client_disconnects():
+    cancelled = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def run():
+        polls = []
+
+        async def is_disconnected():
+            polls.append(1)
+            return len(polls) >= 2
+
+        with pytest.raises(ClientDisconnected):
+            await run_until_disconnected(slow(), is_disconnected, poll_interval=0.01)
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+    assert cancelled == [True]
+
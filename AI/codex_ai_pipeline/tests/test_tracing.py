@@ -0,0 +1,192 @@
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+
+# Add project root to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.monitoring.tracing import (
+    JsonLinesSpanExporter, SpanContext, Tracer, add_tracing, current_span, format_traceparent, get_tracer,
+    parse_traceparent,
+)
+from src.llm.router import ProviderRouter, RouterSettings
+from src.pipeline.stages import StageRunner
+
+
+class FakeProvider:
+    def __init__(self, name, delay=0.0):
+        self.name = name
+        self.label = name.title()
+        self.delay = delay
+        self.available = True
+
+    async def complete(self, prompt, **kwargs):
+        await asyncio.sleep(self.delay)
+        return f"{self.name}: {prompt}"
+
+    async def stream(self, prompt, **kwargs):
+        for word in prompt.split():
+            yield word
+
+
+def test_spans_nest_across_tasks_and_threads():
+    tracer = Tracer()
+    stages = StageRunner(max_workers=2)
+
+    def blocking():
+        with tracer.span("blocking"):
+            pass
+
+    async def child():
+        with tracer.span("child"):
+            await stages.run_blocking("retrieval", blocking)
+
+    async def run():
+        with tracer.span("root") as root:
+            await asyncio.ensure_future(child())
+        return root
+
+    root = asyncio.run(run())
+    stages.close()
+    spans = {s.name: s for s in tracer.memory.spans(root.trace_id)}
+    assert spans["root"].parent_id is None
+    assert spans["child"].parent_id == root.span_id
+    assert spans["blocking"].parent_id == spans["child"].span_id
+
+
+def test_span_records_errors_and_file_export(tmp_path):
+    path = tmp_path / "traces" / "spans.jsonl"
+    exporter = JsonLinesSpanExporter(str(path))
+    tracer = Tracer(exporters=[exporter])
+
+    with pytest.raises(ValueError):
+        with tracer.span("outer", kind="test"):
+            raise ValueError("bad input")
+    exporter.close()
+
+    (record,) = [json.loads(line) for line in path.read_text().splitlines()]
+    assert record["name"] == "outer"
+    assert record["status"] == "error"
+    assert record["error"] == "ValueError: bad input"
+    assert record["attributes"] == {"kind": "test"}
+    assert record["duration_ms"] >= 0
+
+
+def test_traced_generator_span_is_current_only_while_it_runs():
+    tracer = Tracer()
+    seen = []
+
+    @tracer.traced("words")
+    async def words():
+        for word in ("a", "b", "c"):
+            with tracer.span("word"):
+                seen.append(current_span().parent_id)
+            yield word
+
+    async def run():
+        with tracer.span("consumer") as consumer:
+            stream = words()
+            assert await stream.__anext__() == "a"
+            # Between yields the consumer's own span is current
+            assert current_span() is consumer
+            # Closing from another task (another context) must not fail on the span reset
+            await asyncio.get_running_loop().create_task(stream.aclose())
+            assert current_span() is consumer
+        return consumer
+
+    consumer = asyncio.run(run())
+    spans = {s.name: s for s in tracer.memory.spans()}
+    assert spans["words"].parent_id == consumer.span_id
+    assert spans["words"].status == "cancelled"
+    assert seen == [spans["words"].span_id]
+
+
+def test_traceparent_round_trip():
+    context = SpanContext("4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7")
+    assert parse_traceparent(format_traceparent(context)) == context
+    assert parse_traceparent(None) is None
+    assert parse_traceparent("00-xyz-00f067aa0ba902b7-01") is None
+    assert parse_traceparent("00-" + "0" * 32 + "-00f067aa0ba902b7-01") is None
+
+
+def test_hedged_provider_calls_are_traced():
+    router = ProviderRouter(
+        [FakeProvider("slow", delay=0.5), FakeProvider("fast")],
+        RouterSettings(hedge=True, hedge_delay=0.01),
+    )
+    tracer = get_tracer()
+
+    async def run():
+        with tracer.span("request") as root:
+            assert await router.complete("hi") == "fast: hi"
+            assert [w async for w in router.stream("a b")] == ["a", "b"]
+        return root
+
+    root = asyncio.run(run())
+    spans = tracer.memory.spans(root.trace_id)
+    attempts = {s.attributes["provider"]: s for s in spans if s.name == "llm.complete"}
+    assert attempts["fast"].status == "ok"
+    assert attempts["slow"].status == "cancelled"
+    (stream,) = [s for s in spans if s.name == "llm.stream"]
+    assert stream.parent_id == root.span_id
+    assert "time_to_first_token_ms" in stream.attributes
+
+
+def test_trace_headers_and_route():
+    pytest.importorskip("fastapi")
+    pytest.importorskip("httpx")
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    tracer = Tracer()
+    app = FastAPI()
+    add_tracing(app, tracer, serve_traces=True)
+
+    @app.get("/work")
+    async def work():
+        with tracer.span("stage"):
+            return {"ok": True}
+
+    client = TestClient(app)
+    incoming = SpanContext("4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7")
+    response = client.get("/work", headers={"traceparent": format_traceparent(incoming)})
+    assert response.headers["X-Trace-Id"] == incoming.trace_id
+    assert response.headers["traceparent"].startswith(f"00-{incoming.trace_id}-")
+
+    spans = client.get(f"/traces/{incoming.trace_id}").json()["spans"]
+    assert [s["name"] for s in spans] == ["http GET /work", "stage"]
+    assert spans[0]["parent_id"] == incoming.span_id
+    assert spans[0]["attributes"]["http.status_code"] == 200
+    assert client.get("/traces/" + "f" * 32).status_code == 404
+
+
+def test_request_span_covers_streamed_body_and_traces_route_is_opt_in(monkeypatch):
+    pytest.importorskip("fastapi")
+    pytest.importorskip("httpx")
+    from fastapi import FastAPI
+    from fastapi.responses import StreamingResponse
+    from fastapi.testclient import TestClient
+
+    monkeypatch.delenv("TRACES_ENDPOINT", raising=False)
+    tracer = Tracer()
+    app = FastAPI()
+    add_tracing(app, tracer)
+
+    @app.get("/stream")
+    async def stream():
+        async def body():
+            for part in ("a", "b"):
+                await asyncio.sleep(0.05)
+                yield part
+        return StreamingResponse(body())
+
+    client = TestClient(app)
+    response = client.get("/stream")
+    assert response.text == "ab"
+
+    (request_span,) = tracer.memory.spans(response.headers["X-Trace-Id"])
+    assert request_span.duration_ms >= 100
+    assert client.get(f"/traces/{request_span.trace_id}").status_code == 404
@@ -0,0 +1,134 @@
+import asyncio
+import io
+import os
+import sys
+import time
+import wave
+
+import pytest
+
+# Add project root to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.voice.tts import AudioCache, SentenceBuffer, StreamingSynthesizer, WaveformEngine, split_sentences
+from src.voice.voice_processor import VoiceProcessor
+
+
+class FakeWhisper:
+    def transcribe(self, audio, fp16=False):
+        return {"text": ""}
+
+
+class CountingEngine(WaveformEngine):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.calls = []
+
+    def synthesize(self, text, voice):
+        self.calls.append(text)
+        return super().synthesize(text, voice)
+
+
+def test_split_sentences_keeps_abbreviations_and_decimals():
+    text = "Take 2.5 mg twice a day. Call Dr. Patel if the pain gets worse! Avoid e.g. ibuprofen.\n1. Rest\n2. Drink water"
+    assert split_sentences(text) == [
+        "Take 2.5 mg twice a day.",
+        "Call Dr. Patel if the pain gets worse!",
+        "Avoid e.g. ibuprofen.",
+        "1. Rest",
+        "2. Drink water",
+    ]
+
+
+def test_no_and_numbers_end_sentences():
+    assert split_sentences("The answer is no. Rest today.") == ["The answer is no.", "Rest today."]
+    assert split_sentences("The dose is 10. Repeat in 4 hours.") == ["The dose is 10.", "Repeat in 4 hours."]
+    # A number before a digit or a lowercase word does not end the sentence
+    assert split_sentences("Take 5. 5 mg more, or page 3. see below.") == ["Take 5. 5 mg more, or page 3. see below."]
+
+
+def test_sentence_after_a_number_is_released_once_the_next_word_arrives():
+    buffer = SentenceBuffer()
+    assert buffer.feed("Take 5. ") == []
+    assert buffer.feed("Then rest. ") == ["Take 5.", "Then rest."]
+
+
+def test_sentence_buffer_waits_for_whitespace_after_terminator():
+    buffer = SentenceBuffer()
+    out = []
+    for delta in ["Take 2", ".5 mg", " daily.", " Rest", " well.", ""]:
+        out += buffer.feed(delta)
+    assert out == ["Take 2.5 mg daily."]
+    assert buffer.flush() == ["Rest well."]
+
+
+def test_waveform_engine_is_deterministic_wav():
+    engine = WaveformEngine()
+    audio = engine.synthesize("rest and fluids", "default")
+    assert audio == engine.synthesize("rest and fluids", "default")
+    with wave.open(io.BytesIO(audio)) as wav:
+        assert wav.getnframes() / wav.getframerate() == pytest.approx(0.9, abs=0.01)
+
+
+def test_cache_serves_repeats_and_keys_on_voice(tmp_path):
+    engine = CountingEngine()
+    synthesizer = StreamingSynthesizer(engine, AudioCache(str(tmp_path)))
+
+    first, cached = synthesizer.synthesize("Keep the wound dry.")
+    assert not cached
+    again, cached = synthesizer.synthesize("Keep  the wound dry. ")
+    assert cached and again == first
+    _, cached = synthesizer.synthesize("Keep the wound dry.", voice="other")
+    assert not cached
+    assert len(engine.calls) == 2
+    # A new cache over the same directory (another worker) sees the clips too
+    assert StreamingSynthesizer(engine, AudioCache(str(tmp_path))).synthesize("Keep the wound dry.")[1]
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = AudioCache(str(tmp_path), max_bytes=250)
+    cache.put("a", "wav", b"a" * 100)
+    time.sleep(0.01)
+    cache.put("b", "wav", b"b" * 100)
+    time.sleep(0.01)
+    assert cache.get("a", "wav") is not None  # "a" is now the most recently used
+    time.sleep(0.01)
+    cache.put("c", "wav", b"c" * 100)
+
+    assert cache.get("b", "wav") is None
+    assert cache.get("a", "wav") is not None and cache.get("c", "wav") is not None
+    assert cache.stats()["bytes"] == 200
+    cache.put("huge", "wav", b"x" * 1000)  # larger than the cache; not stored
+    assert cache.get("huge", "wav") is None
+
+
+def test_stream_pipelines_sentences_in_order(tmp_path):
+    voice = VoiceProcessor(
+        whisper_model=FakeWhisper(),
+        tts_engine=WaveformEngine(delay=0.2),
+        tts_cache=AudioCache(str(tmp_path)),
+        tts_workers=3,
+    )
+    text = "Rest today. Drink plenty of water. Take your antibiotics with food. Come back on Monday."
+
+    async def deltas():
+        for word in text.split(" "):
+            yield word + " "
+            await asyncio.sleep(0)
+
+    async def run():
+        begin = time.perf_counter()
+        events = [event async for event in voice.stream_text_to_speech(deltas())]
+        return events, time.perf_counter() - begin
+
+    events, elapsed = asyncio.run(run())
+    assert [e["text"] for e in events[:-1]] == split_sentences(text)
+    assert [e["sentence"] for e in events[:-1]] == [0, 1, 2, 3]
+    assert events[-1] == {"type": "end", "sentences": 4, "cached": 0}
+    # Four 0.2s syntheses overlap on three workers
+    assert elapsed < 0.6
+
+    events, elapsed = asyncio.run(run())
+    assert events[-1]["cached"] == 4
+    assert elapsed < 0.1
+    assert voice.text_to_speech("Rest today.") == events[0]["audio"]
@@ -0,0 +1,92 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+# Add project root to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+np = pytest.importorskip("numpy")
+
+from src.rag.vector_search import VectorSearch, normalize_query
+
+
+class UncasedTokenizer:
+    do_lower_case = True
+
+
+class CountingEmbedder:
+    def __init__(self, tokenizer=None):
+        self.calls = []
+        self.tokenizer = tokenizer
+
+    def encode(self, texts):
+        self.calls.append(list(texts))
+        return np.array([[len(t), t.count("a")] for t in texts], dtype="float32")
+
+
+class FakeCollection:
+    def __init__(self):
+        self.calls = []
+
+    def query(self, query_embeddings, n_results):
+        self.calls.append(query_embeddings)
+        return {
+            "ids": [[f"doc-{int(e[0])}"] for e in query_embeddings],
+            "documents": [[f"text {int(e[0])}"] for e in query_embeddings],
+            "distances": [[0.1] for _ in query_embeddings],
+            "embeddings": None,
+            "included": ["documents", "distances"],
+        }
+
+
+def _search(tokenizer=None):
+    embedder, collection = CountingEmbedder(tokenizer), FakeCollection()
+    return VectorSearch(embedder=embedder, collection=collection), embedder, collection
+
+
+def test_normalize_query():
+    assert normalize_query("  What IS\n hypertension ") == "What IS hypertension"
+    assert normalize_query("  What IS\n hypertension ", lowercase=True) == "what is hypertension"
+
+
+def test_embeddings_are_cached_by_normalized_text():
+    search, embedder, _ = _search(UncasedTokenizer())
+    search.search("What is hypertension")
+    search.search("what is   HYPERTENSION")
+
+    assert embedder.calls == [["what is hypertension"]]
+    assert search.embedding_cache.stats()["hits"] == 1
+
+
+def test_case_is_kept_for_cased_embedders():
+    search, embedder, _ = _search()
+    search.search("What is  HbA1c")
+    search.search("what is hba1c")
+
+    assert embedder.calls == [["What is HbA1c"], ["what is hba1c"]]
+
+
+def test_search_many_uses_one_encode_and_one_query():
+    search, embedder, collection = _search()
+    search.search("aa")
+    results = search.search_many(["aa", "bbb", "aa", "c"])
+
+    assert embedder.calls == [["aa"], ["bbb", "c"]]
+    assert len(collection.calls) == 2
+    assert [r["ids"] for r in results] == [[["doc-2"]], [["doc-3"]], [["doc-2"]], [["doc-1"]]]
+    assert results[0]["embeddings"] is None
+    assert all(r["included"] == ["documents", "distances"] for r in results)
+
+
+def test_concurrent_asearch_calls_are_batched():
+    search, embedder, collection = _search()
+
+    async def run():
+        return await asyncio.gather(*(search.asearch(q) for q in ["a", "bb", "ccc"]))
+
+    results = asyncio.run(run())
+    assert [r["ids"] for r in results] == [[["doc-1"]], [["doc-2"]], [["doc-3"]]]
+    assert len(collection.calls) == 1
+    assert len(embedder.calls) == 1
@@ -0,0 +1,101 @@
+import io
+import os
+import sys
+import tarfile
+
+import pytest
+
+# Add project root to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.rag import vector_store
+
+
+def _tree(root):
+    files = {}
+    for folder, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(folder, name)
+            with open(path, "rb") as f:
+                files[os.path.relpath(path, root)] = f.read()
+    return files
+
+
+def test_snapshot_restore_round_trip(tmp_path):
+    store = tmp_path / "chroma"
+    (store / "segment").mkdir(parents=True)
+    (store / "chroma.sqlite3").write_bytes(b"index v1")
+    (store / "segment" / "data.bin").write_bytes(b"\x00\x01")
+    before = _tree(store)
+
+    archive = vector_store.snapshot(str(tmp_path / "backups" / "index.tar.gz"), str(store))
+    (store / "chroma.sqlite3").write_bytes(b"index v2")
+    (store / "extra").write_bytes(b"added after the snapshot")
+
+    assert vector_store.restore(archive, str(store)) == str(store)
+    assert _tree(store) == before
+    # The replaced directory is kept until the next restore
+    assert (tmp_path / "chroma.bak" / "extra").exists()
+
+
+@pytest.mark.parametrize("name", ["../escaped", "/tmp/absolute-escape", "chroma/../../escaped"])
+def test_restore_rejects_members_outside_the_store(tmp_path, name):
+    store = tmp_path / "data" / "chroma"
+    store.mkdir(parents=True)
+    (store / "chroma.sqlite3").write_bytes(b"current")
+    archive = tmp_path / "evil.tar.gz"
+    with tarfile.open(archive, "w:gz") as tar:
+        payload = b"overwritten"
+        member = tarfile.TarInfo(name)
+        member.size = len(payload)
+        tar.addfile(member, io.BytesIO(payload))
+
+    with pytest.raises((ValueError, tarfile.TarError)):
+        vector_store.restore(str(archive), str(store))
+    assert not (tmp_path / "escaped").exists() and not (tmp_path / "data" / "escaped").exists()
+    assert (store / "chroma.sqlite3").read_bytes() == b"current"
+    assert sorted(os.listdir(tmp_path / "data")) == ["chroma"]  # no staging directory left behind
+
+
+def test_restore_checks_members_without_tar_filters(tmp_path, monkeypatch):
+    # Pythons before 3.11.4 have no extraction filters
+    monkeypatch.delattr(tarfile, "data_filter", raising=False)
+    test_restore_rejects_members_outside_the_store(tmp_path, "../escaped")
+    test_snapshot_restore_round_trip(tmp_path / "round-trip")
+
+
+def test_restore_rejects_symlinks(tmp_path):
+    store = tmp_path / "chroma"
+    store.mkdir()
+    archive = tmp_path / "link.tar.gz"
+    with tarfile.open(archive, "w:gz") as tar:
+        link = tarfile.TarInfo("chroma/link")
+        link.type = tarfile.SYMTYPE
+        link.linkname = "/etc/passwd"
+        tar.addfile(link)
+
+    with pytest.raises((ValueError, tarfile.TarError)):
+        vector_store.restore(str(archive), str(store))
+
+
+def test_collection_built_with_another_embedding_model_is_rejected(tmp_path):
+    pytest.importorskip("chromadb")
+    persist_dir = str(tmp_path / "chroma")
+    collection = vector_store.get_collection(persist_dir, embedding_model="model-a")
+    assert collection.metadata["embedding_model"] == "model-a"
+    assert vector_store.get_collection(persist_dir, embedding_model="model-a").name == collection.name
+
+    with pytest.raises(ValueError, match="model-a"):
+        vector_store.get_collection(persist_dir, embedding_model="model-b")
+
+
+def test_restore_refuses_a_store_open_in_this_process(tmp_path, monkeypatch):
+    store = tmp_path / "chroma"
+    store.mkdir()
+    (store / "chroma.sqlite3").write_bytes(b"index v1")
+    archive = vector_store.snapshot(str(tmp_path / "index.tar.gz"), str(store))
+    monkeypatch.setitem(vector_store._clients, str(store), object())
+
+    with pytest.raises(RuntimeError, match="open in this process"):
+        vector_store.restore(archive, str(store))
+    assert not (tmp_path / "chroma.bak").exists()
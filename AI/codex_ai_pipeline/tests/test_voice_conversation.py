@@ -0,0 +1,113 @@
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+import pytest
+
+# Add project root to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.voice.conversation import VoiceConversation
+from src.voice.streaming import SAMPLE_RATE
+from src.voice.tts import AudioCache, WaveformEngine
+from src.voice.voice_processor import VoiceProcessor
+
+
+def tone(seconds, amplitude=0.3):
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    return (amplitude * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+
+def silence(seconds):
+    return np.zeros(int(seconds * SAMPLE_RATE), dtype=np.float32)
+
+
+def pcm16(samples):
+    return (samples * 32767).astype("<i2").tobytes()
+
+
+class FakeWhisper:
+    def transcribe(self, audio, fp16=False):
+        time.sleep(0.05)
+        return {"text": "How long do I rest?" if len(audio) > SAMPLE_RATE else "Thanks."}
+
+
+async def answer(query):
+    # First sentence quickly, the rest after a pause as a slow model would
+    yield {"type": "delta", "text": f"You asked: {query} Rest"}
+    yield {"type": "delta", "text": " for two days. "}
+    await asyncio.sleep(0.3)
+    yield {"type": "delta", "text": "Then walk a little."}
+    yield {"type": "done", "response": f"You asked: {query} Rest for two days. Then walk a little."}
+
+
+def make_voice(tmp_path):
+    return VoiceProcessor(
+        whisper_model=FakeWhisper(),
+        tts_engine=WaveformEngine(delay=0.05),
+        tts_cache=AudioCache(str(tmp_path)),
+    )
+
+
+# Two utterances: a question and a short reply
+RECORDING = np.concatenate([silence(0.3), tone(1.2), silence(0.6), tone(0.4), silence(0.6)])
+
+
+def test_conversation_answers_each_utterance_and_reports_latency(tmp_path):
+    conversation = VoiceConversation(make_voice(tmp_path), answer)
+
+    async def run():
+        events = []
+        async for event in conversation.run(pcm16(RECORDING)):
+            events.append((event, time.perf_counter()))
+        return events
+
+    events = asyncio.run(run())
+    types = [event["type"] for event, _ in events]
+    assert types == ["transcript", "audio", "audio", "audio", "turn_end"] * 2 + ["end"]
+
+    first_turn = [event for event, _ in events[:5]]
+    assert first_turn[0]["text"] == "How long do I rest?"
+    assert [e["text"] for e in first_turn[1:4]] == [
+        "You asked: How long do I rest?", "Rest for two days.", "Then walk a little."
+    ]
+    latency = first_turn[4]["latency"]
+    assert set(latency) >= {"end_of_utterance_ms", "stt_ms", "llm_first_token_ms", "first_audio_ms", "mouth_to_ear_ms"}
+    assert latency["mouth_to_ear_ms"] == pytest.approx(400 + latency["first_audio_ms"], abs=0.2)
+    assert latency["within_target"]
+    assert first_turn[4]["response"].endswith("Then walk a little.")
+    # The first sentences were sent while the model was still generating the last one
+    assert events[3][1] - events[2][1] > 0.2
+
+    assert events[5][0]["text"] == "Thanks."
+    assert events[-1][0] == {"type": "end", "turns": 2}
+
+
+def test_voice_websocket(tmp_path):
+    pytest.importorskip("httpx")
+    from fastapi.testclient import TestClient
+
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'api'))
+    import main
+
+    with TestClient(main.app) as client:
+        pipeline = main.app.state.pipeline
+        pipeline.__dict__["voice_processor"] = make_voice(tmp_path)
+        pipeline.stream_query = answer
+        with client.websocket_connect("/voice") as ws:
+            data = pcm16(RECORDING[:int(2.1 * SAMPLE_RATE)])
+            for start in range(0, len(data), 8000):
+                ws.send_bytes(data[start:start + 8000])
+            ws.send_json({"type": "end"})
+
+            assert ws.receive_json()["type"] == "transcript"
+            for _ in range(3):
+                header = ws.receive_json()
+                audio = ws.receive_bytes()
+                assert header["type"] == "audio" and header["format"] == "wav"
+                assert header["bytes"] == len(audio) and audio[:4] == b"RIFF"
+            assert ws.receive_json()["type"] == "turn_end"
+            assert ws.receive_json() == {"type": "end", "turns": 1}
+        del pipeline.stream_query
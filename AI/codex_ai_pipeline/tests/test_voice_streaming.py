@@ -0,0 +1,172 @@
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+import pytest
+
+# Add project root to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.voice.streaming import SAMPLE_RATE, PCM16Decoder, Segmenter, StreamingTranscriber
+from src.voice.tts import AudioCache
+from src.voice.voice_processor import VoiceProcessor
+
+
+def tone(seconds, amplitude=0.3):
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    return (amplitude * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+
+def silence(seconds):
+    return np.zeros(int(seconds * SAMPLE_RATE), dtype=np.float32)
+
+
+def pcm16(samples):
+    return (samples * 32767).astype("<i2").tobytes()
+
+
+# Two utterances (1.0s and 0.5s) separated by silence, plus a 30ms click
+RECORDING = np.concatenate([silence(0.5), tone(1.0), silence(1.0), tone(0.03), silence(1.0), tone(0.5), silence(0.2)])
+
+
+class FakeWhisper:
+    def transcribe(self, audio, fp16=False):
+        # Longer segments take longer, so later segments can finish first
+        seconds = len(audio) / SAMPLE_RATE
+        time.sleep(0.2 if seconds > 1.5 else 0.01)
+        return {"text": f" {seconds:.1f}s "}
+
+
+def test_decoder_carries_split_samples():
+    data = pcm16(tone(0.01))
+    decoder = PCM16Decoder()
+    parts = [decoder.decode(data[:3]), decoder.decode(data[3:7]), decoder.decode(data[7:])]
+    np.testing.assert_array_equal(np.concatenate(parts), PCM16Decoder().decode(data))
+
+
+def test_segmenter_cuts_on_silence_and_ignores_clicks():
+    segmenter = Segmenter()
+    segments = segmenter.push(RECORDING) + segmenter.flush()
+
+    assert [s.index for s in segments] == [0, 1]
+    first, second = segments
+    # 200ms pre-roll before the onset, 500ms of trailing silence after the offset
+    assert first.start == pytest.approx(0.3, abs=0.03)
+    assert first.end == pytest.approx(2.0, abs=0.03)
+    assert second.start == pytest.approx(3.33, abs=0.03)
+
+
+def test_long_speech_is_cut_at_max_segment():
+    segmenter = Segmenter(max_segment_s=1.0)
+    segments = segmenter.push(tone(2.5)) + segmenter.flush()
+    assert len(segments) == 3
+    assert max(len(s.audio) for s in segments) <= SAMPLE_RATE
+
+
+def test_streaming_yields_partials_in_order_then_final(tmp_path):
+    voice = VoiceProcessor(whisper_model=FakeWhisper(), tts_cache=AudioCache(str(tmp_path)))
+    data = pcm16(RECORDING)
+
+    async def chunks():
+        for start in range(0, len(data), 3001):  # odd size splits samples
+            yield data[start:start + 3001]
+            await asyncio.sleep(0)
+
+    async def run():
+        return [event async for event in voice.stream_speech_to_text(chunks())]
+
+    events = asyncio.run(run())
+    assert [e["type"] for e in events] == ["partial", "partial", "final"]
+    assert [e["segment"] for e in events[:2]] == [0, 1]
+    assert events[-1] == {"type": "final", "text": "1.7s 0.9s", "segments": 2}
+
+
+def test_transcription_overlaps_with_reading():
+    started = []
+
+    def transcribe(audio):
+        started.append(time.perf_counter())
+        time.sleep(0.2)
+        return "x"
+
+    async def chunks():
+        for _ in range(3):
+            yield tone(0.5)
+            yield silence(0.6)
+
+    async def run():
+        transcriber = StreamingTranscriber(transcribe, max_pending=4)
+        begin = time.perf_counter()
+        events = [event async for event in transcriber.stream(chunks())]
+        return events, time.perf_counter() - begin
+
+    events, elapsed = asyncio.run(run())
+    assert len(events) == 4
+    # Three 0.2s transcriptions on the default pool run concurrently
+    assert elapsed < 0.5
+
+
+def test_transcribe_websocket(tmp_path):
+    pytest.importorskip("httpx")
+    from fastapi.testclient import TestClient
+
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'api'))
+    import main
+
+    with TestClient(main.app) as client:
+        main.app.state.pipeline.__dict__["voice_processor"] = VoiceProcessor(
+            whisper_model=FakeWhisper(), tts_cache=AudioCache(str(tmp_path))
+        )
+        with client.websocket_connect("/ws/transcribe") as ws:
+            data = pcm16(RECORDING)
+            for start in range(0, len(data), 8000):
+                ws.send_bytes(data[start:start + 8000])
+            ws.send_json({"type": "end"})
+            events = [ws.receive_json() for _ in range(3)]
+    assert [e["type"] for e in events] == ["partial", "partial", "final"]
+    assert events[-1]["text"] == "1.7s 0.9s"
+
+
+def test_segments_never_run_concurrently_on_one_model(tmp_path):
+    class ReentrancyCheckingWhisper:
+        def __init__(self):
+            self.active = self.max_active = 0
+
+        def transcribe(self, audio, fp16=False):
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            time.sleep(0.02)
+            self.active -= 1
+            return {"text": "ok"}
+
+    model = ReentrancyCheckingWhisper()
+    # Two processors sharing the registry's model, each with several workers
+    voices = [VoiceProcessor(whisper_model=model, stt_workers=4, tts_cache=AudioCache(str(tmp_path))) for _ in range(2)]
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        return await asyncio.gather(*[
+            loop.run_in_executor(voice.stt_executor, voice.transcribe_segment, silence(0.1))
+            for voice in voices for _ in range(4)
+        ])
+
+    assert asyncio.run(run()) == ["ok"] * 8
+    assert model.max_active == 1
+
+
+def test_model_locks_are_dropped_with_the_model():
+    import gc
+
+    from src.voice import voice_processor
+
+    model = FakeWhisper()
+    lock = voice_processor._model_lock(model)
+    assert voice_processor._model_lock(model) is lock
+    assert voice_processor._model_lock(FakeWhisper()) is not lock
+
+    before = len(voice_processor._model_locks)
+    del model
+    gc.collect()
+    assert len(voice_processor._model_locks) < before
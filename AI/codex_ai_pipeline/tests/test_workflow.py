@@ -0,0 +1,138 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+# Add project root to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.agents.workflow import WorkflowStep, run_workflow
+
+
+def _sleeper(value, delay, log):
+    async def run(inputs):
+        log.append(("start", value))
+        await asyncio.sleep(delay)
+        log.append(("end", value))
+        return value if not inputs else f"{value}({','.join(sorted(inputs.values()))})"
+    return run
+
+
+def test_independent_steps_run_concurrently_then_join():
+    log = []
+    steps = [
+        WorkflowStep("a", _sleeper("a", 0.1, log)),
+        WorkflowStep("b", _sleeper("b", 0.1, log)),
+        WorkflowStep("c", _sleeper("c", 0.0, log), depends_on=("a", "b")),
+    ]
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        results = await run_workflow(steps)
+        return results, loop.time() - started
+
+    results, elapsed = asyncio.run(run())
+    assert results["c"] == "c(a,b)"
+    assert elapsed < 0.18
+    assert log.index(("start", "c")) > log.index(("end", "a"))
+
+
+def test_concurrency_cap():
+    log = []
+    steps = [WorkflowStep(str(i), _sleeper(str(i), 0.02, log)) for i in range(4)]
+    asyncio.run(run_workflow(steps, max_concurrency=1))
+    # With one slot, every step finishes before the next starts
+    assert [kind for kind, _ in log] == ["start", "end"] * 4
+
+
+def test_invalid_graphs_are_rejected():
+    noop = _sleeper("x", 0, [])
+    with pytest.raises(ValueError, match="cycle"):
+        asyncio.run(run_workflow([
+            WorkflowStep("a", noop, depends_on=("b",)),
+            WorkflowStep("b", noop, depends_on=("a",)),
+        ]))
+    with pytest.raises(ValueError, match="unknown"):
+        asyncio.run(run_workflow([WorkflowStep("a", noop, depends_on=("missing",))]))
+
+
+def test_failure_cancels_dependents():
+    async def boom(_):
+        raise RuntimeError("research failed")
+
+    log = []
+    steps = [
+        WorkflowStep("research", boom),
+        WorkflowStep("analysis", _sleeper("analysis", 0, log), depends_on=("research",)),
+    ]
+    with pytest.raises(RuntimeError, match="research failed"):
+        asyncio.run(run_workflow(steps))
+    assert log == []
+
+
+class _RecordingAgent:
+    def __init__(self, name, log):
+        self.name = name
+        self.log = log
+
+    async def ainvoke(self, inputs):
+        self.log.append((self.name, inputs["input"]))
+        await asyncio.sleep(0.01)
+        return {"output": f"{self.name} done"}
+
+
+def test_sub_queries_fan_out_after_retrieval_resolves():
+    pytest.importorskip("langchain")
+    from src.agents.multi_agent_system import MultiAgentSystem
+
+    log = []
+    # Skip setup_agents: the fakes stand in for the LangChain executors
+    system = MultiAgentSystem.__new__(MultiAgentSystem)
+    system.max_concurrency, system.monitor = 2, None
+    system.research_agent = _RecordingAgent("research", log)
+    system.grounded_research_agent = _RecordingAgent("grounded", log)
+    system.analysis_agent = _RecordingAgent("analysis", log)
+    system.grounded_analysis_agent = _RecordingAgent("grounded_analysis", log)
+
+    async def retrieval():
+        await asyncio.sleep(0.02)
+        return "Aspirin thins the blood."
+
+    async def run():
+        pending = asyncio.ensure_future(retrieval())
+        return await system.aexecute_workflow("aspirin?", ["dose?", "side effects?"], context=pending)
+
+    result = asyncio.run(run())
+
+    assert sorted(result["research"]) == ["research_0", "research_1"]
+    research = [entry for entry in log if entry[0] != "grounded_analysis"]
+    assert {name for name, _ in research} == {"grounded"}
+    assert all("Aspirin thins the blood." in text for _, text in research)
+    # Analysis is grounded too, so neither agent can search the vector store again
+    assert log[-1][0] == "grounded_analysis"
+
+
+def test_pipeline_passes_sub_queries_to_the_agents():
+    from src.pipeline.main_pipeline import CodexAIPipeline
+
+    pipeline = CodexAIPipeline({
+        "model_name": "gpt-3.5-turbo", "temperature": 0.7, "max_tokens": 100, "use_mock_llm": True,
+    })
+    seen = []
+
+    async def aexecute_workflow(query, sub_queries=None, context=None):
+        seen.append(sub_queries)
+        return {"output": "answer"}
+
+    pipeline.agent_system.aexecute_workflow = aexecute_workflow
+
+    async def run():
+        await pipeline.process_query("aspirin?", sub_queries=["dose?", "side effects?"])
+        # Answers built from sub-queries are not cached under the plain question
+        await pipeline.process_query("aspirin?")
+
+    asyncio.run(run())
+    pipeline.close()
+    assert seen == [["dose?", "side effects?"], None]